@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'SyroMusic.query_budget.QueryBudgetMiddleware',  # first, so it sees session/auth queries too
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -84,13 +85,69 @@ WSGI_APPLICATION = 'Syro.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+#
+# SQLite by default. DATABASE_ENGINE=postgres selects PostgreSQL (DATABASE_NAME,
+# _USER, _PASSWORD, _HOST, _PORT); DATABASE_REPLICA_HOST/_PORT add a read
+# replica that analytics views read from (see SyroMusic/db_router.py).
+# test_postgres_setup.py runs the app against a throwaway local PostgreSQL.
+
+DATABASE_ENGINE = config('DATABASE_ENGINE', default='sqlite')
+
+
+def _postgres_database(host, port):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DATABASE_NAME', default='syro'),
+        'USER': config('DATABASE_USER', default='syro'),
+        'PASSWORD': config('DATABASE_PASSWORD', default=''),
+        'HOST': host,
+        'PORT': port,
+        # Persistent connections: reused across requests, health-checked before reuse
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        # Behind PgBouncer in transaction mode, QuerySet.iterator() can't use server-side cursors
+        'DISABLE_SERVER_SIDE_CURSORS': config('DATABASE_POOLER', default='') == 'pgbouncer',
+        'OPTIONS': {
+            'connect_timeout': 5,
+            'application_name': 'syro',
+        },
+    }
+
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+if DATABASE_ENGINE == 'postgres':
+    DATABASES = {
+        'default': _postgres_database(
+            config('DATABASE_HOST', default='localhost'), config('DATABASE_PORT', default='5432')
+        ),
     }
-}
+    DATABASE_REPLICA_HOST = config('DATABASE_REPLICA_HOST', default=None)
+    if DATABASE_REPLICA_HOST:
+        DATABASES['replica'] = _postgres_database(
+            DATABASE_REPLICA_HOST, config('DATABASE_REPLICA_PORT', default=DATABASES['default']['PORT'])
+        )
+        DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# SQLite performance mode (see SyroMusic/sqlite_tuning.py): WAL, synchronous=NORMAL,
+# busy timeout and mmap pragmas on every connection, plus periodic WAL checkpoints.
+# SQLITE_WRITER_QUEUE routes the write-burst tasks to their own Celery queue, for a
+# single `celery -A Syro worker -Q <queue> -c 1` writer.
+SQLITE_PERFORMANCE_MODE = DATABASE_ENGINE == 'sqlite' and config('SQLITE_PERFORMANCE_MODE', default=False, cast=bool)
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int)  # milliseconds
+SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)  # bytes
+SQLITE_CHECKPOINT_INTERVAL = config('SQLITE_CHECKPOINT_INTERVAL', default=5 * 60, cast=int)  # seconds
+SQLITE_WRITER_QUEUE = config('SQLITE_WRITER_QUEUE', default='')
+if SQLITE_PERFORMANCE_MODE:
+    # Also applies while the connection opens, before the pragmas run
+    DATABASES['default']['OPTIONS'] = {'timeout': SQLITE_BUSY_TIMEOUT / 1000}
+
+DATABASE_ROUTERS = ['SyroMusic.db_router.PrimaryReplicaRouter']
 
 
 # Password validation
@@ -151,6 +208,87 @@ SPOTIPY_CLIENT_ID = config('SPOTIPY_CLIENT_ID', default=None)
 SPOTIPY_CLIENT_SECRET = config('SPOTIPY_CLIENT_SECRET', default=None)
 SPOTIPY_REDIRECT_URI = config('SPOTIPY_REDIRECT_URI', default='http://localhost:8000/music/spotify/callback/')
 
+# Spotify API client: one pooled HTTP session per process, and a bounded
+# thread pool for SpotifyService.batch() fan-out
+SPOTIFY_REQUEST_TIMEOUT = 5  # seconds per HTTP request
+SPOTIFY_HTTP_POOL_SIZE = 16  # keep-alive connections to api.spotify.com
+SPOTIFY_MAX_CONCURRENCY = config('SPOTIFY_MAX_CONCURRENCY', default=8, cast=int)
+SPOTIFY_CALL_TIMEOUT = 5  # seconds before a batched call is reported as timed out
+SPOTIFY_BATCH_TIMEOUT = 8  # seconds before a whole batch returns partial results
+
+# ============================================================
+# Cache Configuration
+# ============================================================
+# Shared cache (Redis) when CACHE_URL is set, per-process memory otherwise
+CACHE_URL = config('CACHE_URL', default=None)
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'syro',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# ============================================================
+# Search Configuration
+# ============================================================
+# In-process typeahead prefix index used by the search JSON API.
+# Set TYPEAHEAD_SNAPSHOT_PATH to share one memory-mapped snapshot across workers;
+# it is rebuilt by the build_typeahead_snapshot command / periodic task.
+TYPEAHEAD_ENABLED = config('TYPEAHEAD_ENABLED', default=True, cast=bool)
+TYPEAHEAD_SNAPSHOT_PATH = config('TYPEAHEAD_SNAPSHOT_PATH', default=None)
+TYPEAHEAD_RELOAD_INTERVAL = 60  # seconds between snapshot freshness checks
+TYPEAHEAD_MAX_AGE = 300  # seconds before a per-process (non-snapshot) index is rebuilt in the background
+
+# Trigram index for typo-tolerant search when exact matches are sparse
+FUZZY_SEARCH_ENABLED = config('FUZZY_SEARCH_ENABLED', default=True, cast=bool)
+FUZZY_MIN_SIMILARITY = 0.5  # share of query trigrams a match must contain
+FUZZY_MAX_POSTINGS = 50000  # posting list entries scanned per query
+FUZZY_MAX_CANDIDATES = 500  # candidates scored exactly per query
+FUZZY_MAX_AGE = 600  # seconds before the index is rebuilt in the background
+FUZZY_RETRY_AFTER = 60  # seconds before a failed build is retried
+
+# Shared search result cache (see SyroMusic/search_cache.py)
+SEARCH_CACHE_TTL = 5 * 60  # local catalog results; also invalidated on catalog writes
+SPOTIFY_SEARCH_CACHE_TTL = 60 * 60
+SEARCH_STREAM_DEADLINE = 2.0  # seconds search_json_api waits for Spotify lookups
+CATALOG_LIST_CACHE_TTL = 15 * 60  # rendered artist/album/song list pages; also invalidated on catalog writes
+
+# Per-user recommendations, keyed by seed set; refreshed by the stats sync
+RECOMMENDATION_CACHE_TTL = 6 * 60 * 60
+
+# Liked tracks: users making more than HOT_THRESHOLD membership lookups per TTL get their saved id set cached
+SAVED_TRACKS_CACHE_TTL = 10 * 60
+SAVED_TRACKS_HOT_THRESHOLD = 5
+
+# Local item-to-item recommender built from listening activity (needs numpy/scipy)
+ITEM_RECOMMENDER_ENABLED = config('ITEM_RECOMMENDER_ENABLED', default=True, cast=bool)
+ITEM_RECOMMENDER_PATH = config('ITEM_RECOMMENDER_PATH', default=str(BASE_DIR / 'item_recommender.npz'))
+ITEM_RECOMMENDER_RELOAD_INTERVAL = 60  # seconds between model file freshness checks
+AUDIO_FEATURES_RELOAD_INTERVAL = 60  # seconds between audio-feature store freshness checks
+
+# Artist similarity index over top-artist genres (needs numpy/scipy)
+ARTIST_SIMILARITY_PATH = config('ARTIST_SIMILARITY_PATH', default=str(BASE_DIR / 'artist_similarity.npz'))
+ARTIST_SIMILARITY_RELOAD_INTERVAL = 60  # seconds between index file freshness checks
+
+# ============================================================
+# Query Budgets
+# ============================================================
+# Per-request query recording (see SyroMusic/query_budget.py): X-Query-Count and
+# X-Query-Time headers, and a warning for N+1 patterns or requests over their
+# @query_budget (QUERY_BUDGET_DEFAULT otherwise). QUERY_BUDGET_STRICT raises instead.
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=DEBUG, cast=bool)
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+QUERY_BUDGET_DEFAULT = 50  # queries per request
+QUERY_BUDGET_N_PLUS_ONE = 5  # repeats of one query shape from one call site flagged as N+1
+
 # ============================================================
 # Logging Configuration
 # ============================================================
@@ -209,8 +347,45 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'SyroMusic.tasks.sync_all_user_data',
         'schedule': 6 * 60 * 60,  # Run every 6 hours
     },
+    'rebuild-typeahead-snapshot-every-10-minutes': {
+        'task': 'SyroMusic.tasks.rebuild_typeahead_snapshot',
+        'schedule': 10 * 60,
+    },
+    'build-genre-shelves-every-6-hours': {
+        'task': 'SyroMusic.tasks.build_genre_shelves',
+        'schedule': 6 * 60 * 60,
+    },
+    'sync-audio-features-every-6-hours': {
+        'task': 'SyroMusic.tasks.sync_audio_features',
+        'schedule': 6 * 60 * 60,
+    },
+    'rebuild-artist-similarity-every-6-hours': {
+        'task': 'SyroMusic.tasks.rebuild_artist_similarity',
+        'schedule': 6 * 60 * 60,
+    },
+    'update-item-recommender-every-hour': {
+        'task': 'SyroMusic.tasks.update_item_recommender',
+        'schedule': 60 * 60,
+    },
+    'rebuild-item-recommender-daily': {
+        'task': 'SyroMusic.tasks.update_item_recommender',
+        'schedule': 24 * 60 * 60,
+        'kwargs': {'full': True},
+    },
 }
 
+if SQLITE_PERFORMANCE_MODE:
+    CELERY_BEAT_SCHEDULE['checkpoint-sqlite-wal'] = {
+        'task': 'SyroMusic.tasks.checkpoint_sqlite_wal',
+        'schedule': SQLITE_CHECKPOINT_INTERVAL,
+    }
+
+if SQLITE_PERFORMANCE_MODE and SQLITE_WRITER_QUEUE:
+    CELERY_TASK_ROUTES = {
+        'SyroMusic.tasks.ingest_spotify_tracks': {'queue': SQLITE_WRITER_QUEUE},
+        'SyroMusic.tasks.sync_user_recently_played': {'queue': SQLITE_WRITER_QUEUE},
+    }
+
 # ============================================================
 # REST Framework Configuration
 # ============================================================
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
-    Artist, Album, Song, Playlist, UserProfile,
-    SpotifyUser, UserListeningStats, UserListeningActivity
+    Artist, Album, Song, Playlist, SavedTrack, UserProfile,
+    SpotifyUser, UserListeningStats, UserListeningActivity, GenreShelfSet
 )
 
 
@@ -20,11 +20,21 @@ class AlbumAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
 
 
+class AlbumListFilter(admin.RelatedFieldListFilter):
+    """Album filter choices labelled in one query rather than one artist lookup per album."""
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin) or ('title',)
+        return [(album.pk, str(album)) for album in Album.objects.select_related('artist').order_by(*ordering)]
+
+
 @admin.register(Song)
 class SongAdmin(admin.ModelAdmin):
     list_display = ('title', 'album', 'duration', 'track_number', 'created_at')
+    # Album.__str__ reads album.artist
+    list_select_related = ('album__artist',)
     search_fields = ('title', 'album__title')
-    list_filter = ('album', 'created_at')
+    list_filter = (('album', AlbumListFilter), 'created_at')
     ordering = ('-created_at',)
 
 
@@ -36,6 +46,16 @@ class PlaylistAdmin(admin.ModelAdmin):
     ordering = ('-updated_at',)
 
 
+@admin.register(SavedTrack)
+class SavedTrackAdmin(admin.ModelAdmin):
+    list_display = ('user', 'song', 'saved_at')
+    # Song.__str__ reads song.album
+    list_select_related = ('user', 'song__album')
+    search_fields = ('user__username', 'song__title')
+    raw_id_fields = ('song',)
+    ordering = ('-saved_at',)
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'favorite_genre', 'created_at')
@@ -69,3 +89,10 @@ class UserListeningActivityAdmin(admin.ModelAdmin):
     list_filter = ('played_at', 'user')
     readonly_fields = ('created_at',)
     ordering = ('-played_at',)
+
+
+@admin.register(GenreShelfSet)
+class GenreShelfSetAdmin(admin.ModelAdmin):
+    list_display = ('id', 'source', 'built_at')
+    readonly_fields = ('shelves', 'source', 'built_at')
+    ordering = ('-id',)
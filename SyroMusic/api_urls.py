@@ -7,7 +7,8 @@ from rest_framework.routers import DefaultRouter
 from .api_views import (
     ArtistViewSet, AlbumViewSet, SongViewSet, PlaylistViewSet,
     SpotifyUserViewSet, UserStatsViewSet, ListeningActivityViewSet,
-    sync_spotify_stats_api, get_stats_detailed_api
+    sync_spotify_stats_api, get_stats_detailed_api, audio_features_query_api,
+    similar_artists_api, saved_tracks_api, saved_tracks_contains_api
 )
 
 # Create a router for ViewSets
@@ -29,4 +30,8 @@ urlpatterns = [
     # Additional API endpoints
     path('sync/spotify/', sync_spotify_stats_api, name='sync-spotify-stats'),
     path('stats/detailed/', get_stats_detailed_api, name='stats-detailed'),
+    path('audio-features/query/', audio_features_query_api, name='audio-features-query'),
+    path('similar-artists/<str:spotify_id>/', similar_artists_api, name='similar-artists'),
+    path('saved-tracks/', saved_tracks_api, name='saved-tracks'),
+    path('saved-tracks/contains/', saved_tracks_contains_api, name='saved-tracks-contains'),
 ]
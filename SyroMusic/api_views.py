@@ -4,21 +4,33 @@ API Views for SyroMusic using Django REST Framework.
 
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
+from django.db.models import Count, F, Min, Prefetch, Sum, Value, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+from datetime import timedelta
 
 from .models import (
-    Artist, Album, Song, Playlist,
+    Artist, Album, Song, Playlist, PlaylistTrack,
     SpotifyUser, UserListeningStats, UserListeningActivity
 )
+from .pagination import KeysetPagination
+from .db_router import replica_reads
+from .query_budget import query_budget
+from .services import SpotifyService, TokenManager
+from . import playlist_tracks
 from .serializers import (
     ArtistSerializer, AlbumSerializer, SongSerializer, PlaylistSerializer,
     SpotifyUserSerializer, UserListeningStatsSerializer,
     UserListeningActivitySerializer, SyncStatusSerializer,
-    StatsDetailedSerializer
+    StatsDetailedSerializer, ArtistValuesSerializer, AlbumValuesSerializer,
+    SongValuesSerializer, UserListeningActivityValuesSerializer, PlaylistSummarySerializer,
+    PlaylistTrackValuesSerializer, PlaylistTracksEditSerializer, SavedTrackValuesSerializer
 )
 
 
@@ -40,17 +52,110 @@ class LargeResultsSetPagination(PageNumberPagination):
     max_page_size = 200
 
 
+class StandardCursorPagination(KeysetPagination):
+    """Keyset pagination for large, deeply paged listings (no COUNT, no OFFSET)."""
+    page_size = 20
+    max_page_size = 100
+
+
+class LargeCursorPagination(KeysetPagination):
+    """Keyset pagination with larger pages, for listening history."""
+    page_size = 50
+    max_page_size = 200
+
+
+class PlaylistTracksPagination(KeysetPagination):
+    """Keyset pagination over one playlist's entries, in playlist order."""
+    page_size = 50
+    max_page_size = 200
+    ordering = ('position',)
+
+
+class SavedTracksPagination(KeysetPagination):
+    """Keyset pagination over a user's saved tracks, newest first."""
+    page_size = 50
+    max_page_size = 200
+    ordering = ('-saved_at', '-id')
+
+
+# ============================================================
+# Fast Read Path
+# ============================================================
+
+class ValuesReadMixin:
+    """
+    Serve list and retrieve from queryset.values() rows through
+    `values_serializer_class` instead of model instances and nested
+    ModelSerializers. ?fields=id,title,album.title returns a sparse fieldset
+    and SELECTs only those columns. ?ids=3,1,2 fetches those objects in one
+    query, in that order, listing the ids not found under "missing".
+    Writes still use serializer_class.
+    """
+    values_serializer_class = None
+    max_batch_ids = 200
+
+    def get_values_serializer(self):
+        return self.values_serializer_class(self.request.query_params.get('fields'))
+
+    def get_values_queryset(self, serializer, extra=()):
+        queryset = self.filter_queryset(self.get_queryset())
+        return queryset.values(*dict.fromkeys([*serializer.columns, *extra]))
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        if 'ids' in request.query_params:
+            return self.batch(serializer, request.query_params['ids'])
+
+        extra = ()
+        if isinstance(self.paginator, KeysetPagination):
+            # Cursors are read from the ordering columns of each row
+            extra = [field.lstrip('-') for field in self.paginator.get_ordering(request, self.get_queryset(), self)]
+        queryset = self.get_values_queryset(serializer, extra)
+
+        rows = self.paginate_queryset(queryset)
+        if rows is not None:
+            return self.get_paginated_response(serializer.to_representation(rows))
+        return Response(serializer.to_representation(queryset))
+
+    def batch(self, serializer, ids):
+        try:
+            ids = list(dict.fromkeys(int(value) for value in ids.split(',') if value.strip()))
+        except ValueError:
+            raise ValidationError({'ids': 'Must be comma-separated ids.'})
+        if len(ids) > self.max_batch_ids:
+            raise ValidationError({'ids': f'At most {self.max_batch_ids} ids per request.'})
+
+        rows = {
+            row['id']: row
+            for row in self.get_values_queryset(serializer, ['id']).filter(id__in=ids).order_by()
+        }
+        return Response({
+            'results': serializer.to_representation([rows[pk] for pk in ids if pk in rows]),
+            'missing': [pk for pk in ids if pk not in rows],
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            self.get_values_queryset(serializer),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return Response(serializer.to_representation([row])[0])
+
+
 # ============================================================
 # Music Model ViewSets
 # ============================================================
 
-class ArtistViewSet(viewsets.ReadOnlyModelViewSet):
+class ArtistViewSet(ValuesReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for browsing artists.
-    Supports: list, retrieve
+    Supports: list (?ids= for batch get), retrieve (?fields= for sparse fieldsets)
     """
     queryset = Artist.objects.all()
     serializer_class = ArtistSerializer
+    values_serializer_class = ArtistValuesSerializer
     pagination_class = StandardResultsSetPagination
     permission_classes = [AllowAny]
     filterset_fields = ['name']
@@ -59,34 +164,56 @@ class ArtistViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['name']
 
 
-class AlbumViewSet(viewsets.ReadOnlyModelViewSet):
+class AlbumViewSet(ValuesReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for browsing albums.
-    Supports: list, retrieve
+    Supports: list (?ids= for batch get), retrieve (?fields= for sparse fieldsets)
     """
     queryset = Album.objects.select_related('artist').all()
     serializer_class = AlbumSerializer
-    pagination_class = StandardResultsSetPagination
+    values_serializer_class = AlbumValuesSerializer
+    pagination_class = StandardCursorPagination
     permission_classes = [AllowAny]
     filterset_fields = ['artist', 'release_date']
     search_fields = ['title', 'artist__name']
     ordering_fields = ['title', 'release_date', 'created_at']
-    ordering = ['-release_date']
+    ordering = ['-release_date', '-id']
 
 
-class SongViewSet(viewsets.ReadOnlyModelViewSet):
+class SongViewSet(ValuesReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for browsing songs.
-    Supports: list, retrieve
+    Supports: list (?ids= for batch get), retrieve (?fields= for sparse fieldsets)
     """
     queryset = Song.objects.select_related('album', 'album__artist').all()
     serializer_class = SongSerializer
-    pagination_class = StandardResultsSetPagination
+    values_serializer_class = SongValuesSerializer
+    pagination_class = StandardCursorPagination
     permission_classes = [AllowAny]
     filterset_fields = ['album', 'album__artist']
     search_fields = ['title', 'album__title', 'album__artist__name']
     ordering_fields = ['title', 'created_at']
-    ordering = ['album', 'track_number']
+    ordering = ['album_id', 'track_number', 'id']
+
+
+def playlist_cover_mosaics(playlist_ids, size=4):
+    """
+    {playlist id: up to `size` distinct album cover urls}, in the order the
+    albums first appear in the playlist, computed in one grouped, windowed query.
+    """
+    rows = (
+        PlaylistTrack.objects
+        .filter(playlist_id__in=playlist_ids, song__album__cover_url__gt='')
+        .values('playlist_id', 'song__album__cover_url')
+        .annotate(first_position=Min('position'))
+        .annotate(rank=Window(RowNumber(), partition_by=F('playlist_id'), order_by=F('first_position').asc()))
+        .filter(rank__lte=size)
+        .order_by('playlist_id', 'rank')
+    )
+    covers = {}
+    for row in rows:
+        covers.setdefault(row['playlist_id'], []).append(row['song__album__cover_url'])
+    return covers
 
 
 class PlaylistViewSet(viewsets.ModelViewSet):
@@ -94,6 +221,9 @@ class PlaylistViewSet(viewsets.ModelViewSet):
     ViewSet for managing playlists.
     Supports: list, create, retrieve, update, partial_update, destroy
     Only authenticated users can access their playlists.
+    The list is a summary (track count, total duration, cover mosaic);
+    songs are paged, added, removed and reordered in bulk through the
+    tracks sub-resource.
     """
     serializer_class = PlaylistSerializer
     pagination_class = StandardResultsSetPagination
@@ -101,14 +231,139 @@ class PlaylistViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return only playlists owned by the current user."""
-        return Playlist.objects.filter(user=self.request.user).prefetch_related(
-            'songs', 'songs__album', 'songs__album__artist'
+        queryset = Playlist.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            # Aggregation drops Meta.ordering, so the page order is restated
+            return queryset.annotate(
+                track_count=Count('songs'),
+                total_duration=Coalesce(Sum('songs__duration'), Value(timedelta(0))),
+            ).order_by('-updated_at', '-id')
+        if self.action in ('tracks', 'add_tracks', 'remove_tracks', 'move_tracks'):
+            return queryset
+        return queryset.prefetch_related(
+            Prefetch('tracks', queryset=PlaylistTrack.objects.select_related('song__album__artist'))
         )
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PlaylistSummarySerializer
+        return PlaylistSerializer
+
     def perform_create(self, serializer):
         """Create a new playlist for the current user."""
         serializer.save(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """List playlist summaries, with cover mosaics for the whole page in one query."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        playlists = page if page is not None else list(queryset)
+
+        context = self.get_serializer_context()
+        context['covers'] = playlist_cover_mosaics([playlist.id for playlist in playlists])
+        data = PlaylistSummarySerializer(playlists, many=True, context=context).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def tracks(self, request, pk=None):
+        """
+        Page through this playlist's entries in playlist order.
+        Query params: cursor, page_size, fields (position, added_at, song.*)
+        """
+        playlist = self.get_object()
+        serializer = PlaylistTrackValuesSerializer(request.query_params.get('fields'))
+        paginator = PlaylistTracksPagination()
+        queryset = PlaylistTrack.objects.filter(playlist=playlist)
+
+        # No view is passed: the playlist ordering filter does not apply to its entries
+        ordering = paginator.get_ordering(request, queryset, None)
+        queryset = queryset.values(*dict.fromkeys([*serializer.columns, *[field.lstrip('-') for field in ordering]]))
+        rows = paginator.paginate_queryset(queryset, request)
+        return paginator.get_paginated_response(serializer.to_representation(rows))
+
+    def _tracks_edit(self, request):
+        edit = PlaylistTracksEditSerializer(data=request.data)
+        edit.is_valid(raise_exception=True)
+        return edit.validated_data
+
+    def _spotify_service(self, playlist=None):
+        """
+        A SpotifyService for the connected user, or None. When a playlist is
+        given, also None unless it is linked to Spotify.
+        """
+        if playlist is not None and not playlist.spotify_id:
+            return None
+        spotify_user = SpotifyUser.objects.filter(user=self.request.user).first()
+        if not spotify_user or not spotify_user.is_connected:
+            return None
+        access_token = TokenManager.refresh_user_token(spotify_user)
+        return SpotifyService(access_token=access_token) if access_token else None
+
+    @tracks.mapping.post
+    def add_tracks(self, request, pk=None):
+        """
+        Add tracks in bulk, locally in one transaction and then on Spotify if
+        the playlist is linked there (100 tracks per request):
+        {"song_ids": [...], "track_uris": [...], "position": index (default end)}.
+        URIs missing from the catalog are fetched and ingested first.
+        Songs already in the playlist are skipped.
+        """
+        playlist = self.get_object()
+        edit = self._tracks_edit(request)
+        known = set(Song.objects.filter(id__in=edit['song_ids']).values_list('id', flat=True))
+        missing = [song_id for song_id in edit['song_ids'] if song_id not in known]
+        if missing:
+            return Response(
+                {'error': f'Unknown song id(s): {", ".join(map(str, missing[:20]))}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        service = self._spotify_service(playlist)
+        song_ids, unresolved = playlist_tracks.resolve(edit['song_ids'], edit['track_uris'], service)
+        added = playlist_tracks.add(playlist, song_ids, at=edit.get('position'))
+
+        spotify = 'skipped'
+        uris = playlist_tracks.upstream_uris(added, unresolved)
+        if service and uris:
+            synced = service.add_tracks_to_playlist(playlist.spotify_id, uris, position=edit.get('position'))
+            spotify = 'synced' if synced else 'failed'
+        return Response(
+            {'added': len(added), 'song_ids': added, 'unresolved_uris': unresolved, 'spotify': spotify},
+            status=status.HTTP_201_CREATED if added else status.HTTP_200_OK
+        )
+
+    @tracks.mapping.delete
+    def remove_tracks(self, request, pk=None):
+        """
+        Remove tracks in bulk, locally and then on Spotify if linked:
+        {"song_ids": [...], "track_uris": [...]}.
+        """
+        playlist = self.get_object()
+        edit = self._tracks_edit(request)
+        song_ids, unresolved = playlist_tracks.resolve(edit['song_ids'], edit['track_uris'])
+        removed = playlist_tracks.remove(playlist, song_ids)
+
+        spotify = 'skipped'
+        service = self._spotify_service(playlist)
+        uris = playlist_tracks.upstream_uris(song_ids, unresolved)
+        if service and uris:
+            synced = service.remove_tracks_from_playlist(playlist.spotify_id, uris)
+            spotify = 'synced' if synced else 'failed'
+        return Response({'removed': removed, 'spotify': spotify})
+
+    @action(detail=True, methods=['post'], url_path='tracks/move')
+    def move_tracks(self, request, pk=None):
+        """
+        Move songs as a block, in the order given, to an index among the
+        other entries: {"song_ids": [...], "track_uris": [...], "position": index (default end)}.
+        """
+        playlist = self.get_object()
+        edit = self._tracks_edit(request)
+        song_ids, _ = playlist_tracks.resolve(edit['song_ids'], edit['track_uris'])
+        return Response({'moved': playlist_tracks.move(playlist, song_ids, at=edit.get('position'))})
+
     @action(detail=True, methods=['post'])
     def add_track(self, request, pk=None):
         """Add a track to this playlist (Spotify URI or local Song ID)."""
@@ -126,8 +381,7 @@ class PlaylistViewSet(viewsets.ModelViewSet):
         if track_id:
             try:
                 song = get_object_or_404(Song, id=track_id)
-                playlist.songs.add(song)
-                playlist.save()
+                playlist_tracks.add(playlist, [song.id])
             except Exception as e:
                 return Response(
                     {'error': f'Error adding track to local playlist: {str(e)}'},
@@ -137,9 +391,8 @@ class PlaylistViewSet(viewsets.ModelViewSet):
         # If Spotify URI provided, add to Spotify playlist
         if track_uri and playlist.spotify_id:
             try:
-                from .services import SpotifyService
-                service = SpotifyService(request.user)
-                success = service.add_tracks_to_playlist(playlist.spotify_id, [track_uri])
+                service = self._spotify_service(playlist)
+                success = service is not None and service.add_tracks_to_playlist(playlist.spotify_id, [track_uri])
                 if not success:
                     return Response(
                         {'error': 'Failed to add track to Spotify playlist'},
@@ -154,6 +407,26 @@ class PlaylistViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(playlist)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """Queue a two-way sync of the user's Spotify playlists."""
+        try:
+            from .tasks import sync_user_playlists
+
+            task = sync_user_playlists.delay(request.user.id)
+            serializer = SyncStatusSerializer({
+                'status': 'syncing',
+                'message': 'Your Spotify playlists are being synced.',
+                'task_id': task.id,
+            })
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+        except Exception as e:
+            return Response(
+                {'error': f'Error syncing playlists: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     @action(detail=False, methods=['post'])
     def create_with_spotify(self, request):
         """Create a playlist both locally and on Spotify."""
@@ -168,9 +441,13 @@ class PlaylistViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            from .services import SpotifyService
-            service = SpotifyService(request.user)
-            
+            service = self._spotify_service()
+            if not service:
+                return Response(
+                    {'error': 'Spotify account not connected'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             # Create Spotify playlist
             spotify_playlist = service.create_playlist(name, description, public)
             if not spotify_playlist:
@@ -179,12 +456,14 @@ class PlaylistViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
-            # Create local playlist
+            # Create local playlist, in sync with the empty Spotify one
             playlist = Playlist.objects.create(
                 user=request.user,
                 title=name,
                 description=description,
-                spotify_id=spotify_playlist['id']
+                spotify_id=spotify_playlist['id'],
+                snapshot_id=spotify_playlist.get('snapshot_id'),
+                synced_at=timezone.now(),
             )
             
             serializer = self.get_serializer(playlist)
@@ -201,19 +480,20 @@ class PlaylistViewSet(viewsets.ModelViewSet):
 # Statistics & Listening Activity ViewSets
 # ============================================================
 
-class ListeningActivityViewSet(viewsets.ReadOnlyModelViewSet):
+class ListeningActivityViewSet(ValuesReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for retrieving user's listening activity.
-    Supports: list, retrieve
+    Supports: list (?ids= for batch get), retrieve (?fields= for sparse fieldsets)
     Only authenticated users can access their activity.
     """
     serializer_class = UserListeningActivitySerializer
-    pagination_class = LargeResultsSetPagination
+    values_serializer_class = UserListeningActivityValuesSerializer
+    pagination_class = LargeCursorPagination
     permission_classes = [IsAuthenticated]
     filterset_fields = ['track_name', 'artist_name']
     search_fields = ['track_name', 'artist_name', 'album_name']
     ordering_fields = ['played_at', 'created_at']
-    ordering = ['-played_at']
+    ordering = ['-played_at', '-id']
 
     def get_queryset(self):
         """Return only listening activity for the current user."""
@@ -231,6 +511,7 @@ class ListeningActivityViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @replica_reads
     def stats(self, request):
         """Get statistics about listening activity."""
         queryset = self.get_queryset()
@@ -249,6 +530,7 @@ class ListeningActivityViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
+@query_budget(10)
 class UserStatsViewSet(viewsets.ViewSet):
     """
     Custom ViewSet for user listening statistics.
@@ -264,7 +546,7 @@ class UserStatsViewSet(viewsets.ViewSet):
     def list(self, request):
         """Get stats for the current user."""
         user = request.user
-        listening_stats = get_object_or_404(UserListeningStats, user=user)
+        listening_stats = get_object_or_404(UserListeningStats.objects.select_related('user'), user=user)
         serializer = UserListeningStatsSerializer(listening_stats)
         return Response(serializer.data)
 
@@ -279,7 +561,7 @@ class UserStatsViewSet(viewsets.ViewSet):
             )
 
         user = get_object_or_404(User, pk=pk)
-        listening_stats = get_object_or_404(UserListeningStats, user=user)
+        listening_stats = get_object_or_404(UserListeningStats.objects.select_related('user'), user=user)
         serializer = UserListeningStatsSerializer(listening_stats)
         return Response(serializer.data)
 
@@ -404,6 +686,201 @@ def sync_spotify_stats_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def audio_features_query_api(request):
+    """
+    API endpoint to find tracks by audio features.
+    Query params:
+    - like: comma-separated Spotify track ids, or 'top' for your medium-term top tracks
+    - mood: one of audio_features.MOODS (e.g. 'energetic', 'chill')
+    - <feature>_min / <feature>_max: ranges, e.g. tempo_min=120&tempo_max=130
+    - k: number of results (default 20, max 100)
+    """
+    from . import audio_features
+
+    store = audio_features.get_store()
+    if store is None:
+        return Response(
+            {'status': 'error', 'message': 'Audio features are not available.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    try:
+        params = request.query_params
+        mood = params.get('mood')
+        if mood and mood not in audio_features.MOODS:
+            return Response(
+                {'status': 'error', 'message': f'Unknown mood. Choose from: {", ".join(audio_features.MOODS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ranges = {}
+        for name in audio_features.FEATURES:
+            low, high = params.get(f'{name}_min'), params.get(f'{name}_max')
+            if low is not None or high is not None:
+                ranges[name] = (
+                    float(low) if low is not None else None,
+                    float(high) if high is not None else None,
+                )
+
+        like = params.get('like', '')
+        if like == 'top':
+            listening_stats = UserListeningStats.objects.filter(user=request.user).first()
+            like = [t.get('id') for t in listening_stats.top_tracks_medium_term if t.get('id')] if listening_stats else []
+        else:
+            like = [spotify_id for spotify_id in like.split(',') if spotify_id]
+
+        k = max(1, min(int(params.get('k', 20)), 100))
+    except ValueError:
+        return Response(
+            {'status': 'error', 'message': 'Ranges and k must be numbers.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    matches = store.query(like=like, mood=mood, ranges=ranges, k=k)
+    songs = {
+        song['spotify_id']: song
+        for song in Song.objects.filter(spotify_id__in=[spotify_id for spotify_id, _ in matches]).values(
+            'spotify_id', 'id', 'title', 'album__artist__name'
+        ).order_by()
+    }
+    results = []
+    for spotify_id, distance in matches:
+        song = songs.get(spotify_id, {})
+        results.append({
+            'spotify_id': spotify_id,
+            'song_id': song.get('id'),
+            'title': song.get('title'),
+            'artist': song.get('album__artist__name'),
+            'distance': distance,
+            'features': store.features(spotify_id),
+        })
+    return Response({'count': len(results), 'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def similar_artists_api(request, spotify_id):
+    """
+    API endpoint for artists similar to a Spotify artist, by genre.
+    Answered from the local artist similarity index; no Spotify call.
+    Query params:
+    - k: number of results (default 10, 1 to 50)
+    """
+    from . import artist_similarity
+
+    index = artist_similarity.get_index()
+    if index is None:
+        return Response(
+            {'status': 'error', 'message': 'Artist similarity is not available.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    i = index.lookup.get(spotify_id)
+    if i is None:
+        return Response(
+            {'status': 'error', 'message': 'Artist not found in the similarity index.'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    try:
+        k = max(1, min(int(request.query_params.get('k', 10)), 50))
+    except ValueError:
+        return Response(
+            {'status': 'error', 'message': 'k must be a number.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    results = [
+        dict(index.describe(j), similarity=round(score, 4))
+        for j, score in index.similar(spotify_id, k=k)
+    ]
+    return Response({'artist': index.describe(i), 'count': len(results), 'results': results})
+
+
+SAVED_TRACKS_MAX_IDS = 500
+
+
+def _song_ids_param(values):
+    """Song ids from a list or a comma-separated string; ValueError if any is not a number."""
+    if isinstance(values, str):
+        values = values.split(',')
+    return [int(value) for value in values if str(value).strip()]
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def saved_tracks_contains_api(request):
+    """
+    API endpoint for the liked state of many songs at once.
+    Query params:
+    - ids: comma-separated local song ids (max 500)
+    Returns {"saved": {song id: true/false}}.
+    """
+    from . import saved_tracks
+
+    try:
+        song_ids = _song_ids_param(request.query_params.get('ids', ''))
+    except ValueError:
+        return Response(
+            {'status': 'error', 'message': 'ids must be comma-separated song ids.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(song_ids) > SAVED_TRACKS_MAX_IDS:
+        return Response(
+            {'status': 'error', 'message': f'At most {SAVED_TRACKS_MAX_IDS} ids per request.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({'saved': saved_tracks.contains(request.user, song_ids)})
+
+
+@api_view(['GET', 'POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def saved_tracks_api(request):
+    """
+    API endpoint for the user's saved tracks.
+    GET pages through them newest first (query params: cursor, page_size,
+    fields: saved_at, song.*). POST saves and DELETE unsaves songs in bulk.
+    Body: {"song_ids": [...]} (max 500)
+    """
+    from . import saved_tracks
+
+    if request.method == 'GET':
+        serializer = SavedTrackValuesSerializer(request.query_params.get('fields'))
+        paginator = SavedTracksPagination()
+        queryset = saved_tracks.for_user(request.user)
+        ordering = paginator.get_ordering(request, queryset, None)
+        queryset = queryset.values(*dict.fromkeys([*serializer.columns, *[field.lstrip('-') for field in ordering]]))
+        rows = paginator.paginate_queryset(queryset, request)
+        return paginator.get_paginated_response(serializer.to_representation(rows))
+
+    try:
+        song_ids = _song_ids_param(request.data.get('song_ids') or [])
+    except (TypeError, ValueError):
+        song_ids = None
+    if not song_ids or len(song_ids) > SAVED_TRACKS_MAX_IDS:
+        return Response(
+            {'status': 'error', 'message': f'song_ids must be a list of 1 to {SAVED_TRACKS_MAX_IDS} song ids.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if request.method == 'DELETE':
+        return Response({'removed': saved_tracks.unsave(request.user, song_ids)})
+
+    known = set(Song.objects.filter(id__in=song_ids).values_list('id', flat=True))
+    missing = [song_id for song_id in song_ids if song_id not in known]
+    if missing:
+        return Response(
+            {'status': 'error', 'message': f'Unknown song id(s): {", ".join(map(str, missing[:20]))}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    saved = saved_tracks.save(request.user, song_ids)
+    return Response({'saved': len(saved), 'song_ids': saved}, status=status.HTTP_201_CREATED if saved else status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
 def get_stats_detailed_api(request):
     """
     API endpoint to get detailed statistics for a specific time range.
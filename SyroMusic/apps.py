@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class SyromusicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'SyroMusic'
+
+    def ready(self):
+        # Connect catalog signal handlers
+        from . import signals  # noqa: F401
+        # Apply the SQLite performance-mode pragmas to new connections
+        from . import sqlite_tuning  # noqa: F401
@@ -0,0 +1,228 @@
+"""
+Approximate nearest-neighbour artist similarity from genre vectors.
+
+Every artist seen in any user's top_artists_* lists becomes a sparse TF-IDF
+vector over its Spotify genres, plus the single words of those genres at half
+weight (so "indie rock" is close to "indie pop"). Cosine neighbours are found
+with random-hyperplane LSH: each of TABLES hash tables keys an artist by the
+signs of BITS random projections, artists sharing a bucket in any table are
+candidates, and candidates are re-ranked by exact cosine similarity. A
+periodic task rebuilds the index file; queries need no Spotify call.
+
+Requires numpy and scipy; without them is_available() is False.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import UserListeningStats
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # Optional: similar-artist lookups are disabled without them
+    np = None
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+TABLES = 48
+BITS = 10
+WORD_WEIGHT = 0.5
+SEED = 1234
+
+
+def is_available():
+    return np is not None
+
+
+def collect_artists():
+    """{spotify artist id: {'name', 'image', 'genres'}} across all users' top artists."""
+    artists = {}
+    for lists in UserListeningStats.objects.values_list(
+        'top_artists_short_term', 'top_artists_medium_term', 'top_artists_long_term'
+    ).iterator(chunk_size=500):
+        for top_artists in lists:
+            for artist in top_artists or []:
+                if not artist.get('id'):
+                    continue
+                entry = artists.setdefault(artist['id'], {'name': artist.get('name', ''), 'image': artist.get('image'), 'genres': set()})
+                entry['genres'].update(genre.lower() for genre in artist.get('genres') or [])
+    return artists
+
+
+def genre_features(genres):
+    """Weighted features of a genre list: whole genres, plus their words at WORD_WEIGHT."""
+    features = {}
+    for genre in genres:
+        features[genre] = 1.0
+        for word in genre.replace('-', ' ').split():
+            if word != genre:
+                features.setdefault(f'~{word}', WORD_WEIGHT)
+    return features
+
+
+def embed(artists):
+    """Artist ids and their L2-normalised TF-IDF genre vectors (artists without genres dropped)."""
+    ids = [artist_id for artist_id, artist in artists.items() if artist['genres']]
+    per_artist = [genre_features(artists[artist_id]['genres']) for artist_id in ids]
+
+    document_frequency = defaultdict(int)
+    for features in per_artist:
+        for feature in features:
+            document_frequency[feature] += 1
+    vocabulary = {feature: i for i, feature in enumerate(document_frequency)}
+
+    rows, cols, values = [], [], []
+    for row, features in enumerate(per_artist):
+        for feature, weight in features.items():
+            rows.append(row)
+            cols.append(vocabulary[feature])
+            values.append(weight * (math.log(len(ids) / document_frequency[feature]) + 1))
+    vectors = sparse.csr_matrix(
+        (np.array(values, dtype=np.float32), (rows, cols)), shape=(len(ids), len(vocabulary))
+    )
+    norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+    vectors = sparse.diags(1.0 / np.maximum(norms, 1e-12)).astype(np.float32) @ vectors
+    return ids, vectors.tocsr()
+
+
+def hash_codes(vectors):
+    """TABLES bucket codes per row from the signs of random projections."""
+    rng = np.random.default_rng(SEED)
+    planes = rng.standard_normal((vectors.shape[1], TABLES * BITS)).astype(np.float32)
+    signs = np.asarray(vectors @ planes) > 0
+    weights = (1 << np.arange(BITS)).astype(np.int32)
+    return (signs.reshape(len(signs), TABLES, BITS) * weights).sum(axis=2).astype(np.int32)
+
+
+class ArtistIndex:
+    """LSH tables over artist genre vectors, with exact cosine re-ranking."""
+
+    def __init__(self, ids, names, images, genres, vectors, codes):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.images = list(images)
+        self.genres = list(genres)
+        self.lookup = {artist_id: i for i, artist_id in enumerate(self.ids)}
+        self.vectors = vectors
+        self.codes = codes
+        # Per table: artists sorted by bucket code, for searchsorted lookups
+        self.order = np.argsort(codes, axis=0, kind='stable').T
+        self.sorted_codes = np.take_along_axis(codes, self.order.T, axis=0).T
+
+    @classmethod
+    def build(cls):
+        artists = collect_artists()
+        ids, vectors = embed(artists)
+        codes = hash_codes(vectors) if ids else np.zeros((0, TABLES), dtype=np.int32)
+        return cls(
+            ids,
+            [artists[artist_id]['name'] for artist_id in ids],
+            [artists[artist_id]['image'] or '' for artist_id in ids],
+            ['|'.join(sorted(artists[artist_id]['genres'])) for artist_id in ids],
+            vectors,
+            codes,
+        )
+
+    def candidates(self, i):
+        found = []
+        for table in range(TABLES):
+            code = self.codes[i, table]
+            keys = self.sorted_codes[table]
+            start, end = np.searchsorted(keys, code, 'left'), np.searchsorted(keys, code, 'right')
+            found.append(self.order[table, start:end])
+        return np.unique(np.concatenate(found)) if found else np.array([], dtype=np.int64)
+
+    def similar(self, artist_id, k=10):
+        """[(index, cosine similarity), ...] of the k most similar artists, best first."""
+        i = self.lookup.get(artist_id)
+        if i is None:
+            return []
+        candidates = self.candidates(i)
+        candidates = candidates[candidates != i]
+        if len(candidates) < k:
+            # Sparse buckets: fall back to an exact scan
+            candidates = np.delete(np.arange(len(self.ids)), i)
+        if not len(candidates):
+            return []
+        scores = np.asarray((self.vectors[candidates] @ self.vectors[i].T).todense()).ravel()
+        best = np.argsort(-scores)[:k]
+        return [(int(candidates[j]), float(scores[j])) for j in best if scores[j] > 0]
+
+    def describe(self, i):
+        return {
+            'id': self.ids[i],
+            'name': self.names[i],
+            'image': self.images[i] or None,
+            'genres': self.genres[i].split('|') if self.genres[i] else [],
+        }
+
+    def save(self, path):
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                ids=np.array(self.ids, dtype=str),
+                names=np.array(self.names, dtype=str),
+                images=np.array(self.images, dtype=str),
+                genres=np.array(self.genres, dtype=str),
+                data=self.vectors.data, indices=self.vectors.indices, indptr=self.vectors.indptr,
+                shape=np.array(self.vectors.shape),
+                codes=self.codes,
+            )
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            vectors = sparse.csr_matrix(
+                (data['data'], data['indices'], data['indptr']), shape=tuple(data['shape'])
+            )
+            return cls(
+                data['ids'].tolist(), data['names'].tolist(), data['images'].tolist(),
+                data['genres'].tolist(), vectors, data['codes'],
+            )
+
+
+def rebuild():
+    """Rebuild the index from current listening stats and save it."""
+    index = ArtistIndex.build()
+    index.save(settings.ARTIST_SIMILARITY_PATH)
+    return index
+
+
+_index = None
+_index_mtime = None
+_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """This process's artist index, reloaded when the index file changes."""
+    global _index, _index_mtime, _checked_at
+    if not is_available():
+        return None
+
+    now = time.time()
+    if now - _checked_at < getattr(settings, 'ARTIST_SIMILARITY_RELOAD_INTERVAL', 60):
+        return _index
+
+    with _index_lock:
+        _checked_at = now
+        path = settings.ARTIST_SIMILARITY_PATH
+        try:
+            if os.path.exists(path) and os.path.getmtime(path) != _index_mtime:
+                _index = ArtistIndex.load(path)
+                _index_mtime = os.path.getmtime(path)
+                logger.info(f"Loaded artist similarity index from {path}: {len(_index.ids)} artists")
+        except Exception as e:
+            logger.error(f"Error loading artist similarity index: {str(e)}")
+        return _index
@@ -0,0 +1,226 @@
+"""
+Audio-features store with vectorized similarity and mood queries.
+
+Spotify audio features are fetched 100 tracks per request for the local
+catalog and users' top tracks, and stored one row per track as a packed
+float32 vector (TrackAudioFeatures.vector). Each process loads them into a
+single (tracks x features) numpy matrix, so range filters ("tempo 120-130",
+"energetic") are boolean masks and "like these tracks" is a distance to the
+seeds' centroid over standardised features: a few milliseconds for hundreds
+of thousands of tracks.
+
+Requires numpy; without it is_available() is False.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Song, TrackAudioFeatures, UserListeningStats
+
+try:
+    import numpy as np
+except ImportError:  # Optional: audio-feature queries are disabled without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+FEATURES = (
+    'danceability', 'energy', 'key', 'loudness', 'mode', 'speechiness',
+    'acousticness', 'instrumentalness', 'liveness', 'valence', 'tempo',
+)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}
+# Key and mode are categorical, so they are left out of "sounds like" distances
+SIMILARITY_FEATURES = tuple(
+    FEATURE_INDEX[name] for name in FEATURES if name not in ('key', 'mode')
+)
+BATCH_SIZE = 100  # Spotify's limit per audio-features request
+NO_FEATURES = b''  # TrackAudioFeatures.vector of a track Spotify has no features for
+RETRY_MISSING_AFTER = timedelta(days=30)
+
+MOODS = {
+    'energetic': {'energy': (0.7, 1.0)},
+    'chill': {'energy': (0.0, 0.45), 'acousticness': (0.4, 1.0)},
+    'happy': {'valence': (0.6, 1.0)},
+    'sad': {'valence': (0.0, 0.35)},
+    'danceable': {'danceability': (0.7, 1.0)},
+    'focus': {'instrumentalness': (0.5, 1.0), 'speechiness': (0.0, 0.1)},
+    'acoustic': {'acousticness': (0.7, 1.0)},
+}
+
+
+def is_available():
+    return np is not None
+
+
+def pack(features):
+    """Pack a Spotify audio-features object into TrackAudioFeatures.vector bytes."""
+    return np.array([features.get(name) or 0.0 for name in FEATURES], dtype=np.float32).tobytes()
+
+
+def unpack(vector):
+    return dict(zip(FEATURES, np.frombuffer(bytes(vector), dtype=np.float32).tolist()))
+
+
+# ============================================================
+# Ingestion
+# ============================================================
+
+def candidate_ids(limit=None):
+    """Spotify ids of catalog songs and users' top tracks that have no features yet."""
+    ids = set(Song.objects.exclude(spotify_id__isnull=True).exclude(spotify_id='').values_list('spotify_id', flat=True))
+    for lists in UserListeningStats.objects.values_list(
+        'top_tracks_short_term', 'top_tracks_medium_term', 'top_tracks_long_term'
+    ).iterator(chunk_size=500):
+        for tracks in lists:
+            ids.update(track.get('id') for track in tracks or [] if track.get('id'))
+
+    # Tracks Spotify had no features for are retried only after RETRY_MISSING_AFTER
+    known = set(
+        TrackAudioFeatures.objects.exclude(vector=NO_FEATURES, updated_at__lt=timezone.now() - RETRY_MISSING_AFTER)
+        .values_list('spotify_id', flat=True)
+    )
+    missing = sorted(ids - known)
+    return missing[:limit] if limit else missing
+
+
+def ingest(sp, spotify_ids):
+    """
+    Fetch and store audio features for spotify_ids, BATCH_SIZE per request,
+    several requests at a time. Tracks Spotify returns no features for get a
+    NO_FEATURES row, so they don't stay at the front of candidate_ids().
+    Returns the number of tracks stored.
+    """
+    chunks = [spotify_ids[i:i + BATCH_SIZE] for i in range(0, len(spotify_ids), BATCH_SIZE)]
+    stored = 0
+    # A handful of requests in flight at once keeps clear of rate limits
+    for i in range(0, len(chunks), 4):
+        requested = chunks[i:i + 4]
+        fetched = sp.batch({
+            n: (sp.sp.audio_features, {'tracks': chunk})
+            for n, chunk in enumerate(requested)
+        })
+        rows = []
+        for n, outcome in fetched.items():
+            if outcome['status'] != 'ok':
+                continue  # Failed requests are retried on the next run
+            found = {features['id']: features for features in outcome['result'] or [] if features}
+            rows += [
+                TrackAudioFeatures(
+                    spotify_id=spotify_id,
+                    vector=pack(found[spotify_id]) if spotify_id in found else NO_FEATURES,
+                )
+                for spotify_id in requested[n]
+            ]
+            stored += len(found)
+        TrackAudioFeatures.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['spotify_id'], update_fields=['vector', 'updated_at'],
+        )
+    return stored
+
+
+# ============================================================
+# Queries
+# ============================================================
+
+class FeatureStore:
+    """All stored audio features as one float32 matrix."""
+
+    def __init__(self, ids, matrix):
+        self.ids = ids
+        self.lookup = {spotify_id: i for i, spotify_id in enumerate(ids)}
+        self.matrix = matrix
+        similar = matrix[:, SIMILARITY_FEATURES]
+        self.mean = similar.mean(axis=0) if len(ids) else similar.sum(axis=0)
+        self.std = similar.std(axis=0) + 1e-6 if len(ids) else similar.sum(axis=0) + 1
+        self.standardized = (similar - self.mean) / self.std
+
+    @classmethod
+    def load(cls):
+        ids = []
+        vectors = []
+        for spotify_id, vector in TrackAudioFeatures.objects.exclude(vector=NO_FEATURES).values_list('spotify_id', 'vector').order_by().iterator(chunk_size=10000):
+            ids.append(spotify_id)
+            vectors.append(bytes(vector))
+        matrix = np.frombuffer(b''.join(vectors), dtype=np.float32).reshape(len(ids), len(FEATURES))
+        return cls(ids, matrix)
+
+    def mask(self, mood=None, ranges=None):
+        """Boolean mask of tracks inside every (low, high) range, mood presets included."""
+        conditions = dict(MOODS.get(mood, {}))
+        conditions.update(ranges or {})
+        selected = np.ones(len(self.ids), dtype=bool)
+        for name, (low, high) in conditions.items():
+            column = self.matrix[:, FEATURE_INDEX[name]]
+            if low is not None:
+                selected &= column >= low
+            if high is not None:
+                selected &= column <= high
+        return selected
+
+    def query(self, like=(), mood=None, ranges=None, k=20, exclude=()):
+        """
+        Up to k tracks inside the ranges, closest first to the centroid of the
+        `like` tracks when given. Returns [(spotify_id, distance or None), ...].
+        """
+        selected = self.mask(mood, ranges)
+        for spotify_id in list(like) + list(exclude):
+            i = self.lookup.get(spotify_id)
+            if i is not None:
+                selected[i] = False
+        candidates = np.flatnonzero(selected)
+
+        seeds = [self.lookup[spotify_id] for spotify_id in like if spotify_id in self.lookup]
+        if not seeds:
+            return [(self.ids[i], None) for i in candidates[:k]]
+
+        centroid = self.standardized[seeds].mean(axis=0)
+        distances = np.sqrt(((self.standardized[candidates] - centroid) ** 2).sum(axis=1))
+        if len(candidates) > k:
+            nearest = np.argpartition(distances, k)[:k]
+        else:
+            nearest = np.arange(len(candidates))
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(self.ids[candidates[i]], float(distances[i])) for i in nearest]
+
+    def features(self, spotify_id):
+        i = self.lookup.get(spotify_id)
+        return None if i is None else dict(zip(FEATURES, self.matrix[i].tolist()))
+
+
+_store = None
+_store_state = None
+_checked_at = 0.0
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """This process's feature matrix, reloaded when stored features change."""
+    global _store, _store_state, _checked_at
+    if not is_available():
+        return None
+
+    now = time.time()
+    if _store is not None and now - _checked_at < getattr(settings, 'AUDIO_FEATURES_RELOAD_INTERVAL', 60):
+        return _store
+
+    with _store_lock:
+        if _store is not None and now - _checked_at < getattr(settings, 'AUDIO_FEATURES_RELOAD_INTERVAL', 60):
+            return _store
+        _checked_at = now
+        try:
+            state = TrackAudioFeatures.objects.exclude(vector=NO_FEATURES).aggregate(
+                count=Count('id'), latest=Max('updated_at')
+            )
+            if state != _store_state:
+                _store = FeatureStore.load()
+                _store_state = state
+                logger.info(f"Loaded audio features for {len(_store.ids)} tracks")
+        except Exception as e:
+            logger.error(f"Error loading audio features: {str(e)}")
+        return _store
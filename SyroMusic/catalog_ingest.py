@@ -0,0 +1,240 @@
+"""
+Write-through catalog warming from Spotify track payloads.
+
+Tracks seen in Spotify search results, top tracks and recently played are
+bulk-upserted into the local Artist/Album/Song tables keyed by spotify_id, so
+later searches for the same music are answered locally. Web requests only
+enqueue compacted payloads; the writes happen in batches in a Celery task.
+"""
+
+import logging
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Artist, Album, Song
+from . import search_cache, search_index, typeahead
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+KNOWN_TRACK_TTL = 24 * 60 * 60  # Skip re-enqueueing tracks ingested within a day
+
+
+def _known_key(spotify_id):
+    return f'catalog:known:{spotify_id}'
+
+
+def compact_track(track):
+    """Reduce a Spotify track object to the fields the catalog stores, or None."""
+    if not track or not track.get('id') or not track.get('album'):
+        return None
+    album = track['album']
+    artists = album.get('artists') or track.get('artists') or []
+    if not album.get('id') or not artists or not artists[0].get('id'):
+        return None
+    return {
+        'id': track['id'],
+        'name': track.get('name') or 'Unknown',
+        'duration_ms': track.get('duration_ms') or 0,
+        'track_number': track.get('track_number'),
+        'album': {
+            'id': album['id'],
+            'name': album.get('name') or 'Unknown Album',
+            'release_date': album.get('release_date') or '',
+            'cover_url': album['images'][0].get('url') if album.get('images') else None,
+        },
+        'artist': {
+            'id': artists[0]['id'],
+            'name': artists[0].get('name') or 'Unknown Artist',
+        },
+    }
+
+
+def parse_release_date(value):
+    """Parse Spotify's year, year-month or full release_date; None if unusable."""
+    parts = (value or '').split('-')
+    try:
+        year = int(parts[0])
+        month = int(parts[1]) if len(parts) > 1 else 1
+        day = int(parts[2]) if len(parts) > 2 else 1
+        return date(year, month, day)
+    except (ValueError, IndexError):
+        return None
+
+
+def enqueue_tracks(tracks):
+    """
+    Queue Spotify track objects for background ingestion.
+    Tracks ingested recently are filtered out with one cache round trip.
+    """
+    compact = {}
+    for track in tracks:
+        item = compact_track(track)
+        if item:
+            compact[item['id']] = item
+    if not compact:
+        return 0
+
+    try:
+        known = cache.get_many([_known_key(spotify_id) for spotify_id in compact])
+    except Exception:
+        known = {}
+    pending = [item for spotify_id, item in compact.items() if _known_key(spotify_id) not in known]
+    if not pending:
+        return 0
+
+    from .tasks import ingest_spotify_tracks
+    ingest_spotify_tracks.delay(pending)
+    return len(pending)
+
+
+def upsert_tracks(tracks):
+    """
+    Upsert compacted tracks (see compact_track) into the catalog in batches.
+    Returns {spotify track id: Song id}.
+    """
+    unique = {}
+    for item in tracks:
+        if item and item.get('id') and parse_release_date(item['album']['release_date']):
+            unique[item['id']] = item
+    items = list(unique.values())
+
+    song_ids = {}
+    changed = False
+    for i in range(0, len(items), BATCH_SIZE):
+        batch = items[i:i + BATCH_SIZE]
+        with transaction.atomic():
+            artist_ids, new_artists = _upsert_artists(batch)
+            album_ids, new_albums = _upsert_albums(batch, artist_ids)
+            batch_song_ids, new_songs = _upsert_songs(batch, album_ids)
+            # bulk_create() sends no signals, so update derived search data here
+            search_index.get_backend().index_many(new_artists, new_albums, new_songs)
+        if new_artists or new_albums or new_songs:
+            typeahead.refresh_objects(new_artists, new_albums, new_songs)
+            changed = True
+        song_ids.update(batch_song_ids)
+
+    # Re-ingesting known tracks must not invalidate every cached search
+    if changed:
+        search_cache.bump_local_generation()
+    if items:
+        cache.set_many({_known_key(spotify_id): 1 for spotify_id in unique}, KNOWN_TRACK_TTL)
+    return song_ids
+
+
+def _upsert_artists(batch):
+    """Return ({spotify artist id: Artist id}, ids of created or adopted artists)."""
+    wanted = {item['artist']['id']: item['artist']['name'] for item in batch}
+    ids = dict(
+        Artist.objects.filter(spotify_id__in=wanted).values_list('spotify_id', 'id')
+    )
+    missing = {spotify_id: name for spotify_id, name in wanted.items() if spotify_id not in ids}
+    if not missing:
+        return ids, []
+
+    # Artist names are unique: reuse a same-named artist, claiming it if it has no spotify_id
+    changed = []
+    by_name = {artist.name: artist for artist in Artist.objects.filter(name__in=missing.values())}
+    for spotify_id, name in list(missing.items()):
+        artist = by_name.get(name)
+        if artist:
+            if not artist.spotify_id:
+                artist.spotify_id = spotify_id
+                Artist.objects.filter(id=artist.id, spotify_id__isnull=True).update(spotify_id=spotify_id)
+                changed.append(artist.id)
+            ids[spotify_id] = artist.id
+            del missing[spotify_id]
+
+    to_create = {}
+    for spotify_id, name in missing.items():
+        to_create.setdefault(name, Artist(name=name, spotify_id=spotify_id, biography=''))
+    Artist.objects.bulk_create(to_create.values(), ignore_conflicts=True)
+
+    created = Artist.objects.filter(name__in=list(to_create)).values_list('name', 'id', 'spotify_id')
+    name_ids = {}
+    for name, artist_id, spotify_id in created:
+        name_ids[name] = artist_id
+        if spotify_id:
+            ids[spotify_id] = artist_id
+        changed.append(artist_id)
+    for spotify_id, name in missing.items():
+        if spotify_id not in ids and name in name_ids:
+            ids[spotify_id] = name_ids[name]
+    return ids, changed
+
+
+def _upsert_albums(batch, artist_ids):
+    """Return ({spotify album id: Album id}, ids of created or updated albums)."""
+    wanted = {}
+    for item in batch:
+        if item['artist']['id'] in artist_ids:
+            wanted[item['album']['id']] = (item['album'], artist_ids[item['artist']['id']])
+
+    existing = {album.spotify_id: album for album in Album.objects.filter(spotify_id__in=wanted)}
+    changed = []
+    to_update = []
+    for spotify_id, album in existing.items():
+        payload = wanted[spotify_id][0]
+        if payload['cover_url'] and album.cover_url != payload['cover_url']:
+            album.cover_url = payload['cover_url']
+            to_update.append(album)
+    Album.objects.bulk_update(to_update, ['cover_url'])
+    changed.extend(album.id for album in to_update)
+
+    to_create = [
+        Album(
+            spotify_id=spotify_id,
+            title=payload['name'],
+            artist_id=artist_id,
+            release_date=parse_release_date(payload['release_date']),
+            cover_url=payload['cover_url'],
+        )
+        for spotify_id, (payload, artist_id) in wanted.items()
+        if spotify_id not in existing
+    ]
+    Album.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    ids = dict(Album.objects.filter(spotify_id__in=wanted).values_list('spotify_id', 'id'))
+    before = {album.id for album in existing.values()}
+    changed.extend(album_id for album_id in ids.values() if album_id not in before)
+    return ids, changed
+
+
+def _upsert_songs(batch, album_ids):
+    """Return ({spotify track id: Song id}, ids of created or updated songs)."""
+    wanted = {item['id']: item for item in batch if item['album']['id'] in album_ids}
+
+    existing = {song.spotify_id: song for song in Song.objects.filter(spotify_id__in=wanted)}
+
+    to_update = []
+    for spotify_id, song in existing.items():
+        item = wanted[spotify_id]
+        duration = timedelta(milliseconds=item['duration_ms'])
+        if (song.title, song.duration, song.track_number) != (item['name'], duration, item['track_number']):
+            song.title = item['name']
+            song.duration = duration
+            song.track_number = item['track_number']
+            to_update.append(song)
+    Song.objects.bulk_update(to_update, ['title', 'duration', 'track_number'])
+
+    to_create = [
+        Song(
+            spotify_id=spotify_id,
+            title=item['name'],
+            album_id=album_ids[item['album']['id']],
+            duration=timedelta(milliseconds=item['duration_ms']),
+            track_number=item['track_number'],
+        )
+        for spotify_id, item in wanted.items()
+        if spotify_id not in existing
+    ]
+    # A concurrent ingest may insert the same tracks first; keep its rows
+    Song.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    ids = dict(Song.objects.filter(spotify_id__in=wanted).values_list('spotify_id', 'id'))
+    before = {song.id for song in existing.values()}
+    changed = [song.id for song in to_update]
+    changed.extend(song_id for song_id in ids.values() if song_id not in before)
+    return ids, changed
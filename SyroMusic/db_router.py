@@ -0,0 +1,61 @@
+"""
+Primary/replica database routing.
+
+All writes, and by default all reads, go to the primary ('default'), so a
+request always reads its own writes and Celery sync tasks never read stale
+rows. Analytics views opt in to the read replica with @replica_reads (or
+`with use_replica():`); their queries then go to DATABASES['replica'] when
+one is configured, and to the primary otherwise.
+
+The choice is held in a context variable, so it follows the request in
+threaded and async servers alike.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+REPLICA = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def use_replica():
+    """Send reads inside the block to the replica."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_reads(view):
+    """View decorator: the view's reads go to the replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """Writes to the primary; reads to the replica only inside use_replica()."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica follows the primary through replication, not migrations
+        return db == 'default'
@@ -0,0 +1,202 @@
+"""
+In-process trigram index for typo-tolerant catalog search.
+
+Every artist name, album title (plus artist) and song title (plus artist) is
+split into padded character trigrams, so "beatls" still shares most trigrams
+with "beatles". An inverted index maps each trigram to the documents that
+contain it.
+
+Candidate generation is bounded: a document can only reach the similarity
+threshold if it shares at least min_overlap of the query's trigrams, so only
+the rarest len(query_trigrams) - min_overlap + 1 posting lists have to be
+scanned (prefix filtering), capped at FUZZY_MAX_POSTINGS entries. At most
+FUZZY_MAX_CANDIDATES of the best candidates are then scored exactly.
+
+The index holds only ids and normalised text; search_views hydrates results
+from the database. It is built in a background thread on first use and
+rebuilt every FUZZY_MAX_AGE seconds, so new catalog entries become fuzzily
+findable after a short delay (exact prefix matches are served by the
+typeahead index straight away).
+"""
+
+import heapq
+import logging
+import math
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Artist, Album, Song
+from .typeahead import normalize
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('artist', 'album', 'song')
+MAX_QUERY_TRIGRAMS = 32
+LENGTH_PENALTY = 0.1  # Weight of a document's unmatched trigrams in the score
+
+
+def trigrams(text):
+    """Padded trigrams of each word of the normalised text, as a set."""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(query_grams, doc_grams):
+    """
+    Share of the query's trigrams found in the document, lightly penalised
+    by the document's extra trigrams so shorter names rank first.
+    """
+    overlap = len(query_grams & doc_grams)
+    if not overlap:
+        return 0.0
+    return overlap / (len(query_grams) + LENGTH_PENALTY * (len(doc_grams) - overlap))
+
+
+class FuzzyIndex:
+    """Trigram inverted index over one or more kinds of documents."""
+
+    def __init__(self):
+        self.ids = {kind: array('I') for kind in KINDS}
+        self.texts = {kind: [] for kind in KINDS}
+        self.postings = {kind: defaultdict(lambda: array('I')) for kind in KINDS}
+        self.loaded_at = time.time()
+
+    def add(self, kind, object_id, text):
+        doc = len(self.ids[kind])
+        self.ids[kind].append(object_id)
+        self.texts[kind].append(text)
+        postings = self.postings[kind]
+        for gram in trigrams(text):
+            postings[gram].append(doc)
+
+    def freeze(self):
+        # Plain dicts, so lookups for unknown trigrams don't grow the index
+        self.postings = {kind: dict(postings) for kind, postings in self.postings.items()}
+        return self
+
+    @property
+    def size(self):
+        return sum(len(ids) for ids in self.ids.values())
+
+    def search(self, query, kind, limit=10, threshold=None):
+        """Return [(object_id, score), ...] best first, for scores >= threshold."""
+        if threshold is None:
+            threshold = getattr(settings, 'FUZZY_MIN_SIMILARITY', 0.5)
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        postings = self.postings[kind]
+
+        # Rarest trigrams first; unknown trigrams have empty posting lists
+        ranked = sorted(query_grams, key=lambda gram: len(postings.get(gram, ())))[:MAX_QUERY_TRIGRAMS]
+        query_grams = set(ranked)
+        min_overlap = max(1, math.ceil(threshold * len(query_grams)))
+
+        # Prefix filter: any match shares at least one of these trigrams
+        budget = getattr(settings, 'FUZZY_MAX_POSTINGS', 50000)
+        hits = defaultdict(int)
+        for gram in ranked[:len(ranked) - min_overlap + 1]:
+            posting = postings.get(gram)
+            if not posting:
+                continue
+            if len(posting) > budget:
+                break
+            budget -= len(posting)
+            for doc in posting:
+                hits[doc] += 1
+        if not hits:
+            return []
+
+        max_candidates = getattr(settings, 'FUZZY_MAX_CANDIDATES', 500)
+        candidates = heapq.nlargest(max_candidates, hits, key=hits.__getitem__)
+
+        texts = self.texts[kind]
+        ids = self.ids[kind]
+        scored = []
+        for doc in candidates:
+            score = similarity(query_grams, trigrams(texts[doc]))
+            if score >= threshold:
+                scored.append((score, -len(texts[doc]), ids[doc]))
+        return [(object_id, score) for score, _, object_id in heapq.nlargest(limit, scored)]
+
+
+def build_index():
+    """Build a fuzzy index of the whole catalog."""
+    index = FuzzyIndex()
+    for artist_id, name in Artist.objects.values_list('id', 'name').order_by().iterator(chunk_size=5000):
+        index.add('artist', artist_id, name or '')
+    for album_id, title, artist_name in Album.objects.values_list(
+        'id', 'title', 'artist__name'
+    ).order_by().iterator(chunk_size=5000):
+        index.add('album', album_id, f'{title or ""} {artist_name or ""}')
+    for song_id, title, artist_name in Song.objects.values_list(
+        'id', 'title', 'album__artist__name'
+    ).order_by().iterator(chunk_size=5000):
+        index.add('song', song_id, f'{title or ""} {artist_name or ""}')
+    return index.freeze()
+
+
+# ============================================================
+# Process-wide index
+# ============================================================
+
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = False
+_failed_at = 0.0
+
+
+def is_enabled():
+    return getattr(settings, 'FUZZY_SEARCH_ENABLED', True)
+
+
+def _rebuild():
+    global _index, _rebuilding, _failed_at
+    try:
+        started = time.time()
+        index = build_index()
+        _index = index
+        logger.info(f"Built fuzzy search index: {index.size} documents in {time.time() - started:.2f}s")
+    except Exception as e:
+        _failed_at = time.time()
+        logger.error(f"Error building fuzzy search index: {str(e)}")
+    finally:
+        _rebuilding = False
+        connection.close()
+
+
+def get_index():
+    """
+    Return this process's fuzzy index, or None until the first build in the
+    background finishes. A stale index keeps serving while its replacement
+    is built; a failed build is retried after FUZZY_RETRY_AFTER.
+    """
+    global _rebuilding
+    if not is_enabled():
+        return None
+
+    index = _index
+    now = time.time()
+    due = index is None or now - index.loaded_at > getattr(settings, 'FUZZY_MAX_AGE', 600)
+    if due and not _rebuilding and now - _failed_at > getattr(settings, 'FUZZY_RETRY_AFTER', 60):
+        with _index_lock:
+            if not _rebuilding:
+                _rebuilding = True
+                threading.Thread(target=_rebuild, name='fuzzy-index', daemon=True).start()
+    return index
+
+
+def reset_index():
+    """Drop this process's index so the next query rebuilds it."""
+    global _index, _failed_at
+    with _index_lock:
+        _index = None
+        _failed_at = 0.0
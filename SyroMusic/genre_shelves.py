@@ -0,0 +1,146 @@
+"""
+Precomputed genre shelves for browse_by_genre.
+
+The shelves are the same for every user, so a periodic task builds them once
+with the app's client-credentials token (or, without one, a connected user's
+token as a stand-in) and stores each build as a new GenreShelfSet version in
+the database and in the cache. The view reads the current version with a
+single cache get and only calls Spotify itself for genres the shared set is
+missing.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .models import GenreShelfSet
+from .services import TokenManager
+
+logger = logging.getLogger(__name__)
+
+GENRES = [
+    'pop', 'rock', 'hip-hop', 'r-n-b',
+    'electronic', 'indie', 'folk', 'country',
+    'jazz', 'classical', 'reggae', 'latin'
+]
+SHELF_SIZE = 5
+MAX_FAVORITE_GENRES = 20
+KEEP_VERSIONS = 3
+CACHE_KEY = 'genre_shelves:current'
+
+
+def compact_track(track):
+    """Keep only the track fields browse_genres.html renders."""
+    album = track.get('album') or {}
+    return {
+        'id': track.get('id', ''),
+        'name': track.get('name', ''),
+        'album': {'images': (album.get('images') or [])[:1]},
+        'artists': [{'name': artist.get('name', '')} for artist in (track.get('artists') or [])[:1]],
+    }
+
+
+def fetch_shelves(sp, genres):
+    """Fetch recommendation shelves for genres concurrently; failed genres are left out."""
+    fetched = sp.batch({
+        genre: (sp.sp.recommendations, {'seed_genres': [genre], 'limit': SHELF_SIZE})
+        for genre in genres
+    })
+    return {
+        genre: [compact_track(track) for track in fetched[genre]['result'].get('tracks', [])]
+        for genre in genres
+        if fetched[genre]['status'] == 'ok'
+    }
+
+
+def _payload(shelf_set):
+    return {'version': shelf_set.id, 'built_at': shelf_set.built_at.isoformat(), 'shelves': shelf_set.shelves}
+
+
+def build_shelves():
+    """
+    Build and publish a new shelf version. Genres that fail to load keep
+    their tracks from the previous version. Returns the new GenreShelfSet,
+    or None if nothing could be fetched.
+    """
+    sp, source = TokenManager.get_app_service()
+    if sp is None:
+        logger.warning("No Spotify token available to build genre shelves")
+        return None
+
+    tracks = fetch_shelves(sp, GENRES)
+    if not tracks:
+        return None
+
+    previous = GenreShelfSet.objects.first()
+    if previous:
+        for shelf in previous.shelves:
+            tracks.setdefault(shelf['genre'], shelf['tracks'])
+
+    shelf_set = GenreShelfSet.objects.create(
+        source=source,
+        shelves=[
+            {'genre': genre, 'name': genre.title(), 'tracks': tracks[genre]}
+            for genre in GENRES
+            if genre in tracks
+        ],
+    )
+    GenreShelfSet.objects.filter(
+        id__in=GenreShelfSet.objects.values_list('id', flat=True)[KEEP_VERSIONS:]
+    ).delete()
+
+    cache.set(CACHE_KEY, _payload(shelf_set), timeout=None)
+    return shelf_set
+
+
+def get_shelves():
+    """Current shelves as {'version', 'built_at', 'shelves'}, or None before the first build."""
+    payload = cache.get(CACHE_KEY)
+    if payload is None:
+        shelf_set = GenreShelfSet.objects.first()
+        if shelf_set is None:
+            return None
+        payload = _payload(shelf_set)
+        cache.set(CACHE_KEY, payload, timeout=None)
+    return payload
+
+
+def favorite_genres(top_artists, limit=MAX_FAVORITE_GENRES):
+    """
+    A user's favourite Spotify genres, best first, from their top artists'
+    genres: each artist counts for more the higher it ranks.
+    """
+    weights = defaultdict(int)
+    for rank, artist in enumerate(top_artists):
+        for genre in artist.get('genres') or []:
+            weights[genre.lower()] += len(top_artists) - rank
+    return sorted(weights, key=lambda genre: (-weights[genre], genre))[:limit]
+
+
+def _words(genre):
+    # 'hip-hop' ~ 'hip hop', 'r-n-b' ~ 'r&b'
+    return frozenset(genre.lower().replace('&', '-n-').replace('-', ' ').split())
+
+
+def personalize(shelves, sp=None, favorite_genres=()):
+    """
+    Per-user overlay on the shared shelves: shelves matching the user's
+    favourite genres come first, in favourite order (a shelf matches a
+    favourite that contains all its words, so "indie rock" ranks "rock" and
+    "indie"). Genres missing from the shared set are fetched live with the
+    user's own service (when given).
+    """
+    by_genre = {shelf['genre']: shelf for shelf in shelves}
+    missing = [genre for genre in GENRES if genre not in by_genre]
+    if missing and sp is not None:
+        for genre, tracks in fetch_shelves(sp, missing).items():
+            by_genre[genre] = {'genre': genre, 'name': genre.title(), 'tracks': tracks}
+
+    favorites = [_words(genre) for genre in favorite_genres]
+
+    def rank(shelf):
+        words = _words(shelf['genre'])
+        return next((i for i, favorite in enumerate(favorites) if words <= favorite), len(favorites))
+
+    return sorted((by_genre[genre] for genre in GENRES if genre in by_genre), key=rank)
@@ -0,0 +1,271 @@
+"""
+Index audit for the app's hot queries (manage.py audit_indexes).
+
+HOT_QUERIES registers the querysets behind the busiest pages and tasks, built
+from sample ids. audit() EXPLAINs each one (EXPLAIN QUERY PLAN on SQLite) and
+flags:
+
+    full scan       the whole table is read to answer the query
+    temp sort       rows are sorted after the fact (ORDER BY / GROUP BY)
+    partial search  an index is searched on fewer of the query's equality
+                    columns than it filters on (SQLite only)
+
+and, for flagged queries, proposes the composite index that would serve them:
+equality columns first, then the ORDER BY columns, then one range column.
+Filters on a constant (IS NULL, a boolean) become the condition of a partial
+index instead of columns.
+"""
+
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connections, models
+from django.db.models import Q
+from django.db.models.expressions import Col, OrderBy
+from django.db.models.lookups import Lookup
+from django.utils import timezone
+
+from . import saved_tracks
+from .models import (
+    Album, Playlist, PlaylistTrack, SavedTrack, Song, SpotifyUser, UserListeningActivity,
+)
+
+HOT_QUERIES = []  # (name, where it runs, factory(sample) -> queryset)
+
+_RANGE = ('gt', 'gte', 'lt', 'lte', 'range')
+_SQLITE_SEARCH = re.compile(r'SEARCH (\S+) USING (?:COVERING )?INDEX \S+ \((.*)\)')
+
+
+def hot_query(name, where):
+    """Register a queryset factory; it gets a dict of sample ids (see sample_ids())."""
+    def register(factory):
+        HOT_QUERIES.append((name, where, factory))
+        return factory
+    return register
+
+
+# Registry
+# ============================================================
+
+@hot_query('activity.recent', 'stats_dashboard, ListeningActivityViewSet.recent, get_recent_activity')
+def _activity_recent(sample):
+    return UserListeningActivity.objects.filter(user_id=sample['user']).only(
+        'track_name', 'artist_name', 'album_name', 'played_at', 'duration_ms'
+    ).order_by('-played_at')[:50]
+
+
+@hot_query('activity.page', 'ListeningActivityViewSet.list')
+def _activity_page(sample):
+    return UserListeningActivity.objects.filter(user_id=sample['user']).order_by('-played_at', '-id')[:20]
+
+
+@hot_query('activity.since', 'sync_user_recently_played (already-recorded plays)')
+def _activity_since(sample):
+    return UserListeningActivity.objects.filter(
+        user_id=sample['user'], played_at__gte=sample['since']
+    ).values_list('spotify_track_id', 'played_at')
+
+
+@hot_query('activity.recent_tracks', 'item_recommender.recommend_for_user')
+def _activity_recent_tracks(sample):
+    return UserListeningActivity.objects.filter(user_id=sample['user']).exclude(
+        spotify_track_id=''
+    ).values_list('spotify_track_id', flat=True)[:50]
+
+
+@hot_query('saved_tracks.contains', 'saved_tracks.contains')
+def _saved_contains(sample):
+    return SavedTrack.objects.filter(
+        user_id=sample['user'], song_id__in=sample['songs']
+    ).order_by().values_list('song_id', flat=True)
+
+
+@hot_query('saved_tracks.list', 'saved_track_list, saved_tracks_api GET')
+def _saved_list(sample):
+    return SavedTrack.objects.filter(user_id=sample['user']).order_by(*saved_tracks.ORDERING)[:20]
+
+
+@hot_query('playlists.list', 'playlist_list, PlaylistViewSet.list')
+def _playlists_list(sample):
+    return Playlist.objects.filter(user_id=sample['user']).order_by('-updated_at', '-id')[:20]
+
+
+@hot_query('playlist.tracks', 'PlaylistViewSet.tracks')
+def _playlist_tracks(sample):
+    return PlaylistTrack.objects.filter(playlist_id=sample['playlist']).order_by('position')[:50]
+
+
+@hot_query('songs.page', 'song_list, SongViewSet.list')
+def _songs_page(sample):
+    return Song.objects.select_related('album', 'album__artist').order_by('album_id', 'track_number', 'id')[:20]
+
+
+@hot_query('album.songs', 'album_detail')
+def _album_songs(sample):
+    return Song.objects.filter(album_id=sample['album']).order_by('track_number')
+
+
+@hot_query('albums.page', 'album_list, AlbumViewSet.list')
+def _albums_page(sample):
+    return Album.objects.select_related('artist').order_by('-release_date', '-id')[:20]
+
+
+@hot_query('spotify_users.connected', 'SpotifyService fallback token for catalog lookups')
+def _spotify_users_connected(sample):
+    return SpotifyUser.objects.filter(is_connected=True).order_by('-last_synced')[:5]
+
+
+def sample_ids():
+    """Ids of real rows where there are some, so the plans match production shapes."""
+    return {
+        'user': User.objects.order_by('id').values_list('id', flat=True).first() or 1,
+        'album': Album.objects.order_by('id').values_list('id', flat=True).first() or 1,
+        'playlist': Playlist.objects.order_by('id').values_list('id', flat=True).first() or 1,
+        'songs': list(Song.objects.order_by('id').values_list('id', flat=True)[:20]) or [1],
+        'since': timezone.now() - timedelta(days=1),
+    }
+
+
+# Analysis
+# ============================================================
+
+def _columns(queryset):
+    """
+    (equality fields, IN fields, range fields, partial conditions, order
+    fields) on the queryset's own table; order fields is None when no index
+    on the table can produce the ordering.
+    """
+    query = queryset.query
+    opts = query.model._meta
+    equality, lists, ranges, conditions = [], [], [], []
+    for child in query.where.children:
+        if not isinstance(child, Lookup) or not isinstance(child.lhs, Col):
+            continue
+        if child.lhs.alias != query.base_table:
+            continue
+        name = child.lhs.target.name
+        if child.lookup_name == 'isnull' or (child.lookup_name == 'exact' and isinstance(child.rhs, bool)):
+            key = name if child.lookup_name == 'exact' else f'{name}__{child.lookup_name}'
+            conditions.append(Q(**{key: child.rhs}))
+        elif child.lookup_name == 'exact':
+            equality.append(name)
+        elif child.lookup_name == 'in':
+            lists.append(name)
+        elif child.lookup_name in _RANGE:
+            ranges.append(name)
+
+    ordering = query.order_by or (opts.ordering if query.default_ordering else ())
+    order = []
+    for item in ordering:
+        if isinstance(item, OrderBy) and isinstance(getattr(item.expression, 'name', None), str):
+            item = ('-' if item.descending else '') + item.expression.name
+        if not isinstance(item, str) or '__' in item or item.lstrip('-') == '?':
+            return equality, lists, ranges, conditions, None  # ordered across tables
+        name = item.lstrip('-')
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+        if field.is_relation and field.related_model._meta.ordering and not name.endswith('_id'):
+            return equality, lists, ranges, conditions, None  # follows the related model's ordering
+        order.append(('-' if item.startswith('-') else '') + field.name)
+    return equality, lists, ranges, conditions, order
+
+
+def propose_index(queryset):
+    """The index that would serve the queryset, or None if no index on its table can."""
+    equality, lists, ranges, conditions, order = _columns(queryset)
+    if order is None:
+        return None
+    fields = list(dict.fromkeys(equality))
+    if lists:
+        # Several IN values break index order, so the sort stays; index the lookup itself
+        fields += [name for name in lists if name not in fields]
+    else:
+        for name in order:
+            if name.lstrip('-') not in fields:
+                fields.append(name)
+        bare = [name.lstrip('-') for name in fields]
+        fields += [name for name in ranges[:1] if name not in bare]
+    if not fields:
+        return None
+
+    index = models.Index(fields=fields)
+    index.set_name_with_model(queryset.model)
+    if conditions:
+        condition = conditions[0]
+        for q in conditions[1:]:
+            condition &= q
+        index = models.Index(fields=fields, name=index.name, condition=condition)
+    return index
+
+
+def existing_indexes(model):
+    """(columns, condition) of the indexes the model already has, leading column first."""
+    opts = model._meta
+    found = [([opts.pk.column], None)]
+    found += [([field.column], None) for field in opts.local_fields if field.db_index or field.unique]
+    found += [([opts.get_field(name).column for name in fields], None) for fields in opts.unique_together]
+    for index in list(opts.indexes) + [c for c in opts.constraints if getattr(c, 'fields', None)]:
+        found.append(([opts.get_field(name.lstrip('-')).column for name in index.fields], index.condition))
+    return found
+
+
+def _covered(index, model):
+    """Whether an existing index leads with the proposed columns (under the same condition)."""
+    wanted = [model._meta.get_field(name.lstrip('-')).column for name in index.fields]
+    return any(
+        columns[:len(wanted)] == wanted and condition == index.condition
+        for columns, condition in existing_indexes(model)
+    )
+
+
+def _problems(plan, queryset, vendor):
+    problems = []
+    table = queryset.model._meta.db_table
+    equality, lists = _columns(queryset)[:2]
+    equality = [queryset.model._meta.get_field(name).column for name in equality + lists]
+    for line in plan.splitlines():
+        detail = line.strip()
+        if vendor == 'sqlite':
+            # EXPLAIN QUERY PLAN rows come as "id parent notused detail"
+            detail = detail.split(' ', 3)[-1]
+            if detail.startswith('SCAN ') and 'INDEX' not in detail:
+                problems.append(('full scan', detail))
+            elif detail.startswith('USE TEMP B-TREE'):
+                problems.append(('temp sort', detail))
+            else:
+                match = _SQLITE_SEARCH.match(detail)
+                if match and match.group(1) == table:
+                    searched = re.findall(r'(\w+)\s*(?:=|>|<| IN)', match.group(2))
+                    unused = [column for column in equality if column not in searched]
+                    if unused:
+                        problems.append(('partial search', f"{detail}; filters {', '.join(unused)} row by row"))
+        else:
+            if 'Seq Scan on' in detail:
+                problems.append(('full scan', detail))
+            elif re.search(r'(^|->\s+)(Incremental )?Sort\b', detail):
+                problems.append(('temp sort', detail))
+    return problems
+
+
+def audit(using='default'):
+    """
+    EXPLAIN every registered query. Yields dicts with name, where, sql, plan,
+    problems [(kind, plan line)], proposal (models.Index or None) and covered
+    (an existing index already leads with the proposed columns).
+    """
+    vendor = connections[using].vendor
+    sample = sample_ids()
+    for name, where, factory in HOT_QUERIES:
+        queryset = factory(sample).using(using)
+        plan = queryset.explain()
+        problems = _problems(plan, queryset, vendor)
+        proposal = propose_index(queryset) if problems else None
+        yield {
+            'name': name,
+            'where': where,
+            'sql': str(queryset.query),
+            'plan': plan,
+            'problems': problems,
+            'proposal': proposal,
+            'covered': proposal is not None and _covered(proposal, queryset.model),
+        }
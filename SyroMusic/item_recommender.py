@@ -0,0 +1,387 @@
+"""
+Local item-to-item recommendations from UserListeningActivity.
+
+Plays are split into listening sessions (per user, a new session after
+SESSION_GAP without plays). With X the binary session x item matrix, the
+item co-occurrence counts are C = X.T @ X, and items are scored by cosine
+similarity C[i, j] / sqrt(C[i, i] * C[j, j]). Only the TOP_K best neighbours
+of each item are kept, in CSR form, so a recommendation is a handful of
+array slices. Tracks are keyed by Spotify track id, artists by lowercased
+name (activity rows carry no artist id).
+
+The raw co-occurrence counts are saved next to the neighbour index, so
+update_model() only sessionizes activity added since the last build and adds
+its counts. A session that straddles two builds is counted as two sessions.
+
+numpy and scipy are needed to build and query the model; without them
+is_available() is False and callers skip local recommendations.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+
+from .models import Song, UserListeningActivity
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # Optional: local recommendations are disabled without them
+    np = None
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+SESSION_GAP = timedelta(minutes=30)
+TOP_K = 50
+MIN_COOCCURRENCE = 1  # Raise on large catalogs to drop one-off pairs
+KINDS = ('track', 'artist')
+
+
+def is_available():
+    return np is not None and getattr(settings, 'ITEM_RECOMMENDER_ENABLED', True)
+
+
+def _artist_key(name):
+    return (name or '').strip().lower()
+
+
+# ============================================================
+# Building
+# ============================================================
+
+def _activity_rows(min_activity_id=0):
+    return UserListeningActivity.objects.filter(
+        id__gt=min_activity_id
+    ).exclude(spotify_track_id='').order_by('user_id', 'played_at').values_list(
+        'id', 'user_id', 'played_at', 'spotify_track_id', 'track_name', 'artist_name'
+    ).iterator(chunk_size=10000)
+
+
+def sessionize(rows):
+    """
+    Split (id, user_id, played_at, track_id, track_name, artist_name) rows,
+    ordered by user and time, into sessions.
+    Returns ({kind: [set of item keys per session]}, {track id: (name, artist)}, last id seen).
+    """
+    sessions = {kind: [] for kind in KINDS}
+    labels = {}
+    last_id = 0
+    current_user = current_tracks = current_artists = last_played = None
+    for activity_id, user_id, played_at, track_id, track_name, artist_name in rows:
+        last_id = max(last_id, activity_id)
+        if user_id != current_user or played_at - last_played > SESSION_GAP:
+            current_user = user_id
+            current_tracks = set()
+            current_artists = set()
+            sessions['track'].append(current_tracks)
+            sessions['artist'].append(current_artists)
+        last_played = played_at
+        current_tracks.add(track_id)
+        if _artist_key(artist_name):
+            current_artists.add(_artist_key(artist_name))
+        labels[track_id] = (track_name, artist_name)
+    return sessions, labels, last_id
+
+
+def cooccurrence(sessions, keys):
+    """
+    Add the co-occurrence counts of sessions (lists of item keys) to a key list.
+    Unknown keys are appended to keys in place. Returns C with C[i, i] the
+    number of sessions containing item i.
+    """
+    lookup = {key: i for i, key in enumerate(keys)}
+    session_index = []
+    item_index = []
+    for s, items in enumerate(sessions):
+        for key in items:
+            i = lookup.get(key)
+            if i is None:
+                i = lookup[key] = len(keys)
+                keys.append(key)
+            session_index.append(s)
+            item_index.append(i)
+
+    x = sparse.csr_matrix(
+        (np.ones(len(item_index), dtype=np.float32), (session_index, item_index)),
+        shape=(len(sessions), len(keys)),
+    )
+    return (x.T @ x).tocsr()
+
+
+def top_k_neighbours(counts, k=TOP_K, min_cooccurrence=MIN_COOCCURRENCE):
+    """Cosine-normalise co-occurrence counts and keep the k best neighbours per item."""
+    item_counts = counts.diagonal()
+    sim = counts.tocoo()
+    keep = (sim.row != sim.col) & (sim.data >= min_cooccurrence)
+    rows, cols, data = sim.row[keep], sim.col[keep], sim.data[keep]
+    scores = (data / np.sqrt(item_counts[rows] * item_counts[cols])).astype(np.float32)
+
+    # Sort by row, best score first, then keep each row's first k entries
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    row_starts = np.searchsorted(rows, np.arange(counts.shape[0]))
+    rank = np.arange(len(rows)) - row_starts[rows]
+    keep = rank < k
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+    indptr = np.zeros(counts.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=counts.shape[0]), out=indptr[1:])
+    return indptr, cols.astype(np.int32), scores
+
+
+class NeighbourIndex:
+    """Top-k neighbours of each item, stored as CSR arrays."""
+
+    def __init__(self, keys, indptr, indices, scores):
+        self.keys = list(keys)
+        self.lookup = {key: i for i, key in enumerate(self.keys)}
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+
+    def neighbours(self, key, limit=TOP_K):
+        i = self.lookup.get(key)
+        if i is None:
+            return []
+        start, end = self.indptr[i], min(self.indptr[i + 1], self.indptr[i] + limit)
+        return [(self.keys[j], float(score)) for j, score in zip(self.indices[start:end], self.scores[start:end])]
+
+    def recommend(self, seeds, limit=20, exclude=()):
+        """Items most similar to the seeds overall (summed similarity), best first."""
+        totals = defaultdict(float)
+        for seed in seeds:
+            for key, score in self.neighbours(seed):
+                totals[key] += score
+        skip = set(seeds) | set(exclude)
+        ranked = sorted((item for item in totals.items() if item[0] not in skip), key=lambda item: -item[1])
+        return ranked[:limit]
+
+
+class ItemModel:
+    """Track and artist neighbour indexes plus the counts needed for incremental updates."""
+
+    def __init__(self, keys, counts, labels, last_activity_id, built_at=None):
+        self.keys = keys          # {kind: [item key, ...]}
+        self.counts = counts      # {kind: csr co-occurrence counts}
+        self.labels = labels      # {track id: (track name, artist name)}
+        self.last_activity_id = last_activity_id
+        self.built_at = built_at or time.time()
+        self.indexes = {
+            kind: NeighbourIndex(keys[kind], *top_k_neighbours(counts[kind]))
+            for kind in KINDS
+        }
+
+    def save(self, path):
+        """Write the model atomically to path (numpy .npz)."""
+        arrays = {
+            'last_activity_id': np.array(self.last_activity_id, dtype=np.int64),
+            'built_at': np.array(self.built_at),
+            'label_ids': np.array(list(self.labels), dtype=str),
+            'label_names': np.array([name for name, _ in self.labels.values()], dtype=str),
+            'label_artists': np.array([artist for _, artist in self.labels.values()], dtype=str),
+        }
+        for kind in KINDS:
+            counts = self.counts[kind]
+            index = self.indexes[kind]
+            arrays.update({
+                f'{kind}_keys': np.array(self.keys[kind], dtype=str),
+                f'{kind}_counts_data': counts.data,
+                f'{kind}_counts_indices': counts.indices,
+                f'{kind}_counts_indptr': counts.indptr,
+                f'{kind}_indptr': index.indptr,
+                f'{kind}_indices': index.indices,
+                f'{kind}_scores': index.scores,
+            })
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            model = cls.__new__(cls)
+            model.last_activity_id = int(data['last_activity_id'])
+            model.built_at = float(data['built_at'])
+            model.labels = dict(zip(
+                data['label_ids'].tolist(),
+                zip(data['label_names'].tolist(), data['label_artists'].tolist()),
+            ))
+            model.keys, model.counts, model.indexes = {}, {}, {}
+            for kind in KINDS:
+                keys = data[f'{kind}_keys'].tolist()
+                model.keys[kind] = keys
+                model.counts[kind] = sparse.csr_matrix(
+                    (data[f'{kind}_counts_data'], data[f'{kind}_counts_indices'], data[f'{kind}_counts_indptr']),
+                    shape=(len(keys), len(keys)),
+                )
+                model.indexes[kind] = NeighbourIndex(
+                    keys, data[f'{kind}_indptr'], data[f'{kind}_indices'], data[f'{kind}_scores']
+                )
+        return model
+
+
+def build_model(rows=None):
+    """Build a model from all listening activity (or the given activity rows)."""
+    sessions, labels, last_id = sessionize(_activity_rows() if rows is None else rows)
+    keys = {kind: [] for kind in KINDS}
+    counts = {kind: cooccurrence(sessions[kind], keys[kind]) for kind in KINDS}
+    return ItemModel(keys, counts, labels, last_id)
+
+
+def update_model(model):
+    """Return a new model with activity added since model was built; model itself is unchanged."""
+    sessions, labels, last_id = sessionize(_activity_rows(model.last_activity_id))
+    if not labels:
+        return model
+
+    keys, counts = {}, {}
+    for kind in KINDS:
+        keys[kind] = list(model.keys[kind])
+        added = cooccurrence(sessions[kind], keys[kind])
+        old = model.counts[kind].copy()
+        old.resize(added.shape)
+        counts[kind] = (old + added).tocsr()
+    return ItemModel(keys, counts, {**model.labels, **labels}, last_id)
+
+
+def build_and_save(full=False):
+    """Incrementally update (or fully rebuild) the saved model. Returns the model."""
+    path = settings.ITEM_RECOMMENDER_PATH
+    if not full and os.path.exists(path):
+        model = update_model(ItemModel.load(path))
+    else:
+        model = build_model()
+    model.save(path)
+    return model
+
+
+def evaluate(k=10):
+    """
+    Offline leave-last-play-out evaluation: build from all plays except each
+    user's last one, then check whether that last play is among the top k
+    recommendations seeded by the user's previous 20 plays. Reports hit rate
+    against a most-played baseline, catalog coverage and build time.
+    """
+    rows = list(_activity_rows())
+    held_out = {}
+    for row in rows:
+        held_out[row[1]] = row  # Rows are ordered by user, time: keeps each user's last play
+    held_out_ids = {row[0] for row in held_out.values()}
+    train = [row for row in rows if row[0] not in held_out_ids]
+
+    started = time.perf_counter()
+    model = build_model(train)
+    build_seconds = time.perf_counter() - started
+
+    history = defaultdict(list)
+    for row in train:
+        history[row[1]].append(row[3])
+    index = model.indexes['track']
+    popularity = model.counts['track'].diagonal()
+    most_played = [index.keys[i] for i in np.argsort(-popularity)[:k + 50]]
+
+    users = hits = baseline_hits = 0
+    recommended = set()
+    started = time.perf_counter()
+    for user_id, row in held_out.items():
+        seeds = history[user_id][-20:]
+        if not seeds:
+            continue
+        users += 1
+        ranked = [key for key, _ in index.recommend(seeds, limit=k, exclude=history[user_id])]
+        recommended.update(ranked)
+        hits += row[3] in ranked
+        seen = set(history[user_id])
+        baseline_hits += row[3] in [key for key in most_played if key not in seen][:k]
+    query_ms = (time.perf_counter() - started) * 1000 / max(users, 1)
+
+    return {
+        'users': users,
+        'k': k,
+        'hit_rate': hits / users if users else 0.0,
+        'baseline_hit_rate': baseline_hits / users if users else 0.0,
+        'coverage': len(recommended) / len(index.keys) if index.keys else 0.0,
+        'tracks': len(index.keys),
+        'build_seconds': build_seconds,
+        'query_ms': query_ms,
+    }
+
+
+# ============================================================
+# Process-wide model for views
+# ============================================================
+
+_model = None
+_model_mtime = None
+_checked_at = 0.0
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """This process's copy of the saved model, reloaded when the file changes."""
+    global _model, _model_mtime, _checked_at
+    if not is_available():
+        return None
+
+    now = time.time()
+    if now - _checked_at < getattr(settings, 'ITEM_RECOMMENDER_RELOAD_INTERVAL', 60):
+        return _model
+
+    with _model_lock:
+        _checked_at = now
+        path = settings.ITEM_RECOMMENDER_PATH
+        try:
+            if os.path.exists(path) and os.path.getmtime(path) != _model_mtime:
+                _model = ItemModel.load(path)
+                _model_mtime = os.path.getmtime(path)
+                logger.info(f"Loaded item recommender from {path}: {len(_model.keys['track'])} tracks")
+        except Exception as e:
+            logger.error(f"Error loading item recommender: {str(e)}")
+        return _model
+
+
+def recommend_tracks(user, limit=20):
+    """
+    Tracks co-listened with the user's recent plays, shaped like Spotify track
+    objects for the recommendations template. Empty without a model.
+    """
+    model = get_model()
+    if model is None:
+        return []
+
+    recent = list(
+        UserListeningActivity.objects.filter(user=user).exclude(spotify_track_id='')
+        .values_list('spotify_track_id', flat=True)[:50]
+    )
+    ranked = model.indexes['track'].recommend(recent[:20], limit=limit, exclude=recent)
+    covers = dict(
+        Song.objects.filter(spotify_id__in=[track_id for track_id, _ in ranked])
+        .values_list('spotify_id', 'album__cover_url').order_by()
+    )
+    tracks = []
+    for track_id, score in ranked:
+        name, artist = model.labels.get(track_id, ('Unknown', 'Unknown'))
+        tracks.append({
+            'id': track_id,
+            'name': name,
+            'artists': [{'name': artist}],
+            'album': {'images': [{'url': covers[track_id]}] if covers.get(track_id) else []},
+            'score': score,
+        })
+    return tracks
+
+
+def similar_artists(artist_name, limit=10):
+    """Artist names most often co-listened with artist_name."""
+    model = get_model()
+    if model is None:
+        return []
+    return model.indexes['artist'].neighbours(_artist_key(artist_name), limit=limit)
@@ -0,0 +1,69 @@
+"""
+EXPLAIN the app's hot queries and report the ones indexes do not serve.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from SyroMusic import index_audit
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot queries in SyroMusic.index_audit and propose missing indexes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to audit (default: default)')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Refresh planner statistics (ANALYZE) before explaining')
+        parser.add_argument('--fail', action='store_true',
+                            help='Exit with an error if any query is not served by an index')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if options['analyze']:
+            with connections[using].cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        start = time.perf_counter()
+        flagged = 0
+        for result in index_audit.audit(using):
+            if not result['problems']:
+                self.stdout.write(self.style.SUCCESS(f"ok    {result['name']}"))
+                if options['verbosity'] >= 2:
+                    self.stdout.write(self._indent(result['plan']))
+                continue
+
+            flagged += 1
+            self.stdout.write(self.style.WARNING(f"FLAG  {result['name']}  ({result['where']})"))
+            for kind, line in result['problems']:
+                self.stdout.write(f'      {kind}: {line}')
+            if options['verbosity'] >= 2:
+                self.stdout.write(self._indent(result['sql']))
+                self.stdout.write(self._indent(result['plan']))
+
+            proposal = result['proposal']
+            if proposal is None:
+                self.stdout.write('      no single-table index can serve this ordering; change the query')
+            elif result['covered']:
+                self.stdout.write(
+                    f'      an existing index leads with {proposal.fields}; the planner is not using it '
+                    f'(small table or stale statistics: try --analyze), or the query should drop its ORDER BY'
+                )
+            else:
+                self.stdout.write(f'      propose: {self._describe(proposal)}')
+
+        elapsed = time.perf_counter() - start
+        summary = f'{len(index_audit.HOT_QUERIES)} hot queries, {flagged} flagged ({elapsed:.2f}s)'
+        if flagged and options['fail']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary) if not flagged else summary)
+
+    def _describe(self, index):
+        _, _, kwargs = index.deconstruct()
+        args = ', '.join(f'{key}={value!r}' for key, value in kwargs.items())
+        return f'models.Index({args})'
+
+    def _indent(self, text):
+        return '\n'.join(f'        {line}' for line in str(text).splitlines())
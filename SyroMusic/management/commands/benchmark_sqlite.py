@@ -0,0 +1,206 @@
+"""
+Benchmark SQLite read/write concurrency with and without performance mode.
+
+Runs concurrent reader and writer processes against a scratch copy of the
+database, once per configuration:
+
+    default        rollback journal, synchronous=FULL (SQLite's defaults)
+    tuned          the performance-mode pragmas (sqlite_tuning.pragmas())
+    tuned+writer   the same, with writers serialised on a lock file as by
+                   sqlite_tuning.writer()
+
+Readers run the recent-activity query behind the stats pages; writers insert
+listening activity in batches, as ingestion does. The live database is never
+written to.
+"""
+
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from SyroMusic import sqlite_tuning
+from SyroMusic.models import UserListeningActivity
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DEFAULT_PRAGMAS = ['PRAGMA journal_mode = DELETE', 'PRAGMA synchronous = FULL']
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _worker(role, path, table, statements, lock_path, user_ids, batch, duration, seed, results):
+    """One reader or writer process; puts (role, ops, errors, latencies) on results."""
+    rng = random.Random(seed)
+    # 5s is the sqlite3 module's default timeout, and so Django's
+    conn = sqlite3.connect(path, timeout=5)
+    for statement in statements:
+        conn.execute(statement)
+
+    ops, errors, latencies = 0, 0, []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        user_id = rng.choice(user_ids)
+        start = time.perf_counter()
+        try:
+            if role == 'read':
+                conn.execute(
+                    f'SELECT id, track_name, artist_name, played_at FROM {table} '
+                    f'WHERE user_id = ? ORDER BY played_at DESC, id DESC LIMIT 50',
+                    (user_id,),
+                ).fetchall()
+                conn.execute(f'SELECT COUNT(*) FROM {table} WHERE user_id = ?', (user_id,)).fetchone()
+            else:
+                lock = open(lock_path, 'a') if lock_path else None
+                try:
+                    if lock:
+                        fcntl.flock(lock, fcntl.LOCK_EX)
+                    now = datetime.now(timezone.utc)
+                    with conn:
+                        conn.executemany(
+                            f'INSERT INTO {table} (user_id, spotify_track_id, track_name, artist_name, '
+                            f'album_name, played_at, duration_ms, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            [
+                                (user_id, f'bench{rng.randrange(10 ** 6)}', 'Track', 'Artist', 'Album',
+                                 (now - timedelta(seconds=i)).isoformat(), 180000, now.isoformat())
+                                for i in range(batch)
+                            ],
+                        )
+                finally:
+                    if lock:
+                        lock.close()
+            ops += 1
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            errors += 1
+    conn.close()
+    results.put((role, ops, errors, latencies))
+
+
+class Command(BaseCommand):
+    help = 'Compare SQLite read/write concurrency with default and performance-mode settings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes (default 4)')
+        parser.add_argument('--writers', type=int, default=2, help='Writer processes (default 2)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per configuration (default 10)')
+        parser.add_argument('--batch', type=int, default=50, help='Rows per write transaction (default 50)')
+        parser.add_argument('--rows', type=int, default=100000,
+                            help='Seed the copy with activity rows up to this count (default 100000)')
+
+    def handle(self, *args, **options):
+        source = connections['default']
+        if source.vendor != 'sqlite':
+            raise CommandError('benchmark_sqlite needs an SQLite default database.')
+
+        scratch = tempfile.mkdtemp(prefix='syro-sqlite-bench-')
+        try:
+            template = os.path.join(scratch, 'template.sqlite3')
+            user_ids = self._prepare(source, template, options['rows'])
+
+            self.stdout.write(
+                f"{options['readers']} readers, {options['writers']} writers x {options['batch']} rows, "
+                f"{options['duration']:.0f}s each"
+            )
+            self.stdout.write(
+                f"{'config':<14}{'reads/s':>10}{'read p95':>11}{'writes/s':>10}{'write p95':>11}{'locked':>8}"
+            )
+            configs = [
+                ('default', DEFAULT_PRAGMAS, False),
+                ('tuned', sqlite_tuning.pragmas(), False),
+            ]
+            if fcntl is not None:
+                configs.append(('tuned+writer', sqlite_tuning.pragmas(), True))
+            for name, statements, serialise in configs:
+                path = os.path.join(scratch, f'{name}.sqlite3')
+                shutil.copyfile(template, path)
+                lock_path = path + '.writer.lock' if serialise else None
+                self._report(name, self._run(path, statements, lock_path, user_ids, options))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def _prepare(self, source, template, rows):
+        """Copy the database to template, topped up with synthetic activity; returns the user ids used."""
+        source.ensure_connection()
+        target = sqlite3.connect(template)
+        source.connection.backup(target)
+        table = UserListeningActivity._meta.db_table
+
+        user_ids = [row[0] for row in target.execute('SELECT id FROM auth_user LIMIT 100')] or [1]
+        existing = target.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        if existing < rows:
+            start = time.perf_counter()
+            now = datetime.now(timezone.utc)
+            rng = random.Random(0)
+            with target:
+                target.executemany(
+                    f'INSERT INTO {table} (user_id, spotify_track_id, track_name, artist_name, album_name, '
+                    f'played_at, duration_ms, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        (rng.choice(user_ids), f'seed{i}', 'Track', 'Artist', 'Album',
+                         (now - timedelta(minutes=i)).isoformat(), 180000, now.isoformat())
+                        for i in range(rows - existing)
+                    ),
+                )
+            self.stdout.write(
+                f'Seeded {rows - existing} activity rows in {time.perf_counter() - start:.2f}s'
+            )
+        # Start every configuration from a rollback-journal file
+        target.execute('PRAGMA journal_mode = DELETE')
+        target.close()
+        return user_ids
+
+    def _run(self, path, statements, lock_path, user_ids, options):
+        # Forked workers inherit the configured Django process; none of them use its connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        table = UserListeningActivity._meta.db_table
+        processes = [
+            context.Process(target=_worker, args=(
+                role, path, table, statements, lock_path, user_ids, options['batch'], options['duration'], seed,
+                results,
+            ))
+            for seed, role in enumerate(['read'] * options['readers'] + ['write'] * options['writers'])
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get(timeout=options['duration'] + 60) for _ in processes]
+        for process in processes:
+            process.join()
+
+        totals = {}
+        for role, ops, errors, latencies in collected:
+            total = totals.setdefault(role, {'ops': 0, 'errors': 0, 'latencies': []})
+            total['ops'] += ops
+            total['errors'] += errors
+            total['latencies'].extend(latencies)
+        for total in totals.values():
+            total['rate'] = total['ops'] / options['duration']
+            total['p95'] = _percentile(total['latencies'], 0.95) * 1000
+        return totals
+
+    def _report(self, name, totals):
+        empty = {'rate': 0.0, 'p95': 0.0, 'errors': 0}
+        reads, writes = totals.get('read', empty), totals.get('write', empty)
+        self.stdout.write(self.style.SUCCESS(
+            f"{name:<14}{reads['rate']:>10.0f}{reads['p95']:>9.1f}ms{writes['rate']:>10.1f}"
+            f"{writes['p95']:>9.1f}ms{reads['errors'] + writes['errors']:>8}"
+        ))
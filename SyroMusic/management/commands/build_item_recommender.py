@@ -0,0 +1,97 @@
+"""
+Build or update the local item-to-item recommender, evaluate it offline, or
+benchmark its build on synthetic sessions.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from SyroMusic import item_recommender
+
+
+class Command(BaseCommand):
+    help = 'Build the item-to-item recommender from listening activity.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild from all activity instead of adding new activity to the saved model',
+        )
+        parser.add_argument(
+            '--evaluate',
+            action='store_true',
+            help='Report leave-last-play-out hit rate instead of building',
+        )
+        parser.add_argument('--k', type=int, default=10, help='Recommendations per user when evaluating')
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            default=0,
+            metavar='SESSIONS',
+            help='Time a build over this many synthetic sessions instead of building',
+        )
+        parser.add_argument('--items', type=int, default=100000, help='Distinct tracks in the benchmark')
+
+    def handle(self, *args, **options):
+        if item_recommender.np is None:
+            raise CommandError('numpy and scipy are required for the item recommender.')
+
+        if options['benchmark']:
+            self.benchmark(options['benchmark'], options['items'])
+        elif options['evaluate']:
+            self.evaluate(options['k'])
+        else:
+            start = time.perf_counter()
+            model = item_recommender.build_and_save(full=options['full'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"Saved item recommender ({len(model.keys['track'])} tracks, "
+                f"{len(model.keys['artist'])} artists, up to activity {model.last_activity_id}) in {elapsed:.2f}s"
+            ))
+
+    def evaluate(self, k):
+        result = item_recommender.evaluate(k=k)
+        self.stdout.write(
+            f"Users evaluated:      {result['users']}\n"
+            f"Tracks in model:      {result['tracks']}\n"
+            f"HitRate@{k}:           {result['hit_rate']:.3f}\n"
+            f"Most-played baseline: {result['baseline_hit_rate']:.3f}\n"
+            f"Catalog coverage:     {result['coverage']:.3f}\n"
+            f"Build time:           {result['build_seconds']:.2f}s\n"
+            f"Query time:           {result['query_ms']:.2f}ms per user"
+        )
+
+    def benchmark(self, n_sessions, n_items):
+        np = item_recommender.np
+        rng = np.random.default_rng(0)
+        # Zipf-like popularity, 2-20 plays per session
+        popularity = 1.0 / np.arange(1, n_items + 1)
+        popularity /= popularity.sum()
+        lengths = rng.integers(2, 21, size=n_sessions)
+        plays = rng.choice(n_items, size=int(lengths.sum()), p=popularity)
+        sessions = [set(chunk.tolist()) for chunk in np.split(plays, np.cumsum(lengths)[:-1])]
+
+        start = time.perf_counter()
+        keys = []
+        counts = item_recommender.cooccurrence(sessions, keys)
+        cooccurrence_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = item_recommender.NeighbourIndex(keys, *item_recommender.top_k_neighbours(counts))
+        top_k_seconds = time.perf_counter() - start
+
+        seeds = [list(session)[:20] for session in sessions[:1000]]
+        start = time.perf_counter()
+        for seed in seeds:
+            index.recommend(seed, limit=20)
+        query_ms = (time.perf_counter() - start) * 1000 / len(seeds)
+
+        self.stdout.write(
+            f"Sessions:           {n_sessions} ({len(plays)} plays, {len(keys)} tracks)\n"
+            f"Co-occurrence nnz:  {counts.nnz}\n"
+            f"X.T @ X:            {cooccurrence_seconds:.2f}s\n"
+            f"Top-{item_recommender.TOP_K} neighbours:  {top_k_seconds:.2f}s\n"
+            f"Query:              {query_ms:.2f}ms"
+        )
@@ -0,0 +1,33 @@
+"""
+Build the memory-mapped typeahead snapshot shared by web workers.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from SyroMusic import typeahead
+
+
+class Command(BaseCommand):
+    help = 'Build the typeahead prefix index snapshot file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=None,
+            help='Output file (defaults to settings.TYPEAHEAD_SNAPSHOT_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or getattr(settings, 'TYPEAHEAD_SNAPSHOT_PATH', None)
+        if not path:
+            raise CommandError('No --path given and TYPEAHEAD_SNAPSHOT_PATH is not set.')
+
+        start = time.perf_counter()
+        size = typeahead.write_snapshot(path)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote typeahead snapshot to {path} ({size / 1024:.1f} KiB) in {elapsed:.2f}s'
+        ))
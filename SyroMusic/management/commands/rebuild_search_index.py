@@ -0,0 +1,26 @@
+"""
+Rebuild the catalog full-text search index from the Artist, Album and Song tables.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from SyroMusic import search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for artists, albums and songs.'
+
+    def handle(self, *args, **options):
+        search_index.reset_backend()
+        backend = search_index.get_backend()
+        self.stdout.write(f"Rebuilding '{backend.name}' search index...")
+
+        start = time.perf_counter()
+        counts = backend.rebuild()
+        elapsed = time.perf_counter() - start
+
+        for table, count in counts.items():
+            self.stdout.write(f'  {table}: {count} rows')
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt in {elapsed:.2f}s'))
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.2 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+FTS_TABLES = (
+    # (fts table, source query yielding rowid, title, artist)
+    ('SyroMusic_artist_fts',
+     'SELECT ar.id, ar.name, \'\' FROM "SyroMusic_artist" ar'),
+    ('SyroMusic_album_fts',
+     'SELECT al.id, al.title, ar.name FROM "SyroMusic_album" al '
+     'JOIN "SyroMusic_artist" ar ON ar.id = al.artist_id'),
+    ('SyroMusic_song_fts',
+     'SELECT s.id, s.title, ar.name FROM "SyroMusic_song" s '
+     'JOIN "SyroMusic_album" al ON al.id = s.album_id '
+     'JOIN "SyroMusic_artist" ar ON ar.id = al.artist_id'),
+)
+
+POSTGRES_INDEXES = (
+    ('syromusic_artist_name_fts', 'SyroMusic_artist', 'name'),
+    ('syromusic_album_title_fts', 'SyroMusic_album', 'title'),
+    ('syromusic_song_title_fts', 'SyroMusic_song', 'title'),
+)
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                # Search falls back to icontains scans without FTS5
+                return
+            for table, source_sql in FTS_TABLES:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS "{table}" USING fts5('
+                    f"title, artist, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+                )
+                cursor.execute(f'INSERT INTO "{table}" (rowid, title, artist) {source_sql}')
+    elif connection.vendor == 'postgresql':
+        for index_name, table, column in POSTGRES_INDEXES:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table}" '
+                f"USING GIN (to_tsvector('simple', \"{column}\"))"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        for table, _ in FTS_TABLES:
+            schema_editor.execute(f'DROP TABLE IF EXISTS "{table}"')
+    elif connection.vendor == 'postgresql':
+        for index_name, _, _ in POSTGRES_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0006_add_performance_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0007_catalog_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='spotify_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='spotify_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0008_artist_album_spotify_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenreShelfSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shelves', models.JSONField(default=list)),
+                ('source', models.CharField(max_length=20)),
+                ('built_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0010_track_audio_features'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='userlisteningactivity',
+            name='SyroMusic_u_user_id_ce40c8_idx',
+        ),
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(fields=['-release_date', '-id'], name='SyroMusic_a_release_598559_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['album', 'track_number', 'id'], name='SyroMusic_s_album_i_de5ff0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlisteningactivity',
+            index=models.Index(fields=['user', '-played_at', '-id'], name='SyroMusic_u_user_id_f1fe6a_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+POSITION_GAP = 1024
+
+
+def spread_positions(apps, schema_editor):
+    """Number existing playlist entries in the order they were added."""
+    PlaylistTrack = apps.get_model('SyroMusic', 'PlaylistTrack')
+    entries = []
+    playlist_id, position = None, 0
+    for entry in PlaylistTrack.objects.order_by('playlist_id', 'id').only('id', 'playlist_id').iterator(chunk_size=2000):
+        if entry.playlist_id != playlist_id:
+            playlist_id, position = entry.playlist_id, 0
+        position += POSITION_GAP
+        entry.position = position
+        entries.append(entry)
+    PlaylistTrack.objects.bulk_update(entries, ['position'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0011_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        # The many-to-many table becomes the through model's table as is
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PlaylistTrack',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracks', to='SyroMusic.playlist')),
+                        ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playlist_tracks', to='SyroMusic.song')),
+                    ],
+                    options={
+                        'db_table': 'SyroMusic_playlist_songs',
+                        'unique_together': {('playlist', 'song')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='playlist',
+                    name='songs',
+                    field=models.ManyToManyField(blank=True, related_name='playlists', through='SyroMusic.PlaylistTrack', to='SyroMusic.song'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='position',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.RunPython(spread_positions, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='playlisttrack',
+            options={'ordering': ['playlist', 'position']},
+        ),
+        migrations.AddConstraint(
+            model_name='playlisttrack',
+            constraint=models.UniqueConstraint(fields=('playlist', 'position'), name='unique_playlist_position'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0012_playlist_track_positions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='spotify_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
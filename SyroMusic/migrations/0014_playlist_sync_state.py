@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0013_playlist_spotify_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='snapshot_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='playlist',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='playlist',
+            name='synced_tracks',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
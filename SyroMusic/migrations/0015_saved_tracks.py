@@ -0,0 +1,81 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Likes used to be kept in a playlist created by save_track
+LIKED_TITLE = 'Liked Tracks'
+LIKED_DESCRIPTION = 'Your saved tracks'
+POSITION_GAP = 1024
+
+
+def move_liked_playlists(apps, schema_editor):
+    """Turn save_track's "Liked Tracks" playlists into SavedTrack rows, then drop them."""
+    Playlist = apps.get_model('SyroMusic', 'Playlist')
+    PlaylistTrack = apps.get_model('SyroMusic', 'PlaylistTrack')
+    SavedTrack = apps.get_model('SyroMusic', 'SavedTrack')
+
+    liked = Playlist.objects.filter(title=LIKED_TITLE, description=LIKED_DESCRIPTION, spotify_id__isnull=True)
+    entries = PlaylistTrack.objects.filter(playlist__in=liked).values_list('playlist__user_id', 'song_id', 'added_at')
+    SavedTrack.objects.bulk_create(
+        [
+            SavedTrack(user_id=user_id, song_id=song_id, saved_at=added_at or django.utils.timezone.now())
+            for user_id, song_id, added_at in entries.iterator(chunk_size=2000)
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    liked.delete()
+
+
+def restore_liked_playlists(apps, schema_editor):
+    """Recreate a "Liked Tracks" playlist per user from their SavedTrack rows, oldest save first."""
+    Playlist = apps.get_model('SyroMusic', 'Playlist')
+    PlaylistTrack = apps.get_model('SyroMusic', 'PlaylistTrack')
+    SavedTrack = apps.get_model('SyroMusic', 'SavedTrack')
+
+    saves = SavedTrack.objects.order_by('user_id', 'saved_at', 'id').values_list('user_id', 'song_id', 'saved_at')
+    playlist, position, entries, saved = None, 0, [], []
+    for user_id, song_id, saved_at in saves.iterator(chunk_size=2000):
+        if playlist is None or playlist.user_id != user_id:
+            playlist = Playlist.objects.create(user_id=user_id, title=LIKED_TITLE, description=LIKED_DESCRIPTION)
+            position = 0
+        position += POSITION_GAP
+        entries.append(PlaylistTrack(playlist=playlist, song_id=song_id, position=position))
+        saved.append(saved_at)
+    PlaylistTrack.objects.bulk_create(entries, batch_size=1000)
+    # added_at is auto_now_add, so the save times go in after the insert
+    for entry, saved_at in zip(entries, saved):
+        entry.added_at = saved_at
+    PlaylistTrack.objects.bulk_update(entries, ['added_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0014_playlist_sync_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('saved_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_by', to='SyroMusic.song')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_tracks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-saved_at'],
+                'indexes': [models.Index(fields=['user', '-saved_at', '-id'], name='SyroMusic_s_user_id_3105cb_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='savedtrack',
+            constraint=models.UniqueConstraint(fields=('user', 'song'), name='unique_saved_track'),
+        ),
+        migrations.RunPython(move_liked_playlists, restore_liked_playlists),
+    ]
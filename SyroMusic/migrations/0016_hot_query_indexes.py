@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0015_saved_tracks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='song',
+            options={'ordering': ['album_id', 'track_number', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='playlist',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='SyroMusic_p_user_id_81d132_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spotifyuser',
+            index=models.Index(condition=models.Q(('is_connected', True)), fields=['-last_synced'], name='spotifyuser_connected_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:06
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_songs(apps, schema_editor):
+    """Keep the oldest Song per spotify_id and move references to it before the unique index."""
+    Song = apps.get_model('SyroMusic', 'Song')
+    PlaylistTrack = apps.get_model('SyroMusic', 'PlaylistTrack')
+    SavedTrack = apps.get_model('SyroMusic', 'SavedTrack')
+    UserListeningActivity = apps.get_model('SyroMusic', 'UserListeningActivity')
+
+    Song.objects.filter(spotify_id='').update(spotify_id=None)
+    duplicated = (
+        Song.objects.exclude(spotify_id__isnull=True).values('spotify_id')
+        .annotate(keep=Min('id'), n=Count('id')).filter(n__gt=1).values_list('spotify_id', 'keep')
+    )
+    for spotify_id, keep in duplicated:
+        extra = list(Song.objects.filter(spotify_id=spotify_id).exclude(id=keep).values_list('id', flat=True))
+
+        # Playlist entries and saves move unless the kept song is already there; those go with the duplicate
+        for model, owner in ((PlaylistTrack, 'playlist_id'), (SavedTrack, 'user_id')):
+            taken = set(model.objects.filter(song_id=keep).values_list(owner, flat=True))
+            for row_id, owner_id in model.objects.filter(song_id__in=extra).order_by('id').values_list('id', owner):
+                if owner_id not in taken:
+                    model.objects.filter(id=row_id).update(song_id=keep)
+                    taken.add(owner_id)
+        UserListeningActivity.objects.filter(song_id__in=extra).update(song_id=keep)
+        Song.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0016_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_songs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='song',
+            name='spotify_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:26
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0017_song_spotify_id_unique'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='song',
+            options={'ordering': ['album', 'track_number', 'title']},
+        ),
+    ]
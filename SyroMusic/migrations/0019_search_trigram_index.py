@@ -0,0 +1,41 @@
+# Generated by Django 5.0.2 on 2026-10-19 10:05
+
+from django.db import migrations
+
+
+POSTGRES_TRIGRAM_INDEXES = (
+    ('syromusic_artist_name_trgm', 'SyroMusic_artist', 'name'),
+    ('syromusic_album_title_trgm', 'SyroMusic_album', 'title'),
+    ('syromusic_song_title_trgm', 'SyroMusic_song', 'title'),
+)
+
+
+def create_trigram_index(apps, schema_editor):
+    # SQLite has FTS5 prefix indexes instead (migration 0007)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table, column in POSTGRES_TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table}" '
+            f'USING GIN ("{column}" gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # The pg_trgm extension stays: other database objects may use it
+    for index_name, _, _ in POSTGRES_TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SyroMusic', '0018_song_album_ordering'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -14,6 +14,7 @@ class Artist(models.Model):
     """Model representing a music artist."""
     name = models.CharField(max_length=255, unique=True, db_index=True)
     biography = models.TextField(blank=True, null=True)
+    spotify_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
@@ -29,6 +30,7 @@ class Album(models.Model):
     artist = models.ForeignKey(Artist, on_delete=models.CASCADE, related_name='albums')
     release_date = models.DateField(db_index=True)
     cover_url = models.URLField(blank=True, null=True)
+    spotify_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
@@ -37,6 +39,9 @@ class Album(models.Model):
 
     class Meta:
         ordering = ['-release_date']
+        indexes = [
+            models.Index(fields=['-release_date', '-id']),
+        ]
 =======
     name = models.CharField(max_length=255)
     biography = models.TextField()
@@ -56,7 +61,7 @@ class Song(models.Model):
     duration = models.DurationField()
 <<<<<<< HEAD
     track_number = models.IntegerField(null=True, blank=True)
-    spotify_id = models.CharField(max_length=255, blank=True, null=True, db_index=True)
+    spotify_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
@@ -64,7 +69,13 @@ class Song(models.Model):
         return f"{self.title} from {self.album.title}"
 
     class Meta:
+        # Newest album first, through a join on Album.Meta.ordering. Hot
+        # paths order by ('album_id', 'track_number', 'id') explicitly so the
+        # (album, track_number, id) index serves them
         ordering = ['album', 'track_number', 'title']
+        indexes = [
+            models.Index(fields=['album', 'track_number', 'id']),
+        ]
 
 class EncryptedField(models.TextField):
     """Custom field to encrypt and decrypt sensitive data."""
@@ -120,16 +131,67 @@ class Playlist(models.Model):
     title = models.CharField(max_length=255)
 <<<<<<< HEAD
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='playlists')
-    songs = models.ManyToManyField(Song, blank=True, related_name='playlists')
+    songs = models.ManyToManyField(Song, through='PlaylistTrack', blank=True, related_name='playlists')
+    spotify_id = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
+    # Spotify sync state (see playlist_sync.py)
+    snapshot_id = models.CharField(max_length=255, blank=True, null=True)
+    synced_tracks = models.JSONField(default=list, blank=True)  # Spotify track ids at the last sync
+    synced_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return f"{self.title} by {self.user.username}"
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', '-updated_at', '-id']),
+        ]
+
+class PlaylistTrack(models.Model):
+    """
+    A song's place in a playlist. Positions are sparse (see
+    playlist_tracks.POSITION_GAP) so inserts and moves only touch the rows
+    being placed. Edit through SyroMusic.playlist_tracks, not songs.add().
+    """
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='tracks')
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='playlist_tracks')
+    position = models.BigIntegerField()
+    added_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.song_id} at {self.position} in playlist {self.playlist_id}"
+
+    class Meta:
+        # Reuses the table of the plain many-to-many it replaced
+        db_table = 'SyroMusic_playlist_songs'
+        ordering = ['playlist', 'position']
+        unique_together = [('playlist', 'song')]
+        constraints = [
+            models.UniqueConstraint(fields=['playlist', 'position'], name='unique_playlist_position'),
+        ]
+
+class SavedTrack(models.Model):
+    """A song the user liked. Read membership through SyroMusic.saved_tracks."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_tracks')
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='saved_by')
+    saved_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user.username} saved {self.song_id}"
+
+    class Meta:
+        ordering = ['-saved_at']
+        constraints = [
+            # Also the index for "which of these songs has the user saved?"
+            models.UniqueConstraint(fields=['user', 'song'], name='unique_saved_track'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-saved_at', '-id']),
+        ]
 
 class UserProfile(models.Model):
     """Extended user profile model for additional user information."""
@@ -180,6 +242,10 @@ class SpotifyUser(models.Model):
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            # Most recently synced connected account, for app-level Spotify lookups
+            models.Index(fields=['-last_synced'], condition=models.Q(is_connected=True), name='spotifyuser_connected_idx'),
+        ]
 
 
 class UserListeningStats(models.Model):
@@ -246,7 +312,7 @@ class UserListeningActivity(models.Model):
         ordering = ['-played_at']
         indexes = [
             models.Index(fields=['-played_at']),
-            models.Index(fields=['user', '-played_at']),
+            models.Index(fields=['user', '-played_at', '-id']),
         ]
 
 
@@ -367,6 +433,35 @@ class PlaybackQueue(models.Model):
 
     class Meta:
         ordering = ['-last_updated']
+
+
+class GenreShelfSet(models.Model):
+    """
+    One version of the precomputed browse_by_genre shelves, shared by all users.
+    shelves: [{'genre', 'name', 'tracks': [compact track, ...]}, ...]
+    """
+    shelves = models.JSONField(default=list)
+    source = models.CharField(max_length=20)  # 'app' (client credentials) or 'user' token
+    built_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Genre shelves v{self.id} ({self.built_at:%Y-%m-%d %H:%M})"
+
+    class Meta:
+        ordering = ['-id']
+
+
+class TrackAudioFeatures(models.Model):
+    """
+    Spotify audio features of a track, packed as float32 values in
+    audio_features.FEATURES order (see audio_features.py).
+    """
+    spotify_id = models.CharField(max_length=255, unique=True)
+    vector = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Audio features for {self.spotify_id}"
 =======
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     songs = models.ManyToManyField(Song)
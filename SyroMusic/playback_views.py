@@ -35,8 +35,12 @@ def player_page(request):
 
         # Get current playback and devices
         sp = SpotifyService(access_token=access_token)
-        current_playback = sp.get_current_playback()
-        devices = sp.get_available_devices()
+        fetched = sp.batch({
+            'playback': sp.get_current_playback,
+            'devices': sp.get_available_devices,
+        })
+        current_playback = fetched['playback']['result']
+        devices = fetched['devices']['result'] or []
 
         # Get or create NowPlaying model
         now_playing, _ = NowPlaying.objects.get_or_create(user=request.user)
@@ -0,0 +1,230 @@
+"""
+Incremental two-way sync between a user's Spotify playlists and Syro.
+
+Each linked Playlist remembers the Spotify snapshot_id and the list of track
+ids it agreed on at its last sync (synced_tracks). One paged listing of the
+user's playlists tells which changed on Spotify; Playlist.updated_at tells
+which changed locally. A playlist unchanged on both sides costs nothing
+more. Otherwise the last synced list is the common base of a three-way
+merge:
+
+    added on Spotify   -> bulk-added locally    (playlist_tracks.add)
+    removed on Spotify -> bulk-removed locally  (playlist_tracks.remove)
+    added locally      -> added upstream, 100 per request
+    removed locally    -> removed upstream, 100 per request
+
+Spotify's track listing is only fetched for playlists whose snapshot moved,
+all its pages at once. Local songs without a spotify_id stay local.
+"""
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Playlist, PlaylistTrack, Song
+from .catalog_ingest import compact_track, upsert_tracks
+from . import playlist_tracks
+
+logger = logging.getLogger(__name__)
+
+PLAYLISTS_PER_PAGE = 50  # Spotify's limit for GET /me/playlists
+ITEMS_PER_PAGE = 100  # Spotify's limit for GET /playlists/{id}/tracks
+ITEM_FIELDS = (
+    'items(track(id,name,duration_ms,track_number,type,'
+    'album(id,name,release_date,images,artists(id,name)),artists(id,name)))'
+)
+
+
+def remote_playlists(sp):
+    """Every playlist in the user's library, all pages, as Spotify returns them."""
+    first = sp.sp.current_user_playlists(limit=PLAYLISTS_PER_PAGE)
+    items = list(first.get('items') or [])
+    offsets = range(PLAYLISTS_PER_PAGE, first.get('total') or 0, PLAYLISTS_PER_PAGE)
+    pages = sp.batch({
+        offset: (sp.sp.current_user_playlists, {'limit': PLAYLISTS_PER_PAGE, 'offset': offset})
+        for offset in offsets
+    })
+    for offset in offsets:
+        outcome = pages[offset]
+        if outcome['status'] != 'ok':
+            raise RuntimeError(f"Could not list playlists at offset {offset}: {outcome['error']}")
+        items.extend(outcome['result'].get('items') or [])
+    return [item for item in items if item and item.get('id')]
+
+
+def remote_tracks(sp, spotify_id, total):
+    """The playlist's track objects in order (episodes and local files skipped), all pages at once."""
+    pages = sp.batch({
+        offset: (sp.sp.playlist_items, {
+            'playlist_id': spotify_id, 'fields': ITEM_FIELDS, 'limit': ITEMS_PER_PAGE,
+            'offset': offset, 'additional_types': ('track',),
+        })
+        for offset in range(0, max(total, 1), ITEMS_PER_PAGE)
+    })
+    tracks = []
+    for offset in sorted(pages):
+        outcome = pages[offset]
+        if outcome['status'] != 'ok':
+            raise RuntimeError(f"Could not fetch tracks of {spotify_id} at offset {offset}: {outcome['error']}")
+        for item in outcome['result'].get('items') or []:
+            track = item.get('track')
+            if track and track.get('id') and track.get('type', 'track') == 'track':
+                tracks.append(track)
+    return tracks
+
+
+def local_tracks(playlist):
+    """[(song id, spotify id or None)] in playlist order."""
+    return list(
+        PlaylistTrack.objects.filter(playlist=playlist).order_by('position')
+        .values_list('song_id', 'song__spotify_id')
+    )
+
+
+def diff(base, local, remote):
+    """
+    Three-way diff of Spotify track id lists. Returns (add locally, remove
+    locally, add upstream, remove upstream), each in list order.
+    """
+    base_set, local_set, remote_set = set(base), set(local), set(remote)
+    return (
+        [track_id for track_id in remote if track_id not in base_set and track_id not in local_set],
+        [track_id for track_id in base if track_id not in remote_set and track_id in local_set],
+        [track_id for track_id in local if track_id not in base_set and track_id not in remote_set],
+        [track_id for track_id in base if track_id not in local_set and track_id in remote_set],
+    )
+
+
+def changes(playlist, remote):
+    """(changed on Spotify, changed locally) since the playlist's last sync."""
+    remote_changed = remote.get('snapshot_id') != playlist.snapshot_id
+    local_changed = playlist.synced_at is None or bool(playlist.updated_at and playlist.updated_at > playlist.synced_at)
+    return remote_changed, local_changed
+
+
+def sync_playlist(sp, playlist, remote):
+    """
+    Bring one linked playlist and its Spotify copy (`remote`, an item of the
+    playlist listing) in line. Returns a summary dict.
+
+    Spotify is read and the diff worked out before any transaction opens;
+    the local changes and the snapshot go in one transaction; pushes go
+    upstream after it commits. If a push fails, the stored snapshot is still
+    Spotify's as read here and synced_at still predates the local edits, so
+    the next sync re-reads Spotify and pushes the same changes again.
+    """
+    summary = {'playlist': playlist.id, 'added': 0, 'removed': 0, 'pushed': 0, 'pulled': False}
+    remote_changed, local_changed = changes(playlist, remote)
+    if not remote_changed and not local_changed:
+        return summary
+
+    base = list(playlist.synced_tracks or [])
+    entries = local_tracks(playlist)
+    local = list(dict.fromkeys(spotify_id for _, spotify_id in entries if spotify_id))
+
+    if remote_changed:
+        tracks = remote_tracks(sp, playlist.spotify_id, (remote.get('tracks') or {}).get('total') or 0)
+        remote_ids = list(dict.fromkeys(track['id'] for track in tracks))
+        summary['pulled'] = True
+    else:
+        tracks, remote_ids = [], base
+    pull_add, pull_remove, push_add, push_remove = diff(base, local, remote_ids)
+
+    # Catalog rows for pulled tracks; upserts are idempotent, so they need not
+    # share the playlist's transaction
+    song_for = {}
+    if pull_add:
+        by_id = {track['id']: track for track in tracks}
+        song_for.update(upsert_tracks([compact_track(by_id[track_id]) for track_id in pull_add]))
+
+    # Spotify's list as read, less tracks that could not be stored locally, so
+    # the next sync retries them instead of reading them as removed here
+    unstored = {track_id for track_id in pull_add if track_id not in song_for}
+    remote_now = [track_id for track_id in remote_ids if track_id not in unstored]
+
+    # Local side: one bulk remove and one bulk insert
+    with transaction.atomic():
+        if pull_remove:
+            removed = set(pull_remove)
+            summary['removed'] = playlist_tracks.remove(
+                playlist, [song_id for song_id, spotify_id in entries if spotify_id in removed]
+            )
+        if pull_add:
+            added = playlist_tracks.add(playlist, [song_for[track_id] for track_id in pull_add if track_id in song_for])
+            summary['added'] = len(added)
+        if remote_changed and not local_changed and not pull_add and not pull_remove and local != remote_ids:
+            # Reordered on Spotify only: adopt its order, local-only songs last
+            song_ids = dict(Song.objects.filter(spotify_id__in=remote_ids).values_list('spotify_id', 'id'))
+            playlist_tracks.replace(playlist, [
+                *[song_ids[track_id] for track_id in remote_ids if track_id in song_ids],
+                *[song_id for song_id, spotify_id in entries if not spotify_id],
+            ])
+
+        # update_fields leaves updated_at alone, so synced_at stays the newer one.
+        # With pushes pending, synced_at is kept so the local changes still show.
+        playlist.snapshot_id = remote.get('snapshot_id')
+        playlist.synced_tracks = remote_now
+        update_fields = ['snapshot_id', 'synced_tracks']
+        if not push_add and not push_remove:
+            playlist.synced_at = timezone.now()
+            update_fields.append('synced_at')
+        playlist.save(update_fields=update_fields)
+
+    if not push_add and not push_remove:
+        return summary
+
+    # Upstream: chunked writes, then the snapshot they produced
+    if push_remove and not sp.remove_tracks_from_playlist(
+        playlist.spotify_id, [playlist_tracks.track_uri(track_id) for track_id in push_remove]
+    ):
+        raise RuntimeError(f"Could not remove tracks from {playlist.spotify_id}")
+    if push_add and not sp.add_tracks_to_playlist(
+        playlist.spotify_id, [playlist_tracks.track_uri(track_id) for track_id in push_add]
+    ):
+        raise RuntimeError(f"Could not add tracks to {playlist.spotify_id}")
+    snapshot_id = sp.sp.playlist(playlist.spotify_id, fields='snapshot_id')['snapshot_id']
+    summary['pushed'] = len(push_add) + len(push_remove)
+
+    # The list both sides now hold: Spotify's, minus local removals, plus local additions
+    pushed_out = set(push_remove)
+    playlist.snapshot_id = snapshot_id
+    playlist.synced_tracks = [track_id for track_id in remote_now if track_id not in pushed_out] + push_add
+    playlist.synced_at = timezone.now()
+    playlist.save(update_fields=['snapshot_id', 'synced_tracks', 'synced_at'])
+    return summary
+
+
+def sync_user_playlists(user, sp):
+    """
+    Sync every playlist in the user's Spotify library, importing ones not seen
+    before. Returns {'imported', 'skipped', 'synced', 'failed'} counts.
+    """
+    counts = {'imported': 0, 'skipped': 0, 'synced': 0, 'failed': 0}
+    remotes = remote_playlists(sp)
+    linked = {
+        playlist.spotify_id: playlist
+        for playlist in Playlist.objects.filter(user=user, spotify_id__in=[remote['id'] for remote in remotes])
+    }
+
+    for remote in remotes:
+        playlist = linked.get(remote['id'])
+        if playlist is None:
+            playlist = Playlist.objects.create(
+                user=user, title=remote.get('name') or 'Untitled',
+                description=remote.get('description') or '', spotify_id=remote['id'],
+            )
+            counts['imported'] += 1
+        elif (remote.get('name') or playlist.title) != playlist.title:
+            Playlist.objects.filter(id=playlist.id).update(title=remote['name'])
+
+        if not any(changes(playlist, remote)):
+            counts['skipped'] += 1
+            continue
+        try:
+            sync_playlist(sp, playlist, remote)
+            counts['synced'] += 1
+        except Exception as e:
+            counts['failed'] += 1
+            logger.error(f"Error syncing playlist {playlist.id} ({remote['id']}): {str(e)}")
+    return counts
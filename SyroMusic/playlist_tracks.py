@@ -0,0 +1,234 @@
+"""
+Ordered playlist editing in bulk.
+
+Playlist entries (PlaylistTrack) carry sparse integer positions,
+POSITION_GAP apart when appended. Adding or moving n songs places them at
+evenly spaced positions between their new neighbours, so each call costs a
+fixed handful of queries that touch only the rows being placed, however long
+the playlist is. When two neighbours are too close to fit the new rows, the
+playlist is renumbered once, leaving room for them, and the placement retried.
+
+Indexes (`at`) count entries from 0 in playlist order; None means the end.
+
+Edits may name songs by Spotify URI as well as local id: resolve() maps URIs
+to catalog songs, ingesting unknown tracks with one Spotify request per 50,
+and upstream_uris() gives the URIs to send to Spotify, which takes 100 per
+request (SpotifyService.add_tracks_to_playlist).
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import PlaylistTrack, Song
+from . import catalog_ingest
+
+logger = logging.getLogger(__name__)
+
+POSITION_GAP = 1024
+TRACKS_PER_REQUEST = 50  # Spotify's limit for GET /tracks
+
+
+def _between(low, high, count):
+    """count evenly spaced integers strictly between low and high, or None if they don't fit."""
+    step = (high - low) // (count + 1)
+    if step < 1:
+        return None
+    return [low + step * (i + 1) for i in range(count)]
+
+
+def _slots(playlist, at, count, exclude_song_ids=()):
+    """Positions for count entries placed at index `at` among the other entries."""
+    others = PlaylistTrack.objects.filter(playlist=playlist).exclude(song_id__in=exclude_song_ids)
+    if at is None or at < 0:
+        last = others.aggregate(last=Max('position'))['last'] or 0
+        return [last + POSITION_GAP * (i + 1) for i in range(count)]
+
+    neighbours = list(others.order_by('position').values_list('position', flat=True)[max(at - 1, 0):at + 1])
+    if at == 0:
+        low, high = 0, neighbours[0] if neighbours else None
+    else:
+        low = neighbours[0] if neighbours else None
+        high = neighbours[1] if len(neighbours) > 1 else None
+    if low is None:
+        # Index past the end: append
+        return _slots(playlist, None, count, exclude_song_ids)
+    if high is None:
+        return [low + POSITION_GAP * (i + 1) for i in range(count)]
+    return _between(low, high, count)
+
+
+def _park(entries):
+    """Move entries to negative positions so new positions can't collide with their old ones."""
+    PlaylistTrack.objects.filter(id__in=[entry.id for entry in entries]).update(position=-F('position'))
+
+
+def renumber(playlist, at=None, room=0, exclude_song_ids=()):
+    """
+    Respace every entry of the playlist POSITION_GAP apart, keeping the order.
+    With room, leave space for that many entries at index `at` among the
+    entries not in exclude_song_ids (those go last, to be placed afresh).
+    """
+    entries = list(
+        PlaylistTrack.objects.filter(playlist=playlist).order_by('position').only('id', 'song_id', 'position')
+    )
+    excluded = set(exclude_song_ids)
+    entries = [e for e in entries if e.song_id not in excluded] + [e for e in entries if e.song_id in excluded]
+    _park(entries)
+    for i, entry in enumerate(entries):
+        skip = room if at is not None and 0 <= at <= i else 0
+        entry.position = POSITION_GAP * (i + 1 + skip)
+    PlaylistTrack.objects.bulk_update(entries, ['position'], batch_size=1000)
+
+
+def add(playlist, song_ids, at=None):
+    """
+    Add songs (in the given order) at index `at`, skipping songs already in the
+    playlist. Returns the ids of the songs added.
+    """
+    song_ids = list(dict.fromkeys(song_ids))
+    with transaction.atomic():
+        existing = set(
+            PlaylistTrack.objects.filter(playlist=playlist, song_id__in=song_ids).values_list('song_id', flat=True)
+        )
+        new_ids = [song_id for song_id in song_ids if song_id not in existing]
+        if not new_ids:
+            return []
+
+        positions = _slots(playlist, at, len(new_ids))
+        if positions is None:
+            renumber(playlist, at, room=len(new_ids))
+            positions = _slots(playlist, at, len(new_ids))
+
+        PlaylistTrack.objects.bulk_create([
+            PlaylistTrack(playlist=playlist, song_id=song_id, position=position)
+            for song_id, position in zip(new_ids, positions)
+        ])
+        playlist.save(update_fields=['updated_at'])
+    return new_ids
+
+
+def remove(playlist, song_ids):
+    """Remove songs from the playlist. Returns the number of entries removed."""
+    with transaction.atomic():
+        removed, _ = PlaylistTrack.objects.filter(playlist=playlist, song_id__in=song_ids).delete()
+        if removed:
+            playlist.save(update_fields=['updated_at'])
+    return removed
+
+
+def move(playlist, song_ids, at=None):
+    """
+    Move songs (as a block, in the given order) to index `at` among the
+    playlist's other entries. Songs not in the playlist are ignored.
+    Returns the number of entries moved.
+    """
+    song_ids = list(dict.fromkeys(song_ids))
+    with transaction.atomic():
+        entries = {
+            entry.song_id: entry
+            for entry in PlaylistTrack.objects.select_for_update().filter(playlist=playlist, song_id__in=song_ids)
+        }
+        moving = [entries[song_id] for song_id in song_ids if song_id in entries]
+        if not moving:
+            return 0
+
+        positions = _slots(playlist, at, len(moving), exclude_song_ids=list(entries))
+        if positions is None:
+            renumber(playlist, at, room=len(moving), exclude_song_ids=list(entries))
+            for entry in moving:
+                entry.refresh_from_db(fields=['position'])
+            positions = _slots(playlist, at, len(moving), exclude_song_ids=list(entries))
+
+        _park(moving)
+        for entry, position in zip(moving, positions):
+            entry.position = position
+        PlaylistTrack.objects.bulk_update(moving, ['position'])
+        playlist.save(update_fields=['updated_at'])
+    return len(moving)
+
+
+def replace(playlist, song_ids):
+    """Make the playlist exactly song_ids, in that order, keeping the entries it already had."""
+    song_ids = list(dict.fromkeys(song_ids))
+    with transaction.atomic():
+        PlaylistTrack.objects.filter(playlist=playlist).exclude(song_id__in=song_ids).delete()
+        existing = {entry.song_id: entry for entry in PlaylistTrack.objects.filter(playlist=playlist).only('id', 'song_id', 'position')}
+        _park(existing.values())
+
+        kept, created = [], []
+        for i, song_id in enumerate(song_ids):
+            position = POSITION_GAP * (i + 1)
+            if song_id in existing:
+                existing[song_id].position = position
+                kept.append(existing[song_id])
+            else:
+                created.append(PlaylistTrack(playlist=playlist, song_id=song_id, position=position))
+        PlaylistTrack.objects.bulk_update(kept, ['position'], batch_size=1000)
+        PlaylistTrack.objects.bulk_create(created, batch_size=1000)
+        playlist.save(update_fields=['updated_at'])
+
+
+def ordered_songs(playlist):
+    """The playlist's songs in playlist order."""
+    return Song.objects.filter(playlist_tracks__playlist=playlist).order_by('playlist_tracks__position')
+
+
+# ============================================================
+# Spotify URIs
+# ============================================================
+
+def track_id(uri):
+    """Spotify track id from 'spotify:track:<id>', an open.spotify.com track URL, or a bare id."""
+    uri = uri.strip()
+    if uri.startswith('spotify:track:'):
+        return uri.rsplit(':', 1)[1]
+    if '/track/' in uri:
+        return uri.split('/track/', 1)[1].split('?', 1)[0].strip('/')
+    return uri
+
+
+def track_uri(spotify_id):
+    return f'spotify:track:{spotify_id}'
+
+
+def resolve(song_ids=(), uris=(), sp=None):
+    """
+    Local song ids for an edit naming songs by id and/or Spotify URI, in that
+    order. URIs not in the catalog are fetched and ingested when a
+    SpotifyService is given. Returns (song ids, URIs left unresolved).
+    """
+    ordered = list(song_ids)
+    spotify_ids = list(dict.fromkeys(track_id(uri) for uri in uris if uri.strip()))
+    if not spotify_ids:
+        return ordered, []
+
+    found = dict(Song.objects.filter(spotify_id__in=spotify_ids).values_list('spotify_id', 'id'))
+    missing = [spotify_id for spotify_id in spotify_ids if spotify_id not in found]
+    if missing and sp is not None and sp.sp:
+        chunks = [missing[i:i + TRACKS_PER_REQUEST] for i in range(0, len(missing), TRACKS_PER_REQUEST)]
+        fetched = sp.batch({n: (sp.sp.tracks, {'tracks': chunk}) for n, chunk in enumerate(chunks)})
+        tracks = [
+            catalog_ingest.compact_track(track)
+            for outcome in fetched.values() if outcome['status'] == 'ok'
+            for track in (outcome['result'] or {}).get('tracks') or []
+        ]
+        try:
+            found.update(catalog_ingest.upsert_tracks(tracks))
+        except Exception as e:
+            logger.error(f"Error ingesting playlist tracks: {str(e)}")
+
+    ordered.extend(found[spotify_id] for spotify_id in spotify_ids if spotify_id in found)
+    unresolved = [track_uri(spotify_id) for spotify_id in spotify_ids if spotify_id not in found]
+    return ordered, unresolved
+
+
+def upstream_uris(song_ids, extra_uris=()):
+    """Spotify URIs of the given songs (in order; songs without one are skipped), then extra_uris."""
+    spotify_ids = dict(
+        Song.objects.filter(id__in=song_ids).exclude(spotify_id__isnull=True).exclude(spotify_id='')
+        .values_list('id', 'spotify_id')
+    )
+    uris = [track_uri(spotify_ids[song_id]) for song_id in song_ids if song_id in spotify_ids]
+    return list(dict.fromkeys([*uris, *extra_uris]))
@@ -0,0 +1,184 @@
+"""
+Per-request query budgets and N+1 detection.
+
+QueryRecorder hooks every database connection (Django's execute_wrapper) and
+records each query's SQL, time, and the innermost project frame that ran it.
+A query shape repeated QUERY_BUDGET_N_PLUS_ONE times or more from one call
+site is flagged as an N+1 pattern; the same SQL with the same parameters run
+twice is reported as a duplicate.
+
+QueryBudgetMiddleware (while QUERY_BUDGET_ENABLED, DEBUG by default) records
+each request, adds X-Query-Count and X-Query-Time headers, and logs N+1
+patterns and requests over budget: the view's @query_budget(n), or
+QUERY_BUDGET_DEFAULT. With QUERY_BUDGET_STRICT it raises QueryBudgetExceeded
+instead, which fails the request under the test client. For code outside a
+request:
+
+    with assert_query_budget(3):
+        UserListeningStatsSerializer(stats).data
+"""
+
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# IN (%s, %s, ...) lists of any length share one shape
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Too many queries, or an N+1 pattern, in a request or assert_query_budget block."""
+
+
+def query_budget(max_queries):
+    """
+    View decorator declaring the most queries one request may run. Works on
+    function views (put it outermost) and view/viewset classes.
+    """
+    def decorate(view):
+        view.query_budget = max_queries
+        return view
+    return decorate
+
+
+def _budget_for(view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        # as_view() keeps the class on .cls (DRF) or .view_class (Django)
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
+
+
+def _call_site():
+    """'path:line in function' of the innermost project frame outside this module."""
+    root = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and filename != __file__ and 'site-packages' not in filename:
+            return f'{filename[len(root):]}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class QueryRecorder:
+    """Records the queries run on this thread's connections while active."""
+
+    def __init__(self):
+        self.queries = []  # (shape, sql, params, seconds, call site)
+
+    def __enter__(self):
+        self._wrappers = ExitStack()
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrappers.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((
+                _IN_LIST.sub('IN (...)', sql), sql, repr(params), time.perf_counter() - start, _call_site()
+            ))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(query[3] for query in self.queries)
+
+    def duplicates(self):
+        """[(sql, times run)] for identical queries, same parameters included, run more than once."""
+        counts = Counter((sql, params) for _, sql, params, _, _ in self.queries)
+        return sorted(((sql, n) for (sql, _), n in counts.items() if n > 1), key=lambda d: -d[1])
+
+    def n_plus_one(self, threshold=None):
+        """[(query shape, times run, call site)] for shapes repeated threshold times from one call site."""
+        if threshold is None:
+            threshold = getattr(settings, 'QUERY_BUDGET_N_PLUS_ONE', 5)
+        sites = defaultdict(Counter)
+        for shape, _, _, _, site in self.queries:
+            sites[shape][site] += 1
+        flagged = []
+        for shape, counts in sites.items():
+            site, n = counts.most_common(1)[0]
+            if n >= threshold:
+                flagged.append((shape, n, site))
+        return sorted(flagged, key=lambda f: -f[1])
+
+    def problems(self, max_queries=None, n_plus_one=True):
+        """Human-readable budget violations; empty when within budget."""
+        problems = []
+        if max_queries is not None and self.count > max_queries:
+            problems.append(f'{self.count} queries, budget {max_queries}')
+        if n_plus_one:
+            for shape, n, site in self.n_plus_one():
+                problems.append(f'N+1: {n}x at {site}: {shape[:200]}')
+        return problems
+
+    def summary(self):
+        lines = [f'{self.count} queries in {self.total_time * 1000:.1f}ms']
+        for sql, n in self.duplicates()[:5]:
+            lines.append(f'  duplicate {n}x: {sql[:200]}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def assert_query_budget(max_queries=None, n_plus_one=True):
+    """
+    Raise QueryBudgetExceeded if the block runs more than max_queries
+    queries or, unless n_plus_one=False, contains an N+1 pattern.
+    """
+    with QueryRecorder() as recorder:
+        yield recorder
+    problems = recorder.problems(max_queries, n_plus_one)
+    if problems:
+        raise QueryBudgetExceeded('\n'.join(problems + [recorder.summary()]))
+
+
+class QueryBudgetMiddleware:
+    """Records every request's queries; see the module docstring."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time'] = f'{recorder.total_time * 1000:.1f}ms'
+
+        budget = getattr(request, '_query_budget', None)
+        if budget is None:
+            budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        problems = recorder.problems(budget)
+        if problems:
+            message = '\n'.join([f'{request.method} {request.path}:'] + problems + [recorder.summary()])
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = _budget_for(view_func)
+        return None
@@ -0,0 +1,75 @@
+"""
+Per-user cache of Spotify recommendations, keyed by the seed set.
+
+Seeds come from UserListeningStats, which only change when the stats are
+re-synced, so the recommendations page is served from cache between syncs.
+Each user has a cache generation that the sync task bumps, and the sync task
+refills the cache straight away so the page never waits on Spotify.
+"""
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_LIMIT = 20
+
+
+def _generation_key(user_id):
+    return f'recs:generation:{user_id}'
+
+
+def _generation(user_id):
+    return cache.get_or_set(_generation_key(user_id), 1, timeout=None)
+
+
+def _cache_key(user_id, seeds):
+    parts = [f'{kind}:{",".join(sorted(ids))}' for kind, ids in sorted(seeds.items())]
+    digest = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+    return f'recs:{user_id}:{digest}'
+
+
+def seeds_for(listening_stats):
+    """Seed artists and tracks from the user's medium-term top lists."""
+    seeds = {'seed_artists': [], 'seed_tracks': [], 'seed_genres': []}
+    if listening_stats:
+        seeds['seed_artists'] = [a.get('id') for a in listening_stats.top_artists_medium_term[:3] if a.get('id')]
+        seeds['seed_tracks'] = [t.get('id') for t in listening_stats.top_tracks_medium_term[:2] if t.get('id')]
+    return seeds
+
+
+def get_cached(user_id, seeds):
+    """Cached recommendations for this user and seed set, or None."""
+    try:
+        return cache.get(_cache_key(user_id, seeds), version=_generation(user_id))
+    except Exception as e:
+        logger.warning(f"Recommendation cache unavailable: {str(e)}")
+        return None
+
+
+def fetch(user_id, sp, seeds):
+    """Fetch recommendations from Spotify and cache them (empty results are not cached)."""
+    tracks = sp.get_recommendations(
+        seed_artists=seeds['seed_artists'] or None,
+        seed_tracks=seeds['seed_tracks'] or None,
+        seed_genres=seeds['seed_genres'] or None,
+        limit=RECOMMENDATION_LIMIT,
+    )
+    if tracks:
+        cache.set(
+            _cache_key(user_id, seeds), tracks,
+            timeout=getattr(settings, 'RECOMMENDATION_CACHE_TTL', 6 * 60 * 60),
+            version=_generation(user_id),
+        )
+    return tracks
+
+
+def invalidate(user_id):
+    """Drop all cached recommendations for a user, e.g. after their stats are re-synced."""
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        cache.set(_generation_key(user_id), 2, timeout=None)
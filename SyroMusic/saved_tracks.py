@@ -0,0 +1,133 @@
+"""
+Liked tracks, with batched membership lookups.
+
+for_user() lists them newest first, a keyset page at a time (ORDERING).
+
+contains() answers "which of these songs has the user saved?" for a whole
+song list in one query on the (user, song) unique index. Users who ask often
+(more than SAVED_TRACKS_HOT_THRESHOLD lookups within
+SAVED_TRACKS_CACHE_TTL) get their full set of saved song ids cached, so
+their lookups cost two cache reads. The set is cached under the user's
+generation, which saving or unsaving bumps, so a set loaded before a write
+can never be stored as current after it.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import SavedTrack
+
+logger = logging.getLogger(__name__)
+
+# Newest first; served by the (user, -saved_at, -id) index
+ORDERING = ('-saved_at', '-id')
+
+
+def _generation_key(user_id):
+    return f'saved:generation:{user_id}'
+
+
+def _ids_key(user_id, generation):
+    return f'saved:ids:{user_id}:{generation}'
+
+
+def _hits_key(user_id):
+    return f'saved:hits:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'SAVED_TRACKS_CACHE_TTL', 10 * 60)
+
+
+def _generation(user_id):
+    # Start from the clock, not 1, so an evicted generation cannot come back
+    # to a set cached before the eviction
+    return cache.get_or_set(_generation_key(user_id), time.time_ns, timeout=None)
+
+
+def _invalidate(user_id):
+    try:
+        try:
+            cache.incr(_generation_key(user_id))
+        except ValueError:
+            cache.set(_generation_key(user_id), time.time_ns(), timeout=None)
+    except Exception as e:
+        logger.error(f"Error invalidating saved tracks cache: {str(e)}")
+
+
+def _cached_ids(user_id):
+    """The user's cached saved-song id set, loading it once the user is hot; None otherwise."""
+    try:
+        # Read before the query: a write after this bumps it, retiring the set stored below
+        generation = _generation(user_id)
+        ids = cache.get(_ids_key(user_id, generation))
+        if ids is not None:
+            return ids
+
+        cache.add(_hits_key(user_id), 0, _ttl())
+        hits = cache.incr(_hits_key(user_id))
+    except Exception as e:
+        logger.error(f"Error reading saved tracks cache: {str(e)}")
+        return None
+
+    if hits <= getattr(settings, 'SAVED_TRACKS_HOT_THRESHOLD', 5):
+        return None
+    ids = frozenset(SavedTrack.objects.filter(user_id=user_id).order_by().values_list('song_id', flat=True))
+    try:
+        cache.set(_ids_key(user_id, generation), ids, _ttl())
+    except Exception as e:
+        logger.error(f"Error writing saved tracks cache: {str(e)}")
+    return ids
+
+
+def for_user(user):
+    """The user's saved tracks, to be paged in ORDERING with pagination.after()."""
+    return SavedTrack.objects.filter(user=user)
+
+
+def contains(user, song_ids):
+    """{song id: saved?} for song_ids, in one indexed query or one cache read."""
+    song_ids = list(dict.fromkeys(song_ids))
+    if not song_ids or not user.is_authenticated:
+        return {song_id: False for song_id in song_ids}
+
+    saved = _cached_ids(user.id)
+    if saved is None:
+        # No ORDER BY, so the lookup is answered from the (user, song) unique index
+        saved = set(
+            SavedTrack.objects.filter(user=user, song_id__in=song_ids).order_by().values_list('song_id', flat=True)
+        )
+    return {song_id: song_id in saved for song_id in song_ids}
+
+
+def is_saved(user, song_id):
+    return contains(user, [song_id])[song_id]
+
+
+def save(user, song_ids):
+    """Save songs for the user. Returns the ids that were not saved before."""
+    song_ids = list(dict.fromkeys(song_ids))
+    with transaction.atomic():
+        existing = set(
+            SavedTrack.objects.filter(user=user, song_id__in=song_ids).order_by().values_list('song_id', flat=True)
+        )
+        new_ids = [song_id for song_id in song_ids if song_id not in existing]
+        # ignore_conflicts covers a concurrent save of the same song
+        SavedTrack.objects.bulk_create(
+            [SavedTrack(user=user, song_id=song_id) for song_id in new_ids], ignore_conflicts=True
+        )
+    if new_ids:
+        _invalidate(user.id)
+    return new_ids
+
+
+def unsave(user, song_ids):
+    """Remove songs from the user's saved tracks. Returns the number removed."""
+    removed, _ = SavedTrack.objects.filter(user=user, song_id__in=song_ids).delete()
+    if removed:
+        _invalidate(user.id)
+    return removed
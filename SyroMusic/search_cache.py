@@ -0,0 +1,129 @@
+"""
+Shared cache for search results, local catalog and Spotify alike.
+
+Results are keyed by the normalised query, not the user, so every user typing
+the same thing shares one entry. An entry is "complete" when it holds fewer
+items than the limit, i.e. everything that matches. Because matching is
+monotonic in the query (anything matching "beat" also matches "bea"), a longer
+query can then be answered by filtering the cached shorter-prefix entry
+instead of searching again. Spotify results are only reused for the exact
+query: Spotify's search is fuzzy, matches fields besides the name and artists
+and ranks server-side, so a filtered shorter-prefix entry would drop hits.
+"""
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .typeahead import normalize, word_start_keys
+
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LENGTH = 2
+LOCAL_GENERATION_KEY = 'search:local:generation'
+
+
+def matches_word_prefix(text, query):
+    """Typeahead semantics: the query starts at a word start of the text."""
+    return any(key.startswith(query) for key in word_start_keys(text))
+
+
+def matches_token_prefix(text, query):
+    """Full-text semantics: every query token prefixes some token of the text."""
+    tokens = normalize(text).split()
+    return all(any(token.startswith(term) for token in tokens) for term in query.split())
+
+
+MATCHERS = {
+    'word_prefix': matches_word_prefix,
+    'token_prefix': matches_token_prefix,
+}
+
+
+def _cache_key(namespace, kind, limit, normalized):
+    digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    return f'search:{namespace}:{kind}:{limit}:{digest}'
+
+
+def local_generation():
+    """Current generation of the local catalog; bumped on every catalog write."""
+    # Start from the clock, not 1, so an evicted generation cannot come back
+    # to results cached before the eviction
+    return cache.get_or_set(LOCAL_GENERATION_KEY, time.time_ns, timeout=None)
+
+
+def bump_local_generation():
+    """Invalidate all cached local results."""
+    try:
+        cache.incr(LOCAL_GENERATION_KEY)
+    except ValueError:
+        cache.set(LOCAL_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def cached_search(namespace, kind, query, limit, fetch, text_of,
+                  matcher='token_prefix', timeout=None, version=None, cache_empty=True):
+    """
+    Return cached results for query, refining a complete shorter-prefix entry
+    when possible, and calling fetch() only on a full miss.
+
+    fetch() returns at most limit items; text_of(item) gives the text the
+    matcher tests when refining. Pass matcher=None for searches that are not
+    monotonic in the query (e.g. fuzzy matching), which are only cached by
+    exact query; text_of may then be None. Pass cache_empty=False when fetch() also returns an empty
+    list on errors.
+    """
+    normalized = normalize(query)
+    if len(normalized) < MIN_QUERY_LENGTH:
+        return fetch()
+
+    # The exact query and every shorter prefix, longest first, in one round trip
+    keys = [
+        (length, _cache_key(namespace, kind, limit, normalized[:length]))
+        for length in range(len(normalized), MIN_QUERY_LENGTH - 1, -1)
+        if not normalized[:length].endswith(' ')
+    ]
+    if matcher is None:
+        keys = keys[:1]
+    try:
+        found = cache.get_many([key for _, key in keys], version=version)
+    except Exception as e:
+        logger.warning(f"Search cache unavailable: {str(e)}")
+        return fetch()
+
+    exact_key = keys[0][1]
+    if exact_key in found:
+        return found[exact_key]['items']
+
+    match = MATCHERS.get(matcher)
+    for _, key in keys[1:]:
+        entry = found.get(key)
+        if entry and entry['complete']:
+            items = [item for item in entry['items'] if match(text_of(item), normalized)]
+            cache.set(exact_key, {'items': items, 'complete': True}, timeout, version=version)
+            return items
+
+    items = fetch()
+    if items or cache_empty:
+        cache.set(exact_key, {'items': items, 'complete': len(items) < limit}, timeout, version=version)
+    return items
+
+
+# ============================================================
+# Spotify search
+# ============================================================
+
+def spotify_search(sp, query, search_type='track', limit=20):
+    """SpotifyService.search() through the shared cache."""
+    def fetch():
+        return sp.search(query, search_type, limit=limit)
+
+    return cached_search(
+        'spotify', search_type, query, limit, fetch, None,
+        matcher=None,
+        timeout=getattr(settings, 'SPOTIFY_SEARCH_CACHE_TTL', 3600),
+        # SpotifyService.search() also returns [] when the request fails
+        cache_empty=False,
+    )
@@ -0,0 +1,376 @@
+"""
+Full-text search index for the local music catalog.
+
+SQLite deployments use FTS5 virtual tables (one per model, rowid = primary key)
+that are kept in sync by model signals. PostgreSQL deployments use GIN
+expression indexes over to_tsvector() for word-prefix matches, topped up with
+substring matches from pg_trgm GIN indexes on the name columns. Any other
+backend, or a SQLite build without FTS5, falls back to the original icontains
+scans.
+"""
+
+import logging
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Artist, Album, Song
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+LIKE_ESCAPE_RE = re.compile(r'([\\%_])')
+
+# pg_trgm cannot use its index for patterns shorter than one trigram
+TRIGRAM_MIN_LENGTH = 3
+
+ARTIST_FTS_TABLE = f'{Artist._meta.db_table}_fts'
+ALBUM_FTS_TABLE = f'{Album._meta.db_table}_fts'
+SONG_FTS_TABLE = f'{Song._meta.db_table}_fts'
+
+# Rows that feed each FTS table: (rowid, title, artist name)
+ARTIST_SOURCE_SQL = f'''
+    SELECT ar.id, ar.name, ''
+    FROM "{Artist._meta.db_table}" ar
+'''
+ALBUM_SOURCE_SQL = f'''
+    SELECT al.id, al.title, ar.name
+    FROM "{Album._meta.db_table}" al
+    JOIN "{Artist._meta.db_table}" ar ON ar.id = al.artist_id
+'''
+SONG_SOURCE_SQL = f'''
+    SELECT s.id, s.title, ar.name
+    FROM "{Song._meta.db_table}" s
+    JOIN "{Album._meta.db_table}" al ON al.id = s.album_id
+    JOIN "{Artist._meta.db_table}" ar ON ar.id = al.artist_id
+'''
+
+
+def tokenize(query):
+    """Split a user query into lowercase word tokens."""
+    return TOKEN_RE.findall((query or '').lower())
+
+
+class IcontainsBackend:
+    """Fallback backend using the original leading-wildcard LIKE scans."""
+
+    name = 'icontains'
+
+    def search_artists(self, query, limit):
+        return list(
+            Artist.objects.filter(name__icontains=query).values_list('id', flat=True)[:limit]
+        )
+
+    def search_albums(self, query, limit):
+        return list(
+            Album.objects.filter(
+                Q(title__icontains=query) | Q(artist__name__icontains=query)
+            ).values_list('id', flat=True)[:limit]
+        )
+
+    def search_songs(self, query, limit):
+        return list(
+            Song.objects.filter(
+                Q(title__icontains=query) | Q(album__artist__name__icontains=query)
+            ).values_list('id', flat=True)[:limit]
+        )
+
+    def index_artist(self, artist_id, include_related=True):
+        pass
+
+    def index_album(self, album_id, include_related=True):
+        pass
+
+    def index_song(self, song_id):
+        pass
+
+    def index_many(self, artist_ids=(), album_ids=(), song_ids=()):
+        pass
+
+    def remove(self, model, object_id):
+        pass
+
+    def rebuild(self):
+        return {}
+
+
+class SQLiteFTSBackend(IcontainsBackend):
+    """FTS5 backend ranked with bm25(); title matches weigh more than artist matches."""
+
+    name = 'sqlite_fts5'
+
+    def _match_expression(self, query):
+        # Every token must match, each as a prefix so typeahead input works
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def _search(self, table, query, limit, weights):
+        match = self._match_expression(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s '
+                f'ORDER BY bm25("{table}", {weights}) LIMIT %s',
+                [match, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_artists(self, query, limit):
+        return self._search(ARTIST_FTS_TABLE, query, limit, '10.0, 0.0')
+
+    def search_albums(self, query, limit):
+        return self._search(ALBUM_FTS_TABLE, query, limit, '10.0, 2.0')
+
+    def search_songs(self, query, limit):
+        return self._search(SONG_FTS_TABLE, query, limit, '10.0, 2.0')
+
+    def index_artist(self, artist_id, include_related=True):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{ARTIST_FTS_TABLE}" WHERE rowid = %s', [artist_id])
+            cursor.execute(
+                f'INSERT INTO "{ARTIST_FTS_TABLE}" (rowid, title, artist) {ARTIST_SOURCE_SQL} WHERE ar.id = %s',
+                [artist_id]
+            )
+            if include_related:
+                # Album and song rows carry the artist name, so a rename touches them too
+                self._reindex_where(cursor, 'ar.id = %s', [artist_id])
+
+    def index_album(self, album_id, include_related=True):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{ALBUM_FTS_TABLE}" WHERE rowid = %s', [album_id])
+            cursor.execute(
+                f'INSERT INTO "{ALBUM_FTS_TABLE}" (rowid, title, artist) {ALBUM_SOURCE_SQL} WHERE al.id = %s',
+                [album_id]
+            )
+            if include_related:
+                cursor.execute(f'DELETE FROM "{SONG_FTS_TABLE}" WHERE rowid IN ('
+                               f'SELECT id FROM "{Song._meta.db_table}" WHERE album_id = %s)', [album_id])
+                cursor.execute(
+                    f'INSERT INTO "{SONG_FTS_TABLE}" (rowid, title, artist) {SONG_SOURCE_SQL} WHERE al.id = %s',
+                    [album_id]
+                )
+
+    def _reindex_where(self, cursor, where, params):
+        cursor.execute(
+            f'DELETE FROM "{ALBUM_FTS_TABLE}" WHERE rowid IN ('
+            f'SELECT al.id FROM "{Album._meta.db_table}" al '
+            f'JOIN "{Artist._meta.db_table}" ar ON ar.id = al.artist_id WHERE {where})',
+            params
+        )
+        cursor.execute(
+            f'INSERT INTO "{ALBUM_FTS_TABLE}" (rowid, title, artist) {ALBUM_SOURCE_SQL} WHERE {where}',
+            params
+        )
+        cursor.execute(
+            f'DELETE FROM "{SONG_FTS_TABLE}" WHERE rowid IN ('
+            f'SELECT s.id FROM "{Song._meta.db_table}" s '
+            f'JOIN "{Album._meta.db_table}" al ON al.id = s.album_id '
+            f'JOIN "{Artist._meta.db_table}" ar ON ar.id = al.artist_id WHERE {where})',
+            params
+        )
+        cursor.execute(
+            f'INSERT INTO "{SONG_FTS_TABLE}" (rowid, title, artist) {SONG_SOURCE_SQL} WHERE {where}',
+            params
+        )
+
+    def index_song(self, song_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{SONG_FTS_TABLE}" WHERE rowid = %s', [song_id])
+            cursor.execute(
+                f'INSERT INTO "{SONG_FTS_TABLE}" (rowid, title, artist) {SONG_SOURCE_SQL} WHERE s.id = %s',
+                [song_id]
+            )
+
+    def index_many(self, artist_ids=(), album_ids=(), song_ids=()):
+        """Reindex many rows at once, e.g. after bulk_create() which sends no signals."""
+        with connection.cursor() as cursor:
+            for table, source_sql, alias, ids in (
+                (ARTIST_FTS_TABLE, ARTIST_SOURCE_SQL, 'ar', list(artist_ids)),
+                (ALBUM_FTS_TABLE, ALBUM_SOURCE_SQL, 'al', list(album_ids)),
+                (SONG_FTS_TABLE, SONG_SOURCE_SQL, 's', list(song_ids)),
+            ):
+                # Stay well under SQLite's bound parameter limit
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute(f'DELETE FROM "{table}" WHERE rowid IN ({placeholders})', chunk)
+                    cursor.execute(
+                        f'INSERT INTO "{table}" (rowid, title, artist) {source_sql} WHERE {alias}.id IN ({placeholders})',
+                        chunk
+                    )
+
+    def remove(self, model, object_id):
+        table = f'{model._meta.db_table}_fts'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{table}" WHERE rowid = %s', [object_id])
+
+    def rebuild(self):
+        counts = {}
+        with connection.cursor() as cursor:
+            for table, source_sql in (
+                (ARTIST_FTS_TABLE, ARTIST_SOURCE_SQL),
+                (ALBUM_FTS_TABLE, ALBUM_SOURCE_SQL),
+                (SONG_FTS_TABLE, SONG_SOURCE_SQL),
+            ):
+                cursor.execute(f'DELETE FROM "{table}"')
+                cursor.execute(f'INSERT INTO "{table}" (rowid, title, artist) {source_sql}')
+                counts[table] = cursor.rowcount
+                # Merge b-tree segments left behind by the bulk load
+                cursor.execute(f'INSERT INTO "{table}" ("{table}") VALUES (\'optimize\')')
+        return counts
+
+
+class PostgresFTSBackend(IcontainsBackend):
+    """
+    PostgreSQL backend using to_tsvector('simple', ...) expression indexes.
+    The expressions here must match the GIN indexes created in migration 0007.
+    When word-prefix matches do not fill the limit, substring matches on the
+    name column (served by the pg_trgm indexes from migration 0019) follow,
+    most similar first.
+    """
+
+    name = 'postgres_tsvector'
+
+    def _tsquery(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def _fetch_ids(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def _with_substring_matches(self, ids, model, column, query, limit):
+        """Append trigram substring matches on model.column until limit ids."""
+        query = (query or '').strip()
+        if len(ids) >= limit or len(query) < TRIGRAM_MIN_LENGTH:
+            return ids
+        pattern = '%' + LIKE_ESCAPE_RE.sub(r'\\\1', query) + '%'
+        matches = self._fetch_ids(
+            f'''SELECT id FROM "{model._meta.db_table}" WHERE "{column}" ILIKE %s
+                ORDER BY similarity("{column}", %s) DESC LIMIT %s''',
+            [pattern, query, limit]
+        )
+        seen = set(ids)
+        return ids + [object_id for object_id in matches if object_id not in seen][:limit - len(ids)]
+
+    def search_artists(self, query, limit):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return []
+        ids = self._fetch_ids(
+            f'''SELECT ar.id FROM "{Artist._meta.db_table}" ar, to_tsquery('simple', %s) q
+                WHERE to_tsvector('simple', ar.name) @@ q
+                ORDER BY ts_rank(to_tsvector('simple', ar.name), q) DESC LIMIT %s''',
+            [tsquery, limit]
+        )
+        return self._with_substring_matches(ids, Artist, 'name', query, limit)
+
+    def search_albums(self, query, limit):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return []
+        ids = self._fetch_ids(
+            f'''SELECT id FROM (
+                    SELECT al.id, ts_rank(to_tsvector('simple', al.title), q) * 5 AS rank
+                    FROM "{Album._meta.db_table}" al, to_tsquery('simple', %s) q
+                    WHERE to_tsvector('simple', al.title) @@ q
+                    UNION ALL
+                    SELECT al.id, ts_rank(to_tsvector('simple', ar.name), q) AS rank
+                    FROM "{Artist._meta.db_table}" ar
+                    JOIN "{Album._meta.db_table}" al ON al.artist_id = ar.id, to_tsquery('simple', %s) q
+                    WHERE to_tsvector('simple', ar.name) @@ q
+                ) hits GROUP BY id ORDER BY max(rank) DESC LIMIT %s''',
+            [tsquery, tsquery, limit]
+        )
+        return self._with_substring_matches(ids, Album, 'title', query, limit)
+
+    def search_songs(self, query, limit):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return []
+        ids = self._fetch_ids(
+            f'''SELECT id FROM (
+                    SELECT s.id, ts_rank(to_tsvector('simple', s.title), q) * 5 AS rank
+                    FROM "{Song._meta.db_table}" s, to_tsquery('simple', %s) q
+                    WHERE to_tsvector('simple', s.title) @@ q
+                    UNION ALL
+                    SELECT s.id, ts_rank(to_tsvector('simple', ar.name), q) AS rank
+                    FROM "{Artist._meta.db_table}" ar
+                    JOIN "{Album._meta.db_table}" al ON al.artist_id = ar.id
+                    JOIN "{Song._meta.db_table}" s ON s.album_id = al.id, to_tsquery('simple', %s) q
+                    WHERE to_tsvector('simple', ar.name) @@ q
+                ) hits GROUP BY id ORDER BY max(rank) DESC LIMIT %s''',
+            [tsquery, tsquery, limit]
+        )
+        return self._with_substring_matches(ids, Song, 'title', query, limit)
+
+    def rebuild(self):
+        # Expression indexes are maintained by PostgreSQL itself
+        with connection.cursor() as cursor:
+            for model in (Artist, Album, Song):
+                cursor.execute(f'REINDEX TABLE "{model._meta.db_table}"')
+        return {}
+
+
+_backend = None
+
+
+def sqlite_fts_available():
+    """Check that the FTS5 tables from migration 0007 exist on this database."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s, %s)",
+            [ARTIST_FTS_TABLE, ALBUM_FTS_TABLE, SONG_FTS_TABLE]
+        )
+        return cursor.fetchone()[0] == 3
+
+
+def get_backend():
+    """Return the search backend for the default database connection."""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'sqlite' and sqlite_fts_available():
+            _backend = SQLiteFTSBackend()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresFTSBackend()
+        else:
+            _backend = IcontainsBackend()
+        logger.info(f"Using '{_backend.name}' catalog search backend")
+    return _backend
+
+
+def reset_backend():
+    """Forget the cached backend (after migrations or in tests)."""
+    global _backend
+    _backend = None
+
+
+def _in_order(queryset, ids):
+    """Fetch objects by id and return them in the given ranked order."""
+    objects = queryset.in_bulk(ids)
+    return [objects[object_id] for object_id in ids if object_id in objects]
+
+
+def search_artists(query, limit=10):
+    """Return artists matching query, best match first."""
+    ids = get_backend().search_artists(query, limit)
+    return _in_order(Artist.objects.all(), ids)
+
+
+def search_albums(query, limit=10):
+    """Return albums matching query by title or artist name, best match first."""
+    ids = get_backend().search_albums(query, limit)
+    return _in_order(Album.objects.select_related('artist'), ids)
+
+
+def search_songs(query, limit=10):
+    """Return songs matching query by title or artist name, best match first."""
+    ids = get_backend().search_songs(query, limit)
+    return _in_order(Song.objects.select_related('album', 'album__artist'), ids)
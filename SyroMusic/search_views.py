@@ -3,18 +3,34 @@ Search and discovery views for SyroMusic application.
 Handles search, recommendations, and playlist management.
 """
 
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.db.models import Q
+from django.conf import settings
 
 from .models import (
     Artist, Album, Song, Playlist,
     SpotifyUser, UserListeningStats
 )
+from .pagination import KeysetPage
 from .services import SpotifyService, TokenManager
+from . import (
+    catalog_ingest, fuzzy_index, genre_shelves, item_recommender, playlist_tracks,
+    recommendation_cache, saved_tracks, search_cache, search_index, typeahead,
+)
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for concurrent Spotify search lookups
+SEARCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='search')
 
 
 def search(request):
@@ -32,19 +48,13 @@ def search(request):
     if query and len(query) >= 2:
         # Search local database
         if search_type in ['all', 'artist']:
-            results['artists'] = Artist.objects.filter(
-                Q(name__icontains=query)
-            )[:10]
+            results['artists'] = search_index.search_artists(query, limit=10)
 
         if search_type in ['all', 'album']:
-            results['albums'] = Album.objects.filter(
-                Q(title__icontains=query) | Q(artist__name__icontains=query)
-            ).select_related('artist')[:10]
+            results['albums'] = search_index.search_albums(query, limit=10)
 
         if search_type in ['all', 'track']:
-            results['songs'] = Song.objects.filter(
-                Q(title__icontains=query) | Q(album__artist__name__icontains=query)
-            ).select_related('album', 'album__artist')[:10]
+            results['songs'] = search_index.search_songs(query, limit=10)
 
         if search_type in ['all', 'playlist']:
             if request.user.is_authenticated:
@@ -63,19 +73,20 @@ def search(request):
                         sp = SpotifyService(access_token=access_token)
 
                         if search_type in ['all', 'artist']:
-                            spotify_artists = sp.search(query, 'artist', limit=5)
+                            spotify_artists = search_cache.spotify_search(sp, query, 'artist', limit=5)
                             results['spotify_artists'] = spotify_artists
 
                         if search_type in ['all', 'album']:
-                            spotify_albums = sp.search(query, 'album', limit=5)
+                            spotify_albums = search_cache.spotify_search(sp, query, 'album', limit=5)
                             results['spotify_albums'] = spotify_albums
 
                         if search_type in ['all', 'track']:
-                            spotify_tracks = sp.search(query, 'track', limit=5)
+                            spotify_tracks = search_cache.spotify_search(sp, query, 'track', limit=5)
                             results['spotify_tracks'] = spotify_tracks
+                            _enqueue_tracks(spotify_tracks)
 
                         if search_type in ['all', 'playlist']:
-                            spotify_playlists = sp.search(query, 'playlist', limit=5)
+                            spotify_playlists = search_cache.spotify_search(sp, query, 'playlist', limit=5)
                             results['spotify_playlists'] = spotify_playlists
             except Exception as e:
                 messages.warning(request, f'Could not search Spotify: {str(e)}')
@@ -88,6 +99,361 @@ def search(request):
     return render(request, 'SyroMusic/search.html', context)
 
 
+LOCAL_SEARCH_LIMITS = {'songs': 10, 'artists': 5, 'albums': 5}
+
+
+def _song_result(song_id, title, spotify_id, album_id, album_title, cover_url, artist_id, artist_name):
+    """Shape a local song for search_json_api."""
+    return {
+        'type': 'song',
+        'id': song_id,
+        'title': title,
+        'spotify_id': spotify_id or '',
+        'uri': f'spotify:track:{spotify_id}' if spotify_id else None,
+        'album': {
+            'id': album_id,
+            'title': album_title or 'Unknown Album',
+            'artist': {
+                'id': artist_id,
+                'name': artist_name or 'Unknown Artist',
+            },
+            'cover_url': cover_url or '',
+        },
+    }
+
+
+def _artist_result(artist_id, name, biography=''):
+    """Shape a local artist for search_json_api."""
+    return {
+        'type': 'artist',
+        'id': artist_id,
+        'name': name or 'Unknown',
+        'biography': biography or '',
+        'image_url': '',
+    }
+
+
+def _album_result(album_id, title, artist_id, artist_name, cover_url, release_date):
+    """Shape a local album for search_json_api."""
+    return {
+        'type': 'album',
+        'id': album_id,
+        'title': title or 'Unknown Album',
+        'artist': {
+            'id': artist_id,
+            'name': artist_name or 'Unknown Artist',
+        },
+        'cover_url': cover_url or '',
+        'release_date': release_date or '',
+    }
+
+
+def _spotify_track_result(track):
+    """Shape a Spotify track search item for search_json_api."""
+    artist_info = track.get('artists', [{}])[0] if track.get('artists') else {}
+    album_info = track.get('album', {})
+    return {
+        'type': 'track',
+        'id': track.get('id', ''),
+        'title': track.get('name', 'Unknown'),
+        'spotify_id': track.get('id', ''),
+        'uri': track.get('uri', ''),
+        'preview_url': track.get('preview_url', ''),
+        'album': {
+            'id': album_info.get('id', ''),
+            'title': album_info.get('name', 'Unknown Album'),
+            'artist': {
+                'id': artist_info.get('id', ''),
+                'name': artist_info.get('name', 'Unknown Artist'),
+            },
+            'cover_url': (album_info.get('images', [{}])[0].get('url', '')
+                          if album_info.get('images') else ''),
+        },
+    }
+
+
+def _spotify_artist_result(artist):
+    """Shape a Spotify artist search item for search_json_api."""
+    return {
+        'type': 'artist',
+        'id': artist.get('id', ''),
+        'name': artist.get('name', 'Unknown'),
+        'biography': '',
+        'image_url': (artist.get('images', [{}])[0].get('url', '')
+                      if artist.get('images') else ''),
+    }
+
+
+def _spotify_album_result(album):
+    """Shape a Spotify album search item for search_json_api."""
+    artist_info = album.get('artists', [{}])[0] if album.get('artists') else {}
+    return {
+        'type': 'album',
+        'id': album.get('id', ''),
+        'title': album.get('name', 'Unknown'),
+        'artist': {
+            'id': artist_info.get('id', ''),
+            'name': artist_info.get('name', 'Unknown'),
+        },
+        'cover_url': (album.get('images', [{}])[0].get('url', '')
+                      if album.get('images') else ''),
+        'release_date': album.get('release_date', ''),
+    }
+
+
+def _local_result_text(item):
+    """Text a local search result matches on: its name plus artist name."""
+    if item['type'] == 'artist':
+        return item['name']
+    artist = item['album']['artist'] if item['type'] == 'song' else item['artist']
+    return f"{item['title']} {artist['name']}"
+
+
+def search_local_catalog(query):
+    """
+    Search the local catalog for search_json_api.
+    Uses the in-process typeahead index when enabled, otherwise the full-text
+    index, and shares results across users through the search cache.
+    """
+    index = typeahead.get_index()
+    if index is not None:
+        namespace, matcher = 'typeahead', 'word_prefix'
+        fetchers = {
+            'songs': lambda limit: [
+                _song_result(*record[1:]) for record in index.search(query, 'song', limit=limit)
+            ],
+            'artists': lambda limit: [
+                _artist_result(*record[1:]) for record in index.search(query, 'artist', limit=limit)
+            ],
+            'albums': lambda limit: [
+                _album_result(*record[1:]) for record in index.search(query, 'album', limit=limit)
+            ],
+        }
+    else:
+        namespace, matcher = 'fts', 'token_prefix'
+        fetchers = {
+            'songs': lambda limit: [
+                _song_result(
+                    song.id, song.title, song.spotify_id, song.album.id, song.album.title,
+                    song.album.cover_url, song.album.artist.id, song.album.artist.name
+                )
+                for song in search_index.search_songs(query, limit=limit)
+            ],
+            'artists': lambda limit: [
+                _artist_result(artist.id, artist.name, artist.biography)
+                for artist in search_index.search_artists(query, limit=limit)
+            ],
+            'albums': lambda limit: [
+                _album_result(
+                    album.id, album.title, album.artist.id, album.artist.name, album.cover_url,
+                    str(album.release_date) if album.release_date else ''
+                )
+                for album in search_index.search_albums(query, limit=limit)
+            ],
+        }
+
+    generation = search_cache.local_generation()
+    results = {
+        group: search_cache.cached_search(
+            namespace, group, query, limit,
+            lambda fetch=fetchers[group], limit=limit: fetch(limit),
+            _local_result_text,
+            matcher=matcher,
+            timeout=getattr(settings, 'SEARCH_CACHE_TTL', 300),
+            version=generation,
+        )
+        for group, limit in LOCAL_SEARCH_LIMITS.items()
+    }
+
+    # Few exact matches usually means a typo; try the trigram index before Spotify
+    if len(results['songs']) < 3 and len(typeahead.normalize(query)) >= 3:
+        try:
+            _add_fuzzy_results(query, results, generation)
+        except Exception as e:
+            logger.error(f'Fuzzy search error for "{query}": {str(e)}')
+    return results
+
+
+def _fuzzy_search_fetchers(index, query):
+    """Fetchers for search_local_catalog's fuzzy fallback, hydrating ids from the database."""
+    def ranked(queryset, kind, limit):
+        ids = [object_id for object_id, _ in index.search(query, kind, limit=limit)]
+        found = queryset.in_bulk(ids)
+        return [found[object_id] for object_id in ids if object_id in found]
+
+    def songs(limit):
+        return [
+            _song_result(
+                song.id, song.title, song.spotify_id, song.album.id, song.album.title,
+                song.album.cover_url, song.album.artist.id, song.album.artist.name
+            )
+            for song in ranked(Song.objects.select_related('album', 'album__artist'), 'song', limit)
+        ]
+
+    def artists(limit):
+        return [
+            _artist_result(artist.id, artist.name, artist.biography)
+            for artist in ranked(Artist.objects.all(), 'artist', limit)
+        ]
+
+    def albums(limit):
+        return [
+            _album_result(
+                album.id, album.title, album.artist.id, album.artist.name, album.cover_url,
+                str(album.release_date) if album.release_date else ''
+            )
+            for album in ranked(Album.objects.select_related('artist'), 'album', limit)
+        ]
+
+    return {'songs': songs, 'artists': artists, 'albums': albums}
+
+
+def _add_fuzzy_results(query, results, generation):
+    """Append typo-tolerant matches to sparse local results, skipping ones already present."""
+    index = fuzzy_index.get_index()
+    if index is None:
+        return
+    fetchers = _fuzzy_search_fetchers(index, query)
+    for group, limit in LOCAL_SEARCH_LIMITS.items():
+        if len(results[group]) >= limit:
+            continue
+        items = search_cache.cached_search(
+            'fuzzy', group, query, limit,
+            lambda fetch=fetchers[group], limit=limit: fetch(limit),
+            _local_result_text,
+            matcher=None,
+            timeout=getattr(settings, 'SEARCH_CACHE_TTL', 300),
+            version=generation,
+        )
+        seen = {item['id'] for item in results[group]}
+        results[group] = results[group] + [item for item in items if item['id'] not in seen][:limit - len(results[group])]
+
+
+def _spotify_fallback_searches(user, query, results, seen_tracks):
+    """
+    Spotify lookups to add to sparse local results, as {group: callable}.
+    Empty when local results suffice or the user has no usable Spotify token.
+    Raw Spotify tracks found are appended to seen_tracks for catalog warming.
+    """
+    if len(results['songs']) >= 8:
+        return {}
+
+    spotify_user = SpotifyUser.objects.filter(user=user).first()
+    if not spotify_user:
+        return {}
+    access_token = TokenManager.refresh_user_token(spotify_user)
+    if not access_token:
+        return {}
+    sp = SpotifyService(access_token=access_token)
+
+    def search_tracks():
+        tracks = search_cache.spotify_search(sp, query, 'track', limit=10)
+        seen_tracks.extend(tracks)
+        return [_spotify_track_result(track) for track in tracks]
+
+    searches = {'songs': search_tracks}
+    if len(results['artists']) < 5:
+        searches['artists'] = lambda: [
+            _spotify_artist_result(artist)
+            for artist in search_cache.spotify_search(sp, query, 'artist', limit=5)
+        ]
+    if len(results['albums']) < 5:
+        searches['albums'] = lambda: [
+            _spotify_album_result(album)
+            for album in search_cache.spotify_search(sp, query, 'album', limit=5)
+        ]
+    return searches
+
+
+def _merge_spotify_results(results, group, items):
+    """Add Spotify items to results[group], skipping duplicates; returns the items added."""
+    added = []
+    for item in items:
+        if group == 'songs':
+            # Avoid duplicates
+            if any(s.get('spotify_id') == item['spotify_id'] for s in results['songs']):
+                continue
+            if len(results['songs']) >= 20:
+                break
+        elif any(existing.get('id') == item['id'] for existing in results[group]):
+            continue
+        results[group].append(item)
+        added.append(item)
+    return added
+
+
+def _warm_catalog(query, results, seen_tracks, used_spotify):
+    """
+    Queue Spotify tracks found by a search for ingestion into the local
+    catalog, and log how well the local catalog answered the query.
+    """
+    local_songs = sum(1 for song in results['songs'] if song.get('type') == 'song')
+    logger.info(
+        f'Search "{query}": {local_songs} local songs, '
+        f'spotify fallback {"used" if used_spotify else "skipped"}'
+    )
+    _enqueue_tracks(seen_tracks)
+
+
+def _enqueue_tracks(tracks):
+    """Queue tracks for catalog ingestion; a broker outage must not fail the search."""
+    if tracks:
+        try:
+            catalog_ingest.enqueue_tracks(tracks)
+        except Exception as e:
+            logger.error(f'Error queueing Spotify tracks for ingestion: {str(e)}')
+
+
+def _run_concurrently(searches, deadline):
+    """
+    Run {group: callable} on the shared search pool and yield
+    (group, items, error) as each finishes, until time.monotonic() passes deadline.
+    Groups still running at the deadline are yielded with error 'timeout'.
+    """
+    futures = {SEARCH_POOL.submit(fn): group for group, fn in searches.items()}
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], [], str(e)
+    for future in pending:
+        future.cancel()
+        yield futures[future], [], 'timeout'
+
+
+def _stream_search(user, query):
+    """NDJSON lines for search_json_api: local groups at once, then Spotify groups as they arrive."""
+    deadline = time.monotonic() + getattr(settings, 'SEARCH_STREAM_DEADLINE', 2.0)
+    try:
+        results = search_local_catalog(query)
+        for group in ('songs', 'artists', 'albums'):
+            yield json.dumps({'group': group, 'source': 'local', 'items': results[group]}) + '\n'
+
+        timed_out = []
+        seen_tracks = []
+        searches = _spotify_fallback_searches(user, query, results, seen_tracks)
+        for group, items, error in _run_concurrently(searches, deadline):
+            if error:
+                logger.warning(f'Spotify {group} search failed for query "{query}": {error}')
+                if error == 'timeout':
+                    timed_out.append(group)
+                continue
+            added = _merge_spotify_results(results, group, items)
+            if added:
+                yield json.dumps({'group': group, 'source': 'spotify', 'items': added}) + '\n'
+
+        _warm_catalog(query, results, list(seen_tracks), bool(searches))
+        yield json.dumps({'status': 'success', 'done': True, 'timed_out': timed_out}) + '\n'
+    except Exception as e:
+        logger.error(f'Streaming search error: {str(e)}')
+        yield json.dumps({'status': 'error', 'done': True, 'message': 'Search failed. Please try again.'}) + '\n'
+
+
 @login_required(login_url='login')
 def search_json_api(request):
     """
@@ -95,10 +461,12 @@ def search_json_api(request):
     Used by AJAX for real-time search in player and playlists.
     Returns songs, artists, and albums in JSON format with full metadata.
     Requires authentication for security.
-    """
-    import logging
-    logger = logging.getLogger(__name__)
 
+    With ?stream=1 (or Accept: application/x-ndjson) the response is NDJSON:
+    one {"group", "source", "items"} line per local group straight away, one
+    per Spotify group as each concurrent lookup finishes (new items only), and
+    a final {"status", "done", "timed_out"} line, all within SEARCH_STREAM_DEADLINE.
+    """
     query = request.GET.get('q', '').strip()
 
     if not query or len(query) < 2:
@@ -110,158 +478,31 @@ def search_json_api(request):
             'message': 'Query must be at least 2 characters'
         })
 
-    try:
-        results = {
-            'songs': [],
-            'artists': [],
-            'albums': [],
-        }
-
-        # Search local database for songs
-        local_songs = Song.objects.filter(
-            Q(title__icontains=query) | Q(album__artist__name__icontains=query)
-        ).select_related('album', 'album__artist')[:10]
-
-        for song in local_songs:
-            # Add validation for required fields
-            if song.album and song.album.artist:
-                results['songs'].append({
-                    'type': 'song',
-                    'id': song.id,
-                    'title': song.title,
-                    'spotify_id': song.spotify_id or '',
-                    'uri': f'spotify:track:{song.spotify_id}' if song.spotify_id else None,
-                    'album': {
-                        'id': song.album.id,
-                        'title': song.album.title or 'Unknown Album',
-                        'artist': {
-                            'id': song.album.artist.id,
-                            'name': song.album.artist.name or 'Unknown Artist',
-                        },
-                        'cover_url': song.album.cover_url or '',
-                    },
-                })
-
-        # Search local database for artists
-        local_artists = Artist.objects.filter(
-            Q(name__icontains=query)
-        )[:5]
-
-        for artist in local_artists:
-            results['artists'].append({
-                'type': 'artist',
-                'id': artist.id,
-                'name': artist.name or 'Unknown',
-                'biography': artist.biography or '',
-                'image_url': getattr(artist, 'image_url', ''),
-            })
+    if request.GET.get('stream') in ('1', 'true') or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        response = StreamingHttpResponse(_stream_search(request.user, query), content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Don't let nginx hold back the early lines
+        return response
 
-        # Search local database for albums
-        local_albums = Album.objects.filter(
-            Q(title__icontains=query) | Q(artist__name__icontains=query)
-        ).select_related('artist')[:5]
-
-        for album in local_albums:
-            if album.artist:
-                results['albums'].append({
-                    'type': 'album',
-                    'id': album.id,
-                    'title': album.title or 'Unknown Album',
-                    'artist': {
-                        'id': album.artist.id,
-                        'name': album.artist.name or 'Unknown Artist',
-                    },
-                    'cover_url': album.cover_url or '',
-                    'release_date': str(album.release_date) if album.release_date else '',
-                })
+    try:
+        deadline = time.monotonic() + getattr(settings, 'SEARCH_STREAM_DEADLINE', 2.0)
+        results = search_local_catalog(query)
 
         # If local results are sparse, search Spotify
-        if len(results['songs']) < 8:
-            try:
-                spotify_user = SpotifyUser.objects.filter(user=request.user).first()
-                if spotify_user:
-                    access_token = TokenManager.refresh_user_token(spotify_user)
-                    if access_token:
-                        sp = SpotifyService(access_token=access_token)
+        searches = {}
+        seen_tracks = []
+        try:
+            searches = _spotify_fallback_searches(request.user, query, results, seen_tracks)
+            for group, items, error in _run_concurrently(searches, deadline):
+                if error:
+                    logger.warning(f'Spotify {group} search failed for query "{query}": {error}')
+                    continue
+                _merge_spotify_results(results, group, items)
+        except Exception as e:
+            logger.error(f'Spotify service error during search for "{query}": {str(e)}')
+            # Continue with local results if Spotify fails
 
-                        # Search for tracks on Spotify
-                        try:
-                            spotify_results = sp.search(query, 'track', limit=10)
-                            if spotify_results and 'tracks' in spotify_results:
-                                for track in spotify_results['tracks']['items']:
-                                    # Avoid duplicates
-                                    spotify_id = track.get('id', '')
-                                    if not any(s.get('spotify_id') == spotify_id for s in results['songs']):
-                                        if len(results['songs']) < 20:
-                                            artist_info = track.get('artists', [{}])[0] if track.get('artists') else {}
-                                            album_info = track.get('album', {})
-
-                                            results['songs'].append({
-                                                'type': 'track',
-                                                'id': spotify_id,
-                                                'title': track.get('name', 'Unknown'),
-                                                'spotify_id': spotify_id,
-                                                'uri': track.get('uri', ''),
-                                                'preview_url': track.get('preview_url', ''),
-                                                'album': {
-                                                    'id': album_info.get('id', ''),
-                                                    'title': album_info.get('name', 'Unknown Album'),
-                                                    'artist': {
-                                                        'id': artist_info.get('id', ''),
-                                                        'name': artist_info.get('name', 'Unknown Artist'),
-                                                    },
-                                                    'cover_url': (album_info.get('images', [{}])[0].get('url', '')
-                                                                 if album_info.get('images') else ''),
-                                                },
-                                            })
-                        except Exception as e:
-                            logger.warning(f'Spotify track search failed for query "{query}": {str(e)}')
-
-                        # Search for artists on Spotify
-                        if len(results['artists']) < 5:
-                            try:
-                                artist_results = sp.search(query, 'artist', limit=5)
-                                if artist_results and 'artists' in artist_results:
-                                    for artist in artist_results['artists']['items']:
-                                        artist_id = artist.get('id', '')
-                                        if not any(a.get('id') == artist_id for a in results['artists']):
-                                            results['artists'].append({
-                                                'type': 'artist',
-                                                'id': artist_id,
-                                                'name': artist.get('name', 'Unknown'),
-                                                'biography': '',
-                                                'image_url': (artist.get('images', [{}])[0].get('url', '')
-                                                             if artist.get('images') else ''),
-                                            })
-                            except Exception as e:
-                                logger.warning(f'Spotify artist search failed for query "{query}": {str(e)}')
-
-                        # Search for albums on Spotify
-                        if len(results['albums']) < 5:
-                            try:
-                                album_results = sp.search(query, 'album', limit=5)
-                                if album_results and 'albums' in album_results:
-                                    for album in album_results['albums']['items']:
-                                        album_id = album.get('id', '')
-                                        if not any(a.get('id') == album_id for a in results['albums']):
-                                            artist_info = album.get('artists', [{}])[0] if album.get('artists') else {}
-                                            results['albums'].append({
-                                                'type': 'album',
-                                                'id': album_id,
-                                                'title': album.get('name', 'Unknown'),
-                                                'artist': {
-                                                    'id': artist_info.get('id', ''),
-                                                    'name': artist_info.get('name', 'Unknown'),
-                                                },
-                                                'cover_url': (album.get('images', [{}])[0].get('url', '')
-                                                             if album.get('images') else ''),
-                                                'release_date': album.get('release_date', ''),
-                                            })
-                            except Exception as e:
-                                logger.warning(f'Spotify album search failed for query "{query}": {str(e)}')
-            except Exception as e:
-                logger.error(f'Spotify service error during search for "{query}": {str(e)}')
-                # Continue with local results if Spotify fails
+        _warm_catalog(query, results, list(seen_tracks), bool(searches))
 
         return JsonResponse({
             'status': 'success',
@@ -280,46 +521,42 @@ def search_json_api(request):
 
 @login_required(login_url='login')
 def recommendations(request):
-    """Personalized recommendations based on user's top tracks/artists."""
+    """
+    Personalized recommendations based on user's top tracks/artists.
+    Served from the per-user seed-set cache (see recommendation_cache.py),
+    which the stats sync keeps warm.
+    """
     try:
         spotify_user = SpotifyUser.objects.filter(user=request.user).first()
         if not spotify_user or not spotify_user.is_connected:
             messages.warning(request, 'Please connect your Spotify account.')
             return redirect('music:dashboard')
 
-        access_token = TokenManager.refresh_user_token(spotify_user)
-        if not access_token:
-            messages.error(request, 'Failed to refresh Spotify token.')
-            return redirect('music:dashboard')
-
         listening_stats = UserListeningStats.objects.filter(user=request.user).first()
-        sp = SpotifyService(access_token=access_token)
-
-        # Get seed data for recommendations
-        seed_artists = []
-        seed_tracks = []
-        seed_genres = []
-
-        if listening_stats:
-            # Extract IDs from top artists and tracks
-            top_artists = listening_stats.top_artists_medium_term[:3]
-            top_tracks = listening_stats.top_tracks_medium_term[:2]
-
-            if top_artists:
-                seed_artists = [a.get('id') for a in top_artists if a.get('id')]
-            if top_tracks:
-                seed_tracks = [t.get('id') for t in top_tracks if t.get('id')]
-
-        # Get recommendations
-        recommendations_data = sp.get_recommendations(
-            seed_artists=seed_artists if seed_artists else None,
-            seed_tracks=seed_tracks if seed_tracks else None,
-            seed_genres=seed_genres if seed_genres else None,
-            limit=20
-        )
+        seeds = recommendation_cache.seeds_for(listening_stats)
+
+        recommendations_data = recommendation_cache.get_cached(request.user.id, seeds)
+        if recommendations_data is None:
+            access_token = TokenManager.refresh_user_token(spotify_user)
+            if not access_token:
+                messages.error(request, 'Failed to refresh Spotify token.')
+                return redirect('music:dashboard')
+
+            sp = SpotifyService(access_token=access_token)
+            recommendations_data = recommendation_cache.fetch(request.user.id, sp, seeds)
+
+        # Co-listening picks from Syro's own activity data; stand in when Spotify has none
+        try:
+            local_recommendations = item_recommender.recommend_tracks(request.user, limit=20)
+        except Exception as e:
+            logger.error(f'Local recommendations error: {str(e)}')
+            local_recommendations = []
+        if not recommendations_data:
+            recommendations_data, local_recommendations = local_recommendations, []
 
         context = {
             'recommendations': recommendations_data,
+            'local_recommendations': local_recommendations,
             'spotify_user': spotify_user,
         }
         return render(request, 'SyroMusic/recommendations.html', context)
@@ -360,7 +597,7 @@ def playlist_detail(request, playlist_id):
     """View and manage a specific playlist."""
     try:
         playlist = get_object_or_404(Playlist, id=playlist_id, user=request.user)
-        songs = playlist.songs.all()
+        songs = playlist_tracks.ordered_songs(playlist)
 
         context = {
             'playlist': playlist,
@@ -432,13 +669,12 @@ def add_song_to_playlist(request):
         playlist = get_object_or_404(Playlist, id=playlist_id, user=request.user)
         song = get_object_or_404(Song, id=song_id)
 
-        if playlist.songs.filter(id=song_id).exists():
+        if not playlist_tracks.add(playlist, [song.id]):
             return JsonResponse({
                 'status': 'info',
                 'message': 'Song already in playlist'
             })
 
-        playlist.songs.add(song)
         return JsonResponse({
             'status': 'success',
             'message': f'"{song.title}" added to playlist'
@@ -462,7 +698,7 @@ def remove_song_from_playlist(request):
         playlist = get_object_or_404(Playlist, id=playlist_id, user=request.user)
         song = get_object_or_404(Song, id=song_id)
 
-        playlist.songs.remove(song)
+        playlist_tracks.remove(playlist, [song.id])
         return JsonResponse({
             'status': 'success',
             'message': f'"{song.title}" removed from playlist'
@@ -477,40 +713,34 @@ def remove_song_from_playlist(request):
 
 @login_required(login_url='login')
 def browse_by_genre(request):
-    """Browse music by genre/category."""
+    """
+    Browse music by genre/category.
+    Serves the shared precomputed shelves (see genre_shelves.py); Spotify is
+    only called with the user's token for genres the shared set lacks.
+    """
     try:
+        payload = genre_shelves.get_shelves()
+        shelves = payload['shelves'] if payload else []
         spotify_user = SpotifyUser.objects.filter(user=request.user).first()
-        if not spotify_user or not spotify_user.is_connected:
-            messages.warning(request, 'Please connect your Spotify account.')
-            return redirect('music:dashboard')
 
-        access_token = TokenManager.refresh_user_token(spotify_user)
-        if not access_token:
-            messages.error(request, 'Failed to refresh Spotify token.')
-            return redirect('music:dashboard')
-
-        # Popular genres to display
-        genres = [
-            'pop', 'rock', 'hip-hop', 'r-n-b',
-            'electronic', 'indie', 'folk', 'country',
-            'jazz', 'classical', 'reggae', 'latin'
-        ]
-
-        genre_data = []
-        sp = SpotifyService(access_token=access_token)
-
-        for genre in genres:
-            try:
-                recommendations = sp.get_recommendations(
-                    seed_genres=[genre],
-                    limit=5
-                )
-                genre_data.append({
-                    'name': genre.title(),
-                    'tracks': recommendations
-                })
-            except Exception:
-                pass
+        sp = None
+        if len(shelves) < len(genre_shelves.GENRES):
+            if not spotify_user or not spotify_user.is_connected:
+                if not shelves:
+                    messages.warning(request, 'Please connect your Spotify account.')
+                    return redirect('music:dashboard')
+            else:
+                access_token = TokenManager.refresh_user_token(spotify_user)
+                if access_token:
+                    sp = SpotifyService(access_token=access_token)
+                elif not shelves:
+                    messages.error(request, 'Failed to refresh Spotify token.')
+                    return redirect('music:dashboard')
+
+        favorite_genres = UserListeningStats.objects.filter(
+            user=request.user
+        ).values_list('favorite_genres', flat=True).first() or []
+        genre_data = genre_shelves.personalize(shelves, sp, favorite_genres)
 
         context = {
             'genres': genre_data,
@@ -523,23 +753,28 @@ def browse_by_genre(request):
         return redirect('music:dashboard')
 
 
+SAVED_TRACKS_PAGE_SIZE = 50
+
+
+@login_required(login_url='login')
+def saved_track_list(request):
+    """The user's liked tracks, newest first, a keyset page at a time."""
+    page = KeysetPage(
+        saved_tracks.for_user(request.user).select_related('song__album__artist'), saved_tracks.ORDERING,
+        request.GET.get('cursor'), SAVED_TRACKS_PAGE_SIZE,
+    )
+    return render(request, 'SyroMusic/saved_tracks.html', {'page': page})
+
+
 @login_required(login_url='login')
 def save_track(request, song_id):
     """Save/like a track."""
     try:
         song = get_object_or_404(Song, id=song_id)
 
-        # Save to user's "Liked Tracks" playlist
-        saved_playlist, created = Playlist.objects.get_or_create(
-            user=request.user,
-            title='Liked Tracks',
-            defaults={'description': 'Your saved tracks'}
-        )
-
-        if saved_playlist.songs.filter(id=song_id).exists():
+        if not saved_tracks.save(request.user, [song.id]):
             messages.info(request, f'"{song.title}" is already in your liked tracks.')
         else:
-            saved_playlist.songs.add(song)
             messages.success(request, f'"{song.title}" added to liked tracks!')
 
         referer = request.META.get('HTTP_REFERER')
@@ -558,16 +793,10 @@ def unsave_track(request, song_id):
     try:
         song = get_object_or_404(Song, id=song_id)
 
-        saved_playlist = Playlist.objects.filter(
-            user=request.user,
-            title='Liked Tracks'
-        ).first()
-
-        if saved_playlist:
-            saved_playlist.songs.remove(song)
+        if saved_tracks.unsave(request.user, [song.id]):
             messages.success(request, f'"{song.title}" removed from liked tracks.')
         else:
-            messages.info(request, 'No liked tracks playlist found.')
+            messages.info(request, f'"{song.title}" is not in your liked tracks.')
 
         referer = request.META.get('HTTP_REFERER')
         if referer:
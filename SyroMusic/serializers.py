@@ -2,12 +2,18 @@
 Serializers for SyroMusic API endpoints using Django REST Framework.
 """
 
+from functools import partial
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.duration import duration_string
 from .models import (
     Artist, Album, Song, Playlist,
     SpotifyUser, UserListeningStats, UserListeningActivity
 )
+from . import playlist_tracks
 
 
 # ============================================================
@@ -84,9 +90,12 @@ class SongSerializer(serializers.ModelSerializer):
 
 
 class PlaylistSerializer(serializers.ModelSerializer):
-    """Serializer for Playlist model."""
+    """
+    Serializer for Playlist model. Songs are listed in playlist order;
+    song_ids sets the whole track list, in the order given.
+    """
     user = UserSerializer(read_only=True)
-    songs = SongSerializer(many=True, read_only=True)
+    songs = serializers.SerializerMethodField()
     song_ids = serializers.PrimaryKeyRelatedField(
         queryset=Song.objects.all(),
         write_only=True,
@@ -99,6 +108,67 @@ class PlaylistSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'user', 'songs', 'song_ids', 'description', 'created_at', 'updated_at']
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
 
+    def get_songs(self, obj):
+        tracks = obj.tracks.all()  # In position order (PlaylistTrack.Meta.ordering)
+        if 'tracks' not in getattr(obj, '_prefetched_objects_cache', {}):
+            tracks = tracks.select_related('song__album__artist')
+        return SongSerializer([track.song for track in tracks], many=True, context=self.context).data
+
+    def create(self, validated_data):
+        songs = validated_data.pop('songs', [])
+        playlist = super().create(validated_data)
+        playlist_tracks.replace(playlist, [song.id for song in songs])
+        return playlist
+
+    def update(self, instance, validated_data):
+        songs = validated_data.pop('songs', None)
+        playlist = super().update(instance, validated_data)
+        if songs is not None:
+            playlist_tracks.replace(playlist, [song.id for song in songs])
+        return playlist
+
+
+class PlaylistTracksEditSerializer(serializers.Serializer):
+    """
+    Body of the bulk track edits: local song ids and/or Spotify track URIs,
+    and an index to place them at (end if omitted).
+    """
+    MAX_TRACKS = 10000
+
+    song_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    track_uris = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list)
+    position = serializers.IntegerField(min_value=0, required=False, allow_null=True)
+
+    def validate(self, data):
+        count = len(data['song_ids']) + len(data['track_uris'])
+        if not count:
+            raise serializers.ValidationError('Provide song_ids and/or track_uris.')
+        if count > self.MAX_TRACKS:
+            raise serializers.ValidationError(f'At most {self.MAX_TRACKS} tracks per request.')
+        return data
+
+
+class PlaylistSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact playlist representation for listings. track_count and
+    total_duration are annotated by the queryset; cover_mosaic comes from
+    the 'covers' context ({playlist id: [cover urls]}).
+    """
+    track_count = serializers.IntegerField(read_only=True)
+    total_duration = serializers.DurationField(read_only=True)
+    cover_mosaic = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Playlist
+        fields = [
+            'id', 'title', 'description', 'track_count', 'total_duration',
+            'cover_mosaic', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+    def get_cover_mosaic(self, obj):
+        return self.context.get('covers', {}).get(obj.id, [])
+
 
 # ============================================================
 # Listening Statistics Serializers
@@ -143,7 +213,7 @@ class UserListeningStatsSerializer(serializers.ModelSerializer):
         """Get the 10 most recent listening activities."""
         recent = UserListeningActivity.objects.filter(
             user=obj.user
-        ).order_by('-played_at')[:10]
+        ).select_related('user').order_by('-played_at')[:10]
         return UserListeningActivitySerializer(recent, many=True).data
 
 
@@ -172,3 +242,155 @@ class SyncStatusSerializer(serializers.Serializer):
     message = serializers.CharField()
     last_synced = serializers.DateTimeField(required=False)
     task_id = serializers.CharField(required=False)
+
+
+# ============================================================
+# Fast Read Serializers
+# ============================================================
+
+def _datetime(value, tz=None):
+    """DateTimeField's ISO 8601 output, without a serializer field per call."""
+    if tz is not None and timezone.is_aware(value):
+        value = value.astimezone(tz)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _date(value):
+    return value.isoformat()
+
+
+_duration = duration_string
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer over queryset.values() rows.
+
+    Produces the same JSON as the ModelSerializer it mirrors, without
+    instantiating models or serializer fields per row. `fields` lists
+    (name, formatter) pairs, where the formatter may be the ValuesSerializer
+    of a related object. A sparse fieldset such as "id,title,album.artist.name"
+    limits both the output and the SELECTed columns; naming a related object
+    without subfields selects all of it.
+    """
+    fields = ()
+
+    def __init__(self, fieldset=None):
+        # The current timezone is looked up once, not once per datetime value
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.plan = self.compile(self.parse(fieldset) if fieldset else None, tz=tz)
+        self.columns = list(dict.fromkeys(self._columns(self.plan)))
+
+    @staticmethod
+    def parse(fieldset):
+        """'id,album.title' -> {'id': {}, 'album': {'title': {}}}"""
+        tree = {}
+        for path in fieldset.split(','):
+            node = tree
+            for part in path.strip().split('.'):
+                if part:
+                    node = node.setdefault(part, {})
+        return tree
+
+    @staticmethod
+    def _is_nested(formatter):
+        return isinstance(formatter, type) and issubclass(formatter, ValuesSerializer)
+
+    @classmethod
+    def available(cls, prefix=''):
+        names = []
+        for name, formatter in cls.fields:
+            names.append(f'{prefix}{name}')
+            if cls._is_nested(formatter):
+                names.extend(formatter.available(f'{prefix}{name}.'))
+        return names
+
+    @classmethod
+    def compile(cls, tree, prefix='', tz=None):
+        """[(key, column, formatter or nested plan)] for the selected fields."""
+        if tree is not None:
+            known = {name for name, _ in cls.fields}
+            unknown = [prefix.replace('__', '.') + name for name in tree if name not in known]
+            if unknown:
+                raise serializers.ValidationError({
+                    'fields': f'Unknown field(s): {", ".join(unknown)}. '
+                              f'Choose from: {", ".join(cls.available())}'
+                })
+
+        plan = []
+        for name, formatter in cls.fields:
+            if tree is not None and name not in tree:
+                continue
+            if cls._is_nested(formatter):
+                subtree = (tree[name] or None) if tree is not None else None
+                # The related id doubles as the null check for the nested object
+                plan.append((name, f'{prefix}{name}_id', formatter.compile(subtree, f'{prefix}{name}__', tz)))
+            elif formatter is _datetime:
+                plan.append((name, f'{prefix}{name}', partial(_datetime, tz=tz)))
+            else:
+                plan.append((name, f'{prefix}{name}', formatter))
+        return plan
+
+    @classmethod
+    def _columns(cls, plan):
+        for _, column, formatter in plan:
+            yield column
+            if isinstance(formatter, list):
+                yield from cls._columns(formatter)
+
+    @classmethod
+    def _build(cls, row, plan):
+        data = {}
+        for key, column, formatter in plan:
+            value = row[column]
+            if isinstance(formatter, list):
+                data[key] = cls._build(row, formatter) if value is not None else None
+            else:
+                data[key] = formatter(value) if formatter and value is not None else value
+        return data
+
+    def to_representation(self, rows):
+        plan = self.plan
+        return [self._build(row, plan) for row in rows]
+
+
+class UserValuesSerializer(ValuesSerializer):
+    fields = (('id', None), ('username', None), ('email', None), ('first_name', None), ('last_name', None))
+
+
+class ArtistValuesSerializer(ValuesSerializer):
+    fields = (
+        ('id', None), ('name', None), ('biography', None),
+        ('created_at', _datetime), ('updated_at', _datetime),
+    )
+
+
+class AlbumValuesSerializer(ValuesSerializer):
+    fields = (
+        ('id', None), ('title', None), ('artist', ArtistValuesSerializer), ('release_date', _date),
+        ('created_at', _datetime), ('updated_at', _datetime),
+    )
+
+
+class SongValuesSerializer(ValuesSerializer):
+    fields = (
+        ('id', None), ('title', None), ('album', AlbumValuesSerializer), ('duration', _duration),
+        ('track_number', None), ('created_at', _datetime), ('updated_at', _datetime),
+    )
+
+
+class PlaylistTrackValuesSerializer(ValuesSerializer):
+    fields = (('position', None), ('added_at', _datetime), ('song', SongValuesSerializer))
+
+
+class SavedTrackValuesSerializer(ValuesSerializer):
+    fields = (('saved_at', _datetime), ('song', SongValuesSerializer))
+
+
+class UserListeningActivityValuesSerializer(ValuesSerializer):
+    fields = (
+        ('id', None), ('user', UserValuesSerializer), ('spotify_track_id', None), ('track_name', None),
+        ('artist_name', None), ('album_name', None), ('played_at', _datetime), ('duration_ms', None),
+        ('created_at', _datetime),
+    )
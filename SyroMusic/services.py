@@ -2,23 +2,173 @@
 Spotify API Service - Wrapper for Spotify Web API interactions
 """
 
-from spotipy.oauth2 import SpotifyOAuth
+from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
 from spotipy import Spotify
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import logging
+import threading
+import time
+
+import requests
+import urllib3
 
 logger = logging.getLogger(__name__)
 
 
+# ============================================================
+# Shared HTTP connection pool and fan-out executor
+# ============================================================
+
+class _SharedSession(requests.Session):
+    """Session shared by every Spotify client in the process."""
+
+    def close(self):
+        # Spotify clients close their session when garbage collected;
+        # keep the shared connection pool open for the other clients.
+        pass
+
+
+RETRY_BACKOFF_FACTOR = 0.3
+
+_session = None
+_executor = None
+_pool_lock = threading.Lock()
+
+
+def get_http_session():
+    """Process-wide requests session so Spotify calls reuse TLS connections."""
+    global _session
+    if _session is None:
+        with _pool_lock:
+            if _session is None:
+                session = _SharedSession()
+                retry = urllib3.Retry(
+                    total=Spotify.max_retries,
+                    connect=None,
+                    read=False,
+                    allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+                    status=Spotify.max_retries,
+                    backoff_factor=RETRY_BACKOFF_FACTOR,
+                    status_forcelist=Spotify.default_retry_codes,
+                )
+                pool_size = getattr(settings, 'SPOTIFY_HTTP_POOL_SIZE', 16)
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def retry_deadline():
+    """
+    Seconds one Spotify call can take when every attempt times out: the
+    request timeout for the first try and each retry, plus the backoff sleeps
+    between them. Use it as the batch() call_timeout for background work that
+    should wait out retries rather than abandon them.
+    """
+    attempts = Spotify.max_retries + 1
+    # urllib3 sleeps before the second and later retries only
+    backoff = sum(RETRY_BACKOFF_FACTOR * 2 ** (n - 1) for n in range(2, attempts))
+    return getattr(settings, 'SPOTIFY_REQUEST_TIMEOUT', 5) * attempts + backoff
+
+
+def get_executor():
+    """Bounded thread pool that runs SpotifyService.batch() calls."""
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SPOTIFY_MAX_CONCURRENCY', 8),
+                    thread_name_prefix='spotify',
+                )
+    return _executor
+
+
 class SpotifyService:
     """Service to handle all Spotify API interactions."""
 
     def __init__(self, access_token=None):
         """Initialize Spotify service with optional access token."""
         self.access_token = access_token
-        self.sp = Spotify(auth=access_token) if access_token else None
+        self.sp = Spotify(
+            auth=access_token,
+            requests_session=get_http_session(),
+            requests_timeout=getattr(settings, 'SPOTIFY_REQUEST_TIMEOUT', 5),
+        ) if access_token else None
+
+    def batch(self, calls, timeout=None, call_timeout=None):
+        """
+        Run several calls concurrently on the shared Spotify thread pool.
+
+        calls maps a key to a callable or a (callable, kwargs) pair, usually
+        bound methods of this service. Returns {key: {'status', 'result',
+        'error', 'elapsed'}} where status is 'ok', 'error' or 'timeout'.
+        A call still running after call_timeout seconds, or unfinished when the
+        whole batch hits timeout seconds, is reported as a timeout with result
+        None. Wrapper methods like get_recommendations() log failures and
+        return their empty default, so they report 'ok'; pass raw client
+        methods (self.sp.*) to see failures as 'error'.
+        """
+        if timeout is None:
+            timeout = getattr(settings, 'SPOTIFY_BATCH_TIMEOUT', 8)
+        if call_timeout is None:
+            call_timeout = getattr(settings, 'SPOTIFY_CALL_TIMEOUT', 5)
+
+        started = {}
+        finished = {}
+
+        def run(key, fn, kwargs):
+            started[key] = time.monotonic()
+            try:
+                return fn(**kwargs)
+            finally:
+                finished[key] = time.monotonic()
+
+        deadline = time.monotonic() + timeout
+        futures = {}
+        for key, call in calls.items():
+            fn, kwargs = call if isinstance(call, tuple) else (call, {})
+            futures[get_executor().submit(run, key, fn, kwargs)] = key
+
+        results = {}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            # Wake up for the next per-call deadline; queued calls are polled
+            wake = deadline
+            for future in pending:
+                key = futures[future]
+                wake = min(wake, started[key] + call_timeout if key in started else now + 0.1)
+            done, pending = wait(pending, timeout=max(0, wake - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                key = futures[future]
+                elapsed = finished.get(key, time.monotonic()) - started.get(key, time.monotonic())
+                try:
+                    results[key] = {'status': 'ok', 'result': future.result(), 'error': None, 'elapsed': elapsed}
+                except Exception as e:
+                    logger.error(f"Error in Spotify batch call {key}: {str(e)}")
+                    results[key] = {'status': 'error', 'result': None, 'error': str(e), 'elapsed': elapsed}
+
+            now = time.monotonic()
+            for future in list(pending):
+                key = futures[future]
+                if now >= deadline or (key in started and now - started[key] >= call_timeout):
+                    pending.discard(future)
+                    future.cancel()
+                    results[key] = {
+                        'status': 'timeout', 'result': None, 'error': 'timeout',
+                        'elapsed': now - started.get(key, now),
+                    }
+
+        timed_out = [key for key, outcome in results.items() if outcome['status'] == 'timeout']
+        if timed_out:
+            logger.warning(f"Spotify batch calls timed out: {', '.join(str(key) for key in timed_out)}")
+        return results
 
     @staticmethod
     def get_auth_manager():
@@ -216,15 +366,15 @@ class SpotifyService:
             logger.error(f"Error creating playlist: {str(e)}")
             return None
 
-    def add_tracks_to_playlist(self, playlist_id, track_ids):
-        """Add tracks to a playlist."""
+    def add_tracks_to_playlist(self, playlist_id, track_ids, position=None):
+        """Add tracks to a playlist, at `position` if given (appended otherwise)."""
         try:
             if not self.sp:
                 return False
             # Spotify API has a limit of 100 tracks per request
             for i in range(0, len(track_ids), 100):
                 batch = track_ids[i:i + 100]
-                self.sp.playlist_add_items(playlist_id, batch)
+                self.sp.playlist_add_items(playlist_id, batch, position=None if position is None else position + i)
             return True
         except Exception as e:
             logger.error(f"Error adding tracks to playlist: {str(e)}")
@@ -478,3 +628,29 @@ class TokenManager:
         except Exception as e:
             logger.error(f"Error refreshing token: {str(e)}")
             return None
+
+    @staticmethod
+    def get_app_service():
+        """
+        SpotifyService for background jobs that aren't tied to one user: the
+        app token when client credentials are configured, otherwise a
+        connected user's token as a stand-in.
+        Returns (service, source) with source 'app' or 'user', or (None, None).
+        """
+        from .models import SpotifyUser
+
+        if settings.SPOTIPY_CLIENT_ID and settings.SPOTIPY_CLIENT_SECRET:
+            try:
+                auth = SpotifyClientCredentials(
+                    client_id=settings.SPOTIPY_CLIENT_ID,
+                    client_secret=settings.SPOTIPY_CLIENT_SECRET,
+                )
+                return SpotifyService(access_token=auth.get_access_token(as_dict=False)), 'app'
+            except Exception as e:
+                logger.warning(f"Could not get Spotify app token, using a user token: {str(e)}")
+
+        for spotify_user in SpotifyUser.objects.filter(is_connected=True).order_by('-last_synced')[:5]:
+            access_token = TokenManager.refresh_user_token(spotify_user)
+            if access_token:
+                return SpotifyService(access_token=access_token), 'user'
+        return None, None
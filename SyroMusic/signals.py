@@ -0,0 +1,103 @@
+"""
+Signal handlers that keep derived catalog data in sync with model writes.
+"""
+
+import logging
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Artist, Album, Song
+from . import search_cache, search_index, typeahead
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Artist)
+def index_artist_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Index an artist, and its albums and songs when the name may have changed."""
+    try:
+        rename = not created and (update_fields is None or 'name' in update_fields)
+        search_index.get_backend().index_artist(instance.pk, include_related=rename)
+    except Exception as e:
+        logger.error(f"Error indexing artist {instance.pk}: {str(e)}")
+
+
+@receiver(post_save, sender=Album)
+def index_album_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Index an album, and its songs when the title or artist may have changed."""
+    try:
+        changed = not created and (
+            update_fields is None or {'title', 'artist'} & set(update_fields)
+        )
+        search_index.get_backend().index_album(instance.pk, include_related=bool(changed))
+    except Exception as e:
+        logger.error(f"Error indexing album {instance.pk}: {str(e)}")
+
+
+@receiver(post_save, sender=Song)
+def index_song_on_save(sender, instance, **kwargs):
+    """Index a song under its title and artist name."""
+    try:
+        search_index.get_backend().index_song(instance.pk)
+    except Exception as e:
+        logger.error(f"Error indexing song {instance.pk}: {str(e)}")
+
+
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Song)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Drop a deleted catalog object from the search index."""
+    try:
+        search_index.get_backend().remove(sender, instance.pk)
+    except Exception as e:
+        logger.error(f"Error removing {sender.__name__} {instance.pk} from search index: {str(e)}")
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Song)
+def refresh_typeahead_on_save(sender, instance, created, **kwargs):
+    """Apply a catalog write to this process's typeahead index, if loaded."""
+    # The album and artist branches query related ids; skip them with no index
+    if not typeahead.is_loaded():
+        return
+    try:
+        if sender is Song:
+            typeahead.refresh_objects(song_ids=[instance.pk])
+        elif sender is Album:
+            # Song records carry the album title and cover
+            song_ids = [] if created else list(instance.songs.values_list('id', flat=True))
+            typeahead.refresh_objects(album_ids=[instance.pk], song_ids=song_ids)
+        else:
+            # Album and song keys include the artist name
+            album_ids = [] if created else list(instance.albums.values_list('id', flat=True))
+            song_ids = [] if created else list(
+                Song.objects.filter(album__artist=instance).values_list('id', flat=True)
+            )
+            typeahead.refresh_objects(artist_ids=[instance.pk], album_ids=album_ids, song_ids=song_ids)
+    except Exception as e:
+        logger.error(f"Error updating typeahead index for {sender.__name__} {instance.pk}: {str(e)}")
+
+
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Song)
+def remove_from_typeahead(sender, instance, **kwargs):
+    """Hide a deleted catalog object from this process's typeahead index."""
+    typeahead.remove_object(sender.__name__.lower(), instance.pk)
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Song)
+def invalidate_local_search_cache(sender, instance, **kwargs):
+    """Start a new generation of cached local search results."""
+    try:
+        search_cache.bump_local_generation()
+    except Exception as e:
+        logger.error(f"Error invalidating local search cache: {str(e)}")
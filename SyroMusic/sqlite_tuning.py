@@ -0,0 +1,89 @@
+"""
+SQLite performance mode for single-box deployments (SQLITE_PERFORMANCE_MODE).
+
+Every new SQLite connection gets:
+
+    journal_mode = WAL       readers no longer block the writer, nor it them
+    synchronous = NORMAL     fsync at checkpoints instead of every commit
+    busy_timeout             wait for the write lock instead of failing
+    mmap_size                reads served from the page cache without copies
+    temp_store = MEMORY
+
+WAL files only shrink at a checkpoint, which the checkpoint_sqlite_wal task
+runs periodically. SQLite still allows one writer at a time: background write
+bursts (activity and catalog ingestion) take writer(), a lock file shared by
+every process on the box, so they queue behind each other instead of
+contending for the database lock with web requests. For a dedicated writer,
+route them to SQLITE_WRITER_QUEUE and run one single-process worker on it.
+
+benchmark_sqlite compares read and write concurrency with and without these
+settings.
+"""
+
+import threading
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+try:
+    import fcntl
+except ImportError:  # Windows: writer() falls back to a per-process lock
+    fcntl = None
+
+_process_lock = threading.Lock()
+
+
+def enabled(using='default'):
+    return getattr(settings, 'SQLITE_PERFORMANCE_MODE', False) and connections[using].vendor == 'sqlite'
+
+
+def pragmas():
+    """The PRAGMA statements applied to each connection in performance mode."""
+    return [
+        'PRAGMA journal_mode = WAL',
+        'PRAGMA synchronous = NORMAL',
+        f"PRAGMA busy_timeout = {getattr(settings, 'SQLITE_BUSY_TIMEOUT', 5000)}",
+        f"PRAGMA mmap_size = {getattr(settings, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        'PRAGMA temp_store = MEMORY',
+    ]
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_PERFORMANCE_MODE', False):
+        return
+    with connection.cursor() as cursor:
+        for statement in pragmas():
+            cursor.execute(statement)
+
+
+def checkpoint(using='default', mode='TRUNCATE'):
+    """Copy the WAL back into the database file. Returns (busy, wal pages, pages checkpointed)."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+        return tuple(cursor.fetchone())
+
+
+@contextmanager
+def _file_lock(path):
+    with _process_lock, open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def writer(using='default'):
+    """
+    Context manager serialising background write bursts on this box.
+    A no-op unless performance mode is on for an SQLite database.
+    """
+    if not enabled(using):
+        return nullcontext()
+    if fcntl is None:
+        return _process_lock
+    return _file_lock(f"{connections[using].settings_dict['NAME']}.writer.lock")
@@ -5,10 +5,14 @@ Celery tasks for background jobs like syncing Spotify data
 from celery import shared_task
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import logging
 
 from .models import SpotifyUser, UserListeningStats, UserListeningActivity
-from .services import SpotifyService, TokenManager
+from .services import SpotifyService, TokenManager, retry_deadline
+from .catalog_ingest import compact_track, upsert_tracks
+from . import genre_shelves, recommendation_cache
+from . import sqlite_tuning
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +37,17 @@ def sync_user_spotify_stats(user_id, time_range='medium_term'):
         # Create Spotify service with fresh token
         sp = SpotifyService(access_token=access_token)
 
-        # Fetch top artists
-        top_artists = sp.get_top_artists(time_range=time_range, limit=50)
+        # Fetch top artists and tracks concurrently. No user is waiting, so
+        # give each call time for its retries instead of the interactive deadline
+        call_timeout = retry_deadline()
+        fetched = sp.batch({
+            'artists': (sp.get_top_artists, {'time_range': time_range, 'limit': 50}),
+            'tracks': (sp.get_top_tracks, {'time_range': time_range, 'limit': 50}),
+        }, timeout=call_timeout + 1, call_timeout=call_timeout)
+
+        # Only this range's fields are saved: the three ranges sync concurrently
+        update_fields = ['last_synced']
+        top_artists = fetched['artists']['result']
         if top_artists:
             artists_data = [
                 {
@@ -54,12 +67,15 @@ def sync_user_spotify_stats(user_id, time_range='medium_term'):
             elif time_range == 'medium_term':
                 listening_stats.top_artists_medium_term = artists_data
                 listening_stats.synced_medium_term = timezone.now()
+                # Orders the genre shelves in browse_by_genre
+                listening_stats.favorite_genres = genre_shelves.favorite_genres(artists_data)
+                update_fields.append('favorite_genres')
             else:  # long_term
                 listening_stats.top_artists_long_term = artists_data
                 listening_stats.synced_long_term = timezone.now()
+            update_fields += [f'top_artists_{time_range}', f'synced_{time_range}']
 
-        # Fetch top tracks
-        top_tracks = sp.get_top_tracks(time_range=time_range, limit=50)
+        top_tracks = fetched['tracks']['result']
         if top_tracks:
             tracks_data = [
                 {
@@ -81,8 +97,17 @@ def sync_user_spotify_stats(user_id, time_range='medium_term'):
                 listening_stats.top_tracks_medium_term = tracks_data
             else:  # long_term
                 listening_stats.top_tracks_long_term = tracks_data
+            update_fields.append(f'top_tracks_{time_range}')
+
+            upsert_tracks([compact_track(track) for track in top_tracks])
+
+        listening_stats.save(update_fields=update_fields)
+
+        # Recommendations are seeded from the medium-term lists
+        if time_range == 'medium_term':
+            recommendation_cache.invalidate(user.id)
+            recommendation_cache.fetch(user.id, sp, recommendation_cache.seeds_for(listening_stats))
 
-        listening_stats.save()
         logger.info(f"Successfully synced {time_range} stats for user {user.username}")
         return True
 
@@ -116,26 +141,33 @@ def sync_user_recently_played(user_id):
         # Fetch recently played tracks
         recently_played = sp.get_recently_played(limit=50)
         if recently_played:
-            # Create activity records for new plays
-            for item in recently_played:
-                track = item.get('track', {})
-                played_at = item.get('played_at')
-
-                # Avoid duplicates
-                if not UserListeningActivity.objects.filter(
-                    user=user,
-                    spotify_track_id=track.get('id'),
-                    played_at=played_at
-                ).exists():
-                    UserListeningActivity.objects.create(
+            with sqlite_tuning.writer():
+                # Warm the local catalog so plays can link to Song rows
+                song_ids = upsert_tracks([compact_track(item.get('track')) for item in recently_played])
+
+                # Create activity records for new plays, skipping ones already recorded
+                plays = [(item.get('track', {}), parse_datetime(item.get('played_at'))) for item in recently_played]
+                seen = set(
+                    UserListeningActivity.objects.filter(
+                        user=user, played_at__gte=min(played_at for _, played_at in plays)
+                    ).values_list('spotify_track_id', 'played_at')
+                )
+                new_plays = []
+                for track, played_at in plays:
+                    if (track.get('id'), played_at) in seen:
+                        continue
+                    seen.add((track.get('id'), played_at))
+                    new_plays.append(UserListeningActivity(
                         user=user,
+                        song_id=song_ids.get(track.get('id')),
                         spotify_track_id=track.get('id'),
                         track_name=track.get('name', 'Unknown'),
                         artist_name=track['artists'][0]['name'] if track.get('artists') else 'Unknown',
                         album_name=track['album']['name'] if track.get('album') else 'Unknown',
                         played_at=played_at,
                         duration_ms=track.get('duration_ms', 0),
-                    )
+                    ))
+                UserListeningActivity.objects.bulk_create(new_plays)
 
             # Update recently played in stats
             recently_played_data = [
@@ -242,6 +274,7 @@ def sync_all_user_data(user_id):
         sync_user_spotify_stats.delay(user_id, 'long_term')
         sync_user_recently_played.delay(user_id)
         sync_user_saved_tracks_count.delay(user_id)
+        sync_user_playlists.delay(user_id)
 
         logger.info(f"Queued all sync tasks for user_id {user_id}")
         return True
@@ -249,3 +282,177 @@ def sync_all_user_data(user_id):
     except Exception as e:
         logger.error(f"Error in master sync for user {user_id}: {str(e)}")
         return False
+
+
+@shared_task
+def sync_user_playlists(user_id):
+    """
+    Two-way sync of the user's Spotify playlists; playlists unchanged on both
+    sides since their last sync are skipped.
+    """
+    try:
+        from . import playlist_sync
+
+        user = User.objects.get(id=user_id)
+        spotify_user = SpotifyUser.objects.get(user=user)
+
+        # Refresh token if needed
+        access_token = TokenManager.refresh_user_token(spotify_user)
+        if not access_token:
+            logger.warning(f"Could not refresh token for user {user.username}")
+            return False
+
+        sp = SpotifyService(access_token=access_token)
+        counts = playlist_sync.sync_user_playlists(user, sp)
+        logger.info(f"Synced playlists for user {user.username}: {counts}")
+        return counts['failed'] == 0
+
+    except Exception as e:
+        logger.error(f"Error syncing playlists for user {user_id}: {str(e)}")
+        return False
+
+
+@shared_task
+def build_genre_shelves():
+    """
+    Rebuild the shared browse_by_genre shelves.
+    """
+    try:
+        from . import genre_shelves
+
+        shelf_set = genre_shelves.build_shelves()
+        if shelf_set is None:
+            return False
+
+        logger.info(f"Built genre shelves v{shelf_set.id} with {len(shelf_set.shelves)} genres")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error building genre shelves: {str(e)}")
+        return False
+
+
+@shared_task
+def sync_audio_features(limit=5000):
+    """
+    Fetch audio features for catalog songs and users' top tracks that don't have them yet.
+    """
+    try:
+        from . import audio_features
+
+        if not audio_features.is_available():
+            return False
+
+        sp, _ = TokenManager.get_app_service()
+        if sp is None:
+            logger.warning("No Spotify token available to fetch audio features")
+            return False
+
+        stored = audio_features.ingest(sp, audio_features.candidate_ids(limit=limit))
+        logger.info(f"Stored audio features for {stored} tracks")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error syncing audio features: {str(e)}")
+        return False
+
+
+@shared_task
+def update_item_recommender(full=False):
+    """
+    Add new listening activity to the item-to-item recommender,
+    or rebuild it from scratch with full=True.
+    """
+    try:
+        from . import item_recommender
+
+        if not item_recommender.is_available():
+            return False
+
+        model = item_recommender.build_and_save(full=full)
+        logger.info(f"Updated item recommender: {len(model.keys['track'])} tracks, activity up to {model.last_activity_id}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error updating item recommender: {str(e)}")
+        return False
+
+
+@shared_task
+def rebuild_artist_similarity():
+    """
+    Rebuild the artist similarity index from every user's top artists.
+    Workers pick it up on their next freshness check.
+    """
+    try:
+        from . import artist_similarity
+
+        if not artist_similarity.is_available():
+            return False
+
+        index = artist_similarity.rebuild()
+        logger.info(f"Rebuilt artist similarity index: {len(index.ids)} artists")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error rebuilding artist similarity index: {str(e)}")
+        return False
+
+
+@shared_task
+def rebuild_typeahead_snapshot():
+    """
+    Rebuild the shared typeahead snapshot file.
+    Workers pick it up on their next freshness check.
+    """
+    try:
+        from django.conf import settings
+        from . import typeahead
+
+        path = getattr(settings, 'TYPEAHEAD_SNAPSHOT_PATH', None)
+        if not path:
+            return False
+
+        size = typeahead.write_snapshot(path)
+        logger.info(f"Rebuilt typeahead snapshot at {path} ({size} bytes)")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error rebuilding typeahead snapshot: {str(e)}")
+        return False
+
+
+@shared_task
+def ingest_spotify_tracks(tracks):
+    """
+    Upsert compacted Spotify tracks (see catalog_ingest.compact_track) into
+    the local catalog.
+    """
+    try:
+        with sqlite_tuning.writer():
+            song_ids = upsert_tracks(tracks)
+        logger.info(f"Ingested {len(song_ids)} Spotify tracks into the local catalog")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error ingesting Spotify tracks: {str(e)}")
+        return False
+
+
+@shared_task
+def checkpoint_sqlite_wal():
+    """
+    Fold the SQLite write-ahead log back into the database file and truncate
+    it (performance mode only).
+    """
+    try:
+        if not sqlite_tuning.enabled():
+            return False
+        busy, wal_pages, checkpointed = sqlite_tuning.checkpoint()
+        if busy:
+            logger.info(f"WAL checkpoint blocked by readers; {checkpointed}/{wal_pages} pages checkpointed")
+        return not busy
+
+    except Exception as e:
+        logger.error(f"Error checkpointing SQLite WAL: {str(e)}")
+        return False
@@ -1,3 +1,851 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import (
+    api_views, artist_similarity, catalog_ingest, fuzzy_index, genre_shelves, playlist_sync, playlist_tracks,
+    saved_tracks, search_cache, search_index, serializers, services, signals, sqlite_tuning, tasks, typeahead,
+)
+from .models import (
+    Album, Artist, Playlist, PlaylistTrack, Song, SpotifyUser, UserListeningActivity, UserListeningStats,
+)
+from .db_router import PrimaryReplicaRouter, replica_reads, use_replica
+from .pagination import KeysetPage
+from .query_budget import QueryBudgetExceeded, assert_query_budget
+
+
+class PlaylistTracksTests(TestCase):
+    """Sparse-position playlist edits, including ones that overflow the gap between two neighbours."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('listener', password='x')
+        album = Album.objects.create(
+            title='Album', artist=Artist.objects.create(name='Artist'), release_date=date(2020, 1, 1)
+        )
+        cls.song_ids = [
+            song.id for song in Song.objects.bulk_create([
+                Song(title=f'Song {i}', album=album, duration=timedelta(minutes=3), track_number=i)
+                for i in range(2000)
+            ])
+        ]
+        cls.playlist = Playlist.objects.create(title='Mix', user=user)
+
+    def order(self):
+        return list(
+            PlaylistTrack.objects.filter(playlist=self.playlist).order_by('position').values_list('song_id', flat=True)
+        )
+
+    def positions(self):
+        return dict(PlaylistTrack.objects.filter(playlist=self.playlist).values_list('song_id', 'position'))
+
+    def test_small_edits_only_touch_the_rows_placed(self):
+        a, b, c, d, e, f = self.song_ids[:6]
+        playlist_tracks.add(self.playlist, [a, b, c])
+        gap = playlist_tracks.POSITION_GAP
+        self.assertEqual(self.positions(), {a: gap, b: 2 * gap, c: 3 * gap})
+
+        self.assertEqual(playlist_tracks.add(self.playlist, [d, e, a], at=1), [d, e])
+        before = self.positions()
+        self.assertEqual(self.order(), [a, d, e, b, c])
+        self.assertTrue(gap < before[d] < before[e] < 2 * gap)
+
+        self.assertEqual(playlist_tracks.move(self.playlist, [c, f], at=0), 1)
+        after = self.positions()
+        self.assertEqual(self.order(), [c, a, d, e, b])
+        self.assertEqual({k: v for k, v in after.items() if k != c}, {k: v for k, v in before.items() if k != c})
+
+        self.assertEqual(playlist_tracks.remove(self.playlist, [d, f]), 1)
+        self.assertEqual(self.order(), [c, a, e, b])
+
+    def test_insert_query_count_does_not_grow_with_the_playlist(self):
+        def insert_queries(playlist, size):
+            playlist_tracks.add(playlist, self.song_ids[:size])
+            with CaptureQueriesContext(connection) as queries:
+                playlist_tracks.add(playlist, [self.song_ids[-1]], at=size // 2)
+            return len(queries)
+
+        short = insert_queries(self.playlist, 10)
+        long = insert_queries(Playlist.objects.create(title='Long', user=self.playlist.user), 1500)
+        self.assertEqual(long, short)
+
+    def test_large_insert_in_the_middle(self):
+        head, block = self.song_ids[:5], self.song_ids[5:1600]
+        playlist_tracks.add(self.playlist, head)
+
+        added = playlist_tracks.add(self.playlist, block, at=2)
+
+        self.assertEqual(added, block)
+        self.assertEqual(self.order(), head[:2] + block + head[2:])
+
+    def test_large_move_in_the_middle(self):
+        songs = self.song_ids[:1600]
+        playlist_tracks.add(self.playlist, songs)
+        block = songs[100:1400]
+
+        moved = playlist_tracks.move(self.playlist, block, at=1)
+
+        self.assertEqual(moved, len(block))
+        rest = songs[:100] + songs[1400:]
+        self.assertEqual(self.order(), rest[:1] + block + rest[1:])
+
+
+@override_settings(SAVED_TRACKS_HOT_THRESHOLD=0)
+class SavedTracksCacheTests(TestCase):
+    """The cached saved-song set must not outlive a save that raced its load."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('saver', password='x')
+        album = Album.objects.create(
+            title='Album', artist=Artist.objects.create(name='Artist'), release_date=date(2020, 1, 1)
+        )
+        cls.song_ids = [
+            song.id for song in Song.objects.bulk_create([
+                Song(title=f'Song {i}', album=album, duration=timedelta(minutes=3), track_number=i)
+                for i in range(3)
+            ])
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_save_during_load(self):
+        saved_tracks.save(self.user, self.song_ids[:1])
+        real_set = cache.set
+
+        def save_then_set(key, *args, **kwargs):
+            # Another request saves a song after the reader's query, before it caches the result
+            if key.startswith('saved:ids:'):
+                saved_tracks.save(self.user, self.song_ids[1:2])
+            return real_set(key, *args, **kwargs)
+
+        with mock.patch.object(cache, 'set', side_effect=save_then_set):
+            self.assertFalse(saved_tracks.is_saved(self.user, self.song_ids[1]))
+
+        self.assertTrue(saved_tracks.is_saved(self.user, self.song_ids[1]))
+
+    def test_unsave_clears_cached_set(self):
+        saved_tracks.save(self.user, self.song_ids)
+        self.assertTrue(saved_tracks.is_saved(self.user, self.song_ids[0]))
+
+        saved_tracks.unsave(self.user, self.song_ids[:1])
+
+        self.assertFalse(saved_tracks.is_saved(self.user, self.song_ids[0]))
+
+
+class SavedTracksListTests(TestCase):
+    """Saved tracks are listed newest first, a keyset page at a time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('liker', password='x')
+        album = Album.objects.create(
+            title='Album', artist=Artist.objects.create(name='Artist'), release_date=date(2020, 1, 1)
+        )
+        cls.song_ids = [
+            song.id for song in Song.objects.bulk_create([
+                Song(title=f'Song {i}', album=album, duration=timedelta(minutes=3), track_number=i)
+                for i in range(5)
+            ])
+        ]
+        for song_id in cls.song_ids:
+            saved_tracks.save(cls.user, [song_id])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_api_pages_newest_first(self):
+        response = self.client.get(reverse('api:saved-tracks'), {'page_size': 2, 'fields': 'saved_at,song.id'})
+        self.assertEqual(response.status_code, 200)
+        seen = [row['song']['id'] for row in response.json()['results']]
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+            seen += [row['song']['id'] for row in response.json()['results']]
+        self.assertEqual(seen, self.song_ids[::-1])
+
+    def test_page_and_playlist_list_show_liked_tracks(self):
+        response = self.client.get(reverse('music:saved_tracks'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Song 4')
+
+        response = self.client.get(reverse('music:playlist_list'))
+        self.assertContains(response, reverse('music:saved_tracks'))
+        self.assertEqual(response.context['saved_count'], 5)
+
+
+def spotify_track(i):
+    """A Spotify track object as playlist_items returns it."""
+    return {
+        'id': f't{i}', 'name': f'Track {i}', 'duration_ms': 180000, 'track_number': i + 1, 'type': 'track',
+        'artists': [{'id': 'ar1', 'name': 'Sync Artist'}],
+        'album': {
+            'id': 'al1', 'name': 'Sync Album', 'release_date': '2020-01-01', 'images': [],
+            'artists': [{'id': 'ar1', 'name': 'Sync Artist'}],
+        },
+    }
+
+
+class FakeSpotify:
+    """SpotifyService stand-in for one playlist; records pushes and the transaction depth they ran at."""
+
+    def __init__(self, track_ids, snapshot_id):
+        self.sp = self
+        self.tracks = [spotify_track(int(track_id[1:])) for track_id in track_ids]
+        self.snapshot_id = snapshot_id
+        self.pushes = []
+        self.fail_add = False
+
+    def batch(self, calls, timeout=None, call_timeout=None):
+        return {key: {'status': 'ok', 'result': fn(**kwargs)} for key, (fn, kwargs) in calls.items()}
+
+    def playlist_items(self, playlist_id, fields, limit, offset, additional_types):
+        return {'items': [{'track': track} for track in self.tracks[offset:offset + limit]]}
+
+    def current_user_playlists(self, limit, offset=0):
+        return {'items': [{'id': 'P', 'name': 'Linked', 'snapshot_id': self.snapshot_id,
+                           'tracks': {'total': len(self.tracks)}}], 'total': 1}
+
+    def playlist(self, playlist_id, fields):
+        return {'snapshot_id': self.snapshot_id}
+
+    def remove_tracks_from_playlist(self, playlist_id, uris):
+        self.pushes.append(('remove', uris, len(connection.atomic_blocks)))
+        self.snapshot_id += '+'
+        return True
+
+    def add_tracks_to_playlist(self, playlist_id, uris):
+        self.pushes.append(('add', uris, len(connection.atomic_blocks)))
+        if self.fail_add:
+            return False
+        self.snapshot_id += '+'
+        return True
+
+
+class PlaylistSyncTests(TestCase):
+    """Three-way playlist sync against a fake Spotify."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('syncer', password='x')
+        self.songs = catalog_ingest.upsert_tracks(
+            [catalog_ingest.compact_track(spotify_track(i)) for i in (0, 1, 2, 4)]
+        )
+        self.playlist = Playlist.objects.create(title='Linked', user=self.user, spotify_id='P')
+        playlist_tracks.add(self.playlist, [self.songs[f't{i}'] for i in (0, 1, 2)])
+        Playlist.objects.filter(id=self.playlist.id).update(
+            snapshot_id='s1', synced_tracks=['t0', 't1', 't2'], synced_at=timezone.now()
+        )
+        self.playlist.refresh_from_db()
+
+    def remote(self, sp):
+        return {'id': 'P', 'snapshot_id': sp.snapshot_id, 'tracks': {'total': len(sp.tracks)}}
+
+    def local_ids(self):
+        return [spotify_id for _, spotify_id in playlist_sync.local_tracks(self.playlist)]
+
+    def test_diff(self):
+        # b removed locally, c removed on Spotify, x added locally, y added on Spotify
+        self.assertEqual(
+            playlist_sync.diff(['a', 'b', 'c'], ['a', 'c', 'x'], ['a', 'b', 'y']),
+            (['y'], ['c'], ['x'], ['b']),
+        )
+
+    def test_merges_both_sides_and_pushes_after_commit(self):
+        # Spotify dropped t1 and gained t3; locally t2 was removed and t4 added
+        sp = FakeSpotify(['t0', 't2', 't3'], 's2')
+        playlist_tracks.remove(self.playlist, [self.songs['t2']])
+        playlist_tracks.add(self.playlist, [self.songs['t4']])
+        self.playlist.refresh_from_db()
+        depth = len(connection.atomic_blocks)
+
+        counts = playlist_sync.sync_user_playlists(self.user, sp)
+
+        self.assertEqual((counts['synced'], counts['failed']), (1, 0))
+        self.assertEqual(sorted(self.local_ids()), ['t0', 't3', 't4'])
+        self.assertEqual([(kind, uris) for kind, uris, _ in sp.pushes], [
+            ('remove', ['spotify:track:t2']), ('add', ['spotify:track:t4']),
+        ])
+        self.assertTrue(all(level == depth for _, _, level in sp.pushes))
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.snapshot_id, sp.snapshot_id)
+        self.assertEqual(self.playlist.synced_tracks, ['t0', 't3', 't4'])
+
+    def test_failed_push_is_retried(self):
+        sp = FakeSpotify(['t0', 't1', 't2'], 's1')
+        sp.fail_add = True
+        playlist_tracks.add(self.playlist, [self.songs['t4']])
+        self.playlist.refresh_from_db()
+
+        with self.assertRaises(RuntimeError):
+            playlist_sync.sync_playlist(sp, self.playlist, self.remote(sp))
+        self.playlist.refresh_from_db()
+        self.assertEqual(playlist_sync.changes(self.playlist, self.remote(sp)), (False, True))
+
+        sp.fail_add = False
+        playlist_sync.sync_playlist(sp, self.playlist, self.remote(sp))
+        self.playlist.refresh_from_db()
+        self.assertEqual(sp.pushes[-1][:2], ('add', ['spotify:track:t4']))
+        self.assertEqual(self.playlist.synced_tracks, ['t0', 't1', 't2', 't4'])
+        self.assertEqual(playlist_sync.changes(self.playlist, self.remote(sp)), (False, False))
+
+
+class KeysetPaginationTests(TestCase):
+    """Keyset pages walk every row once, in order, both ways."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('listener2', password='x')
+        played = timezone.now().replace(microsecond=0)
+        # Several plays share a played_at and several fall within one millisecond
+        UserListeningActivity.objects.bulk_create([
+            UserListeningActivity(
+                user=cls.user, track_name=f'Track {i}', artist_name='Artist', duration_ms=1000,
+                played_at=played - timedelta(microseconds=100 * (i // 2)),
+            )
+            for i in range(12)
+        ])
+        cls.expected = list(
+            UserListeningActivity.objects.filter(user=cls.user).order_by('-played_at', '-id').values_list('id', flat=True)
+        )
+
+    def test_api_walks_forward_and_back(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('api:listening-activity-list'), {'page_size': 5, 'fields': 'id'})
+        pages = [[row['id'] for row in response.json()['results']]]
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+            pages.append([row['id'] for row in response.json()['results']])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        response = self.client.get(response.json()['previous'])
+        self.assertEqual([row['id'] for row in response.json()['results']], pages[-2])
+
+    def test_template_page_cursors(self):
+        queryset = UserListeningActivity.objects.filter(user=self.user)
+        page = KeysetPage(queryset, ('-played_at', '-id'), page_size=5)
+        seen = [activity.id for activity in page.items]
+        while page.next_cursor:
+            page = KeysetPage(queryset, ('-played_at', '-id'), page.next_cursor, page_size=5)
+            seen += [activity.id for activity in page.items]
+        self.assertEqual(seen, self.expected)
+
+        page = KeysetPage(queryset, ('-played_at', '-id'), page.previous_cursor, page_size=5)
+        self.assertEqual([activity.id for activity in page.items], self.expected[5:10])
+        self.assertFalse(KeysetPage(queryset, ('-played_at', '-id'), 'not a cursor').values)
+
+
+@skipUnless(artist_similarity.is_available(), 'needs numpy and scipy')
+class SimilarArtistsTests(TestCase):
+    """The genre-vector index ranks shared genres first; the API bounds k."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', password='x')
+        UserListeningStats.objects.create(user=cls.user, top_artists_medium_term=[
+            {'id': 'a1', 'name': 'Shoegaze One', 'genres': ['shoegaze', 'dream pop']},
+            {'id': 'a2', 'name': 'Shoegaze Two', 'genres': ['shoegaze', 'noise pop']},
+            {'id': 'a3', 'name': 'Dream Pop', 'genres': ['dream pop']},
+            {'id': 'a4', 'name': 'Metal', 'genres': ['death metal']},
+        ])
+
+    def setUp(self):
+        self.index = artist_similarity.ArtistIndex.build()
+        self.client.force_login(self.user)
+
+    def get(self, k):
+        with mock.patch.object(artist_similarity, 'get_index', return_value=self.index):
+            return self.client.get(reverse('api:similar-artists', args=['a1']), {'k': k})
+
+    def test_shared_genres_rank_first(self):
+        ranked = [self.index.ids[i] for i, _ in self.index.similar('a1', k=3)]
+        self.assertEqual(set(ranked[:2]), {'a2', 'a3'})
+        self.assertNotIn('a4', ranked)
+
+    def test_k_is_bounded(self):
+        self.assertEqual(self.get(-5).json()['count'], 1)
+        self.assertEqual(self.get(0).json()['count'], 1)
+        self.assertEqual(self.get('many').status_code, 400)
+
+
+class GenreShelvesTests(TestCase):
+    """A user's favourite genres, from their top artists, order the shared shelves."""
+
+    shelves = [{'genre': genre, 'name': genre.title(), 'tracks': []} for genre in genre_shelves.GENRES]
+    top_artists = [
+        {'id': 'a1', 'name': 'One', 'genres': ['jazz fusion', 'contemporary jazz']},
+        {'id': 'a2', 'name': 'Two', 'genres': ['hip hop', 'jazz rap']},
+        {'id': 'a3', 'name': 'Three', 'genres': ['hip hop']},
+        {'id': 'a4', 'name': 'Four', 'genres': ['hip hop']},
+    ]
+
+    def order(self, favorites):
+        return [shelf['genre'] for shelf in genre_shelves.personalize(self.shelves, favorite_genres=favorites)]
+
+    def test_favourites_change_the_shelf_order(self):
+        favorites = genre_shelves.favorite_genres(self.top_artists)
+        self.assertEqual(favorites[:2], ['hip hop', 'contemporary jazz'])
+
+        self.assertEqual(self.order(favorites)[:2], ['hip-hop', 'jazz'])
+        self.assertEqual(self.order([]), genre_shelves.GENRES)
+        self.assertEqual(self.order(['contemporary r&b'])[0], 'r-n-b')
+
+    def test_stats_sync_stores_favourites(self):
+        user = User.objects.create_user('genre-fan', password='x')
+        SpotifyUser.objects.create(
+            user=user, spotify_id='genre-fan', access_token='token', token_expires_at=timezone.now()
+        )
+        stats = UserListeningStats.objects.create(user=user)
+        sp = mock.Mock()
+        sp.batch.return_value = {
+            'artists': {'status': 'ok', 'result': [
+                dict(artist, images=[], external_urls={}) for artist in self.top_artists
+            ]},
+            'tracks': {'status': 'ok', 'result': []},
+        }
+        with mock.patch.object(tasks.TokenManager, 'refresh_user_token', return_value='token'), \
+                mock.patch.object(tasks, 'SpotifyService', return_value=sp), \
+                mock.patch.object(tasks.recommendation_cache, 'fetch'):
+            self.assertTrue(tasks.sync_user_spotify_stats(user.id, 'medium_term'))
+
+        stats.refresh_from_db()
+        self.assertEqual(stats.favorite_genres, genre_shelves.favorite_genres(self.top_artists))
+
+
+class SpotifyBatchTests(TestCase):
+    """Per-call deadlines in SpotifyService.batch()."""
+
+    @override_settings(SPOTIFY_REQUEST_TIMEOUT=0.05, SPOTIFY_CALL_TIMEOUT=0.05)
+    def test_retry_deadline_outlasts_a_retried_call(self):
+        sp = services.SpotifyService()
+
+        def retried():
+            # A first attempt that timed out, then a successful retry
+            time.sleep(0.12)
+            return 'done'
+
+        self.assertEqual(sp.batch({'call': retried})['call']['status'], 'timeout')
+        deadline = services.retry_deadline()
+        self.assertGreater(deadline, 2 * 0.05)
+        fetched = sp.batch({'call': retried}, timeout=deadline + 1, call_timeout=deadline)
+        self.assertEqual(fetched['call']['result'], 'done')
+
+
+class SearchCacheTests(TestCase):
+    """Shared search results: prefix refinement and catalog generations."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_complete_prefix_entry_answers_longer_queries(self):
+        fetch = mock.Mock(return_value=['Beatles', 'Beat It'])
+        self.assertEqual(search_cache.cached_search('fts', 'songs', 'beat', 10, fetch, str), ['Beatles', 'Beat It'])
+
+        self.assertEqual(search_cache.cached_search('fts', 'songs', 'beatl', 10, fetch, str), ['Beatles'])
+        self.assertEqual(fetch.call_count, 1)
+
+    def test_evicted_generation_is_not_reused(self):
+        generation = search_cache.local_generation()
+        search_cache.bump_local_generation()
+        self.assertEqual(search_cache.local_generation(), generation + 1)
+
+        cache.delete(search_cache.LOCAL_GENERATION_KEY)
+        self.assertNotIn(search_cache.local_generation(), (generation, generation + 1))
+
+    def test_spotify_results_are_cached_by_exact_query_only(self):
+        sp = mock.Mock()
+        sp.search.return_value = [{'name': 'Beat It', 'artists': [{'name': 'Michael Jackson'}]}]
+        search_cache.spotify_search(sp, 'beat')
+        search_cache.spotify_search(sp, 'beat')
+        self.assertEqual(sp.search.call_count, 1)
+
+        # A complete entry for "beat" must not stand in for Spotify's answer to "beatl"
+        sp.search.return_value = [{'name': 'Help!', 'artists': [{'name': 'The Beatles'}]}]
+        self.assertEqual(search_cache.spotify_search(sp, 'beatl')[0]['name'], 'Help!')
+        self.assertEqual(sp.search.call_count, 2)
+
+    def test_reingesting_known_tracks_keeps_the_generation(self):
+        tracks = [catalog_ingest.compact_track(spotify_track(i)) for i in range(3)]
+        catalog_ingest.upsert_tracks(tracks)
+        generation = search_cache.local_generation()
+
+        with mock.patch.object(catalog_ingest.typeahead, 'refresh_objects') as refresh:
+            catalog_ingest.upsert_tracks(tracks)
+        self.assertEqual(search_cache.local_generation(), generation)
+        refresh.assert_not_called()
+
+        catalog_ingest.upsert_tracks(tracks + [catalog_ingest.compact_track(spotify_track(3))])
+        self.assertEqual(search_cache.local_generation(), generation + 1)
+
+
+class IndexAuditTests(TestCase):
+    """Every registered hot query is served by an index on the migrated schema."""
+
+    def test_audit_passes_on_migrated_database(self):
+        artist = Artist.objects.create(name='Audit Artist')
+        album = Album.objects.create(title='Audit Album', artist=artist, release_date=date(2020, 1, 1))
+        Song.objects.create(title='Audit Song', album=album, duration=timedelta(minutes=3), track_number=1)
+
+        # No --analyze: statistics from a handful of rows make SQLite prefer scans
+        out = StringIO()
+        call_command('audit_indexes', '--fail', stdout=out)
+        self.assertNotIn('FLAG', out.getvalue())
+
+
+class SearchIndexTests(TestCase):
+    """Catalog search backends."""
+
+    def setUp(self):
+        search_index.reset_backend()
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 backend')
+    def test_fts_ranks_title_matches_and_follows_deletes(self):
+        if not search_index.sqlite_fts_available():
+            self.skipTest('SQLite build without FTS5')
+        crew = Artist.objects.create(name='Beat Crew')
+        solo = Artist.objects.create(name='Solo')
+        crew_song = Song.objects.create(
+            title='Other', duration=timedelta(minutes=3), track_number=1,
+            album=Album.objects.create(title='Crew Album', artist=crew, release_date=date(2020, 1, 1)),
+        )
+        title_song = Song.objects.create(
+            title='Beating Heart', duration=timedelta(minutes=3), track_number=1,
+            album=Album.objects.create(title='Solo Album', artist=solo, release_date=date(2020, 1, 1)),
+        )
+
+        self.assertEqual(search_index.get_backend().name, 'sqlite_fts5')
+        self.assertEqual(search_index.search_songs('beat'), [title_song, crew_song])
+        self.assertEqual(search_index.search_artists('cre'), [crew])
+
+        title_song.delete()
+        self.assertEqual(search_index.search_songs('beat'), [crew_song])
+
+    def test_postgres_tops_up_with_trigram_substring_matches(self):
+        backend = search_index.PostgresFTSBackend()
+        with mock.patch.object(backend, '_fetch_ids', return_value=[3, 7, 9]) as fetch:
+            self.assertEqual(backend._with_substring_matches([7], Artist, 'name', ' 100%_ ', 3), [7, 3, 9])
+        sql, params = fetch.call_args.args
+        self.assertIn('ILIKE', sql)
+        self.assertEqual(params, ['%100\\%\\_%', '100%_', 3])
+
+        with mock.patch.object(backend, '_fetch_ids') as fetch:
+            self.assertEqual(backend._with_substring_matches([1, 2], Artist, 'name', 'beatles', 2), [1, 2])
+            self.assertEqual(backend._with_substring_matches([], Artist, 'name', 'ab', 10), [])
+        fetch.assert_not_called()
+
+
+class TypeaheadTests(TestCase):
+    """Word-start prefix lookups, and catalog saves applied to the loaded index only."""
+
+    def test_prefix_search_over_snapshot_and_overlay(self):
+        beatles = Artist.objects.create(name='The Beatles')
+        album = Album.objects.create(title='Abbey Road', artist=beatles, release_date=date(1969, 9, 26))
+        song = Song.objects.create(title='Come Together', album=album, duration=timedelta(minutes=4), track_number=1)
+        Song.objects.create(
+            title='Déjà Vu', duration=timedelta(minutes=3), track_number=1,
+            album=Album.objects.create(
+                title='B', artist=Artist.objects.create(name='Beyoncé'), release_date=date(2006, 1, 1)
+            ),
+        )
+        index = typeahead.TypeaheadIndex(typeahead.build_snapshot())
+
+        def titles(query, kind='song'):
+            return [record[2] for record in index.search(query, kind)]
+
+        self.assertEqual(titles('tog'), ['Come Together'])
+        self.assertEqual(titles('beatles'), ['Come Together'])
+        self.assertEqual(titles('deja'), ['Déjà Vu'])
+        self.assertEqual(titles('beyon', 'artist'), ['Beyoncé'])
+
+        song.title = 'Something'
+        index.upsert(typeahead.song_record(song), 0)
+        self.assertEqual(titles('tog'), [])
+        self.assertEqual(titles('some'), ['Something'])
+        index.remove('song', song.id)
+        self.assertEqual(titles('beatles'), [])
+
+    def test_save_without_loaded_index_runs_no_queries(self):
+        artist = Artist.objects.create(name='Signal Artist')
+        album = Album.objects.create(title='Signal Album', artist=artist, release_date=date(2020, 1, 1))
+        typeahead.reset_index()
+
+        with self.assertNumQueries(0):
+            signals.refresh_typeahead_on_save(Artist, artist, created=False)
+            signals.refresh_typeahead_on_save(Album, album, created=False)
+
+
+class FuzzyIndexTests(TestCase):
+    """Typo-tolerant trigram search with bounded candidate generation."""
+
+    def build(self, names):
+        index = fuzzy_index.FuzzyIndex()
+        for object_id, name in enumerate(names, start=1):
+            index.add('artist', object_id, name)
+        return index.freeze()
+
+    def test_typos_match_best_first(self):
+        index = self.build(['The Beatles', 'Beat Happening', 'Metallica'])
+        self.assertEqual([object_id for object_id, _ in index.search('beatls', 'artist')][:1], [1])
+        self.assertEqual([object_id for object_id, _ in index.search('metalika', 'artist')], [3])
+        self.assertEqual(index.search('zzzz', 'artist'), [])
+
+    @override_settings(FUZZY_MAX_CANDIDATES=3)
+    def test_scores_at_most_max_candidates(self):
+        index = self.build([f'Love Song {i}' for i in range(20)])
+        with mock.patch.object(fuzzy_index, 'similarity', wraps=fuzzy_index.similarity) as score:
+            results = index.search('love song', 'artist', limit=10)
+        self.assertEqual(score.call_count, 3)
+        self.assertEqual(len(results), 3)
+
+    @override_settings(FUZZY_MAX_POSTINGS=5)
+    def test_stops_at_posting_budget(self):
+        index = self.build([f'Love Song {i}' for i in range(20)])
+        self.assertEqual(index.search('love song', 'artist'), [])
+
+
+class ValuesSerializerTests(TestCase):
+    """values()-based reads: JSON parity with the ModelSerializers, sparse fieldsets and batch gets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        artist = Artist.objects.create(name='Parity Artist', biography='Bio')
+        album = Album.objects.create(title='Parity Album', artist=artist, release_date=date(2020, 2, 29))
+        cls.song = Song.objects.create(
+            title='Parity Song', album=album, duration=timedelta(minutes=3, seconds=7, microseconds=250),
+            track_number=None,
+        )
+
+    def render(self, data):
+        return json.loads(JSONRenderer().render(data))
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_matches_model_serializer(self):
+        values = serializers.SongValuesSerializer()
+        rows = Song.objects.filter(pk=self.song.pk).values(*values.columns)
+
+        self.assertEqual(
+            self.render(values.to_representation(rows)),
+            self.render([serializers.SongSerializer(self.song).data]),
+        )
+
+    def test_batch_get_keeps_the_requested_order(self):
+        other = Song.objects.create(
+            title='Second', album=self.song.album, duration=timedelta(minutes=2), track_number=2
+        )
+        url = reverse('api:song-list')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'ids': f'{other.pk},999999,{self.song.pk},{other.pk}', 'fields': 'id'})
+        self.assertEqual(response.json(), {'results': [{'id': other.pk}, {'id': self.song.pk}], 'missing': [999999]})
+
+        self.assertEqual(self.client.get(url, {'ids': '1,x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': ','.join(map(str, range(1, 202)))}).status_code, 400)
+
+    def test_sparse_fieldset(self):
+        url = reverse('api:song-detail', args=[self.song.pk])
+        response = self.client.get(url, {'fields': 'id,album.artist.name'})
+        self.assertEqual(response.json(), {'id': self.song.pk, 'album': {'artist': {'name': 'Parity Artist'}}})
+
+        response = self.client.get(url, {'fields': 'id,lyrics'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PlaylistApiTests(TestCase):
+    """Playlist listings are summaries; a playlist's songs are paged through its tracks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('summary', password='x')
+        artist = Artist.objects.create(name='Summary Artist')
+        albums = [
+            Album.objects.create(title=f'Album {cover}', artist=artist, release_date=date(2020, 1, 1), cover_url=cover)
+            for cover in ('https://img/a', 'https://img/b')
+        ]
+        cls.songs = [
+            Song.objects.create(title=f'Song {i}', album=albums[i % 2], duration=timedelta(minutes=3), track_number=i)
+            for i in range(5)
+        ]
+        cls.playlist = Playlist.objects.create(title='Full', user=cls.user)
+        playlist_tracks.add(cls.playlist, [song.id for song in cls.songs])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def list_playlists(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:playlist-list'))
+        return response.json()['results'], len(queries)
+
+    def test_list_is_a_summary_in_constant_queries(self):
+        results, query_count = self.list_playlists()
+        self.assertEqual(len(results), 1)
+        self.assertNotIn('songs', results[0])
+        self.assertEqual(results[0]['track_count'], 5)
+        self.assertEqual(results[0]['total_duration'], '00:15:00')
+        self.assertEqual(results[0]['cover_mosaic'], ['https://img/a', 'https://img/b'])
+
+        for i in range(3):
+            playlist_tracks.add(Playlist.objects.create(title=f'More {i}', user=self.user), [self.songs[i].id])
+        results, more_query_count = self.list_playlists()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(more_query_count, query_count)
+
+    def test_tracks_are_paged_in_playlist_order(self):
+        url = reverse('api:playlist-tracks', args=[self.playlist.pk])
+        seen = []
+        response = self.client.get(url, {'page_size': 2, 'fields': 'position,song.id'})
+        while True:
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen.extend(row['song']['id'] for row in page['results'])
+            if not page['next']:
+                break
+            response = self.client.get(page['next'])
+        self.assertEqual(seen, [song.id for song in self.songs])
+
+
+class ReplicaRouterTests(TestCase):
+    """Reads go to the replica only inside use_replica(), and only when one is configured."""
+
+    router = PrimaryReplicaRouter()
+
+    def test_routes_reads_inside_use_replica(self):
+        self.assertEqual(self.router.db_for_read(Song), 'default')
+        with use_replica():
+            # No replica configured: the primary serves analytics reads too
+            self.assertEqual(self.router.db_for_read(Song), 'default')
+
+        with mock.patch.dict(settings.DATABASES, {'replica': settings.DATABASES['default']}):
+            self.assertEqual(self.router.db_for_read(Song), 'default')
+            with use_replica():
+                self.assertEqual(self.router.db_for_read(Song), 'replica')
+                self.assertEqual(self.router.db_for_write(Song), 'default')
+            self.assertEqual(self.router.db_for_read(Song), 'default')
+            self.assertFalse(self.router.allow_migrate('replica', 'SyroMusic'))
+            self.assertTrue(self.router.allow_migrate('default', 'SyroMusic'))
+
+    def test_replica_reads_is_scoped_to_the_view(self):
+        @replica_reads
+        def view():
+            with mock.patch.dict(settings.DATABASES, {'replica': settings.DATABASES['default']}):
+                if self.router.db_for_read(Song) == 'replica':
+                    raise RuntimeError('read from replica')
+
+        with self.assertRaisesMessage(RuntimeError, 'read from replica'):
+            view()
+        with mock.patch.dict(settings.DATABASES, {'replica': settings.DATABASES['default']}):
+            self.assertEqual(self.router.db_for_read(Song), 'default')
+
+
+class SqliteTuningTests(TestCase):
+    """Performance-mode pragmas and the box-wide writer lock."""
+
+    def test_pragmas_apply_only_in_performance_mode(self):
+        fake = mock.MagicMock(vendor='sqlite')
+        execute = fake.cursor.return_value.__enter__.return_value.execute
+
+        with override_settings(SQLITE_PERFORMANCE_MODE=False):
+            sqlite_tuning.configure_connection(None, fake)
+        execute.assert_not_called()
+
+        with override_settings(SQLITE_PERFORMANCE_MODE=True, SQLITE_BUSY_TIMEOUT=1234):
+            sqlite_tuning.configure_connection(None, fake)
+            expected = sqlite_tuning.pragmas()
+        statements = [call.args[0] for call in execute.call_args_list]
+        self.assertEqual(statements, expected)
+        self.assertIn('PRAGMA journal_mode = WAL', statements)
+        self.assertIn('PRAGMA busy_timeout = 1234', statements)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite writer lock')
+    def test_writer_serialises_write_bursts(self):
+        with override_settings(SQLITE_PERFORMANCE_MODE=False):
+            with sqlite_tuning.writer():
+                pass  # A no-op outside performance mode
+
+        events = []
+        holding = threading.Event()
+
+        def burst(name):
+            with sqlite_tuning.writer():
+                events.append(f'{name} start')
+                holding.set()
+                time.sleep(0.05)
+                events.append(f'{name} end')
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(SQLITE_PERFORMANCE_MODE=True), \
+                mock.patch.dict(connection.settings_dict, {'NAME': f'{directory}/db.sqlite3'}):
+            first = threading.Thread(target=burst, args=('first',))
+            first.start()
+            holding.wait(1)
+            burst('second')
+            first.join()
+        self.assertEqual(events, ['first start', 'first end', 'second start', 'second end'])
+
+
+class QueryBudgetTests(TestCase):
+    """Endpoints stay within their query budgets; N+1 patterns are caught."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget', password='x', is_staff=True, is_superuser=True)
+        UserListeningStats.objects.create(user=cls.user)
+        now = timezone.now()
+        UserListeningActivity.objects.bulk_create([
+            UserListeningActivity(
+                user=cls.user, track_name=f'Track {i}', artist_name='Artist', played_at=now - timedelta(minutes=i),
+                duration_ms=180000,
+            )
+            for i in range(12)
+        ])
+        artist = Artist.objects.create(name='Budget Artist')
+        Song.objects.bulk_create([
+            Song(
+                title=f'Song {i}', duration=timedelta(minutes=3), track_number=1,
+                album=Album.objects.create(title=f'Album {i}', artist=artist, release_date=date(2020, 1, 1)),
+            )
+            for i in range(12)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_user_stats_within_budget(self):
+        with assert_query_budget(api_views.UserStatsViewSet.query_budget):
+            response = self.client.get(reverse('api:user-stats-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['recent_activity']), 10)
+
+    def test_admin_song_list_has_no_n_plus_one(self):
+        with assert_query_budget(10):
+            response = self.client.get(reverse('admin:SyroMusic_song_changelist'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_n_plus_one_is_reported(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'N+1'):
+            with assert_query_budget():
+                [song.album.title for song in Song.objects.all()]
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True, QUERY_BUDGET_DEFAULT=1)
+    def test_strict_middleware_fails_requests_over_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('api:song-list'))
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True)
+    def test_middleware_reports_query_count(self):
+        response = self.client.get(reverse('api:user-stats-list'))
+        self.assertLessEqual(int(response['X-Query-Count']), api_views.UserStatsViewSet.query_budget)
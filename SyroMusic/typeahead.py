@@ -0,0 +1,540 @@
+"""
+In-process typeahead prefix index for search_json_api.
+
+Names are normalised (lowercase, accents stripped, punctuation collapsed) and
+every word start becomes a sorted key, so "tog" finds "Come Together". Song and
+album keys include the artist name, so "beatles" finds their songs as well.
+
+The base index is a flat binary snapshot (sorted keys plus offset tables) that
+is either built in memory by a background thread or memory-mapped from
+TYPEAHEAD_SNAPSHOT_PATH, in which case every gunicorn worker shares the same
+read-only pages. Model signals
+apply changes to a small per-process overlay on top of the base until the next
+snapshot is loaded.
+
+Snapshot layout (native byte order):
+    header            magic, n_entries, n_records, keys_len, records_len, topk_len
+    key_offsets       uint32[n_entries + 1]  into the keys blob
+    entry_records     uint32[n_entries]      record index of each key
+    record_offsets    uint32[n_records + 1]  into the records blob
+    record_weights    uint32[n_records]      popularity weight
+    record_kinds      uint8[n_records]
+    keys blob         utf-8 keys, sorted bytewise
+    records blob      one compact JSON array per record
+    top-k blob        JSON {kind: {prefix: [record index, ...]}} for heavy prefixes
+"""
+
+import bisect
+import heapq
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import unicodedata
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Artist, Album, Song, UserListeningActivity
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SYROTA01'
+HEADER = struct.Struct('=8s5I')
+
+KINDS = ('artist', 'album', 'song')
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+MAX_KEY_LENGTH = 64      # Longer names are only matchable on their first 64 characters
+HEAVY_PREFIX_RUN = 64    # Prefixes covering more keys than this are answered from precomputed lists
+TOPK_SIZE = 20
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse punctuation/whitespace to single spaces."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(TOKEN_RE.findall(text.lower()))
+
+
+def word_start_keys(text):
+    """Return the normalised text from every word start, truncated to MAX_KEY_LENGTH."""
+    normalized = normalize(text)
+    if not normalized:
+        return []
+    keys = [normalized[:MAX_KEY_LENGTH]]
+    for match in re.finditer(' ', normalized):
+        keys.append(normalized[match.end():match.end() + MAX_KEY_LENGTH])
+    return keys
+
+
+# ============================================================
+# Records
+# ============================================================
+# Compact record layouts, the fields search_views needs to build a result:
+#   artist: ['artist', id, name]
+#   album:  ['album', id, title, artist_id, artist_name, cover_url, release_date]
+#   song:   ['song', id, title, spotify_id, album_id, album_title, cover_url, artist_id, artist_name]
+
+def artist_record(artist):
+    return ['artist', artist.id, artist.name or '']
+
+
+def album_record(album):
+    return [
+        'album', album.id, album.title or '', album.artist.id, album.artist.name or '',
+        album.cover_url or '', str(album.release_date) if album.release_date else '',
+    ]
+
+
+def song_record(song):
+    return [
+        'song', song.id, song.title or '', song.spotify_id or '',
+        song.album.id, song.album.title or '', song.album.cover_url or '',
+        song.album.artist.id, song.album.artist.name or '',
+    ]
+
+
+def record_text(record):
+    """Text that a record is searchable under."""
+    kind = record[0]
+    if kind == 'artist':
+        return record[2]
+    if kind == 'album':
+        return f'{record[2]} {record[4]}'
+    return f'{record[2]} {record[8]}'
+
+
+def song_weights(song_ids=None):
+    """Popularity of songs: playlist memberships plus plays linked to the song."""
+    weights = defaultdict(int)
+    memberships = Song.playlists.through.objects.values('song_id').annotate(n=Count('id'))
+    plays = UserListeningActivity.objects.filter(song__isnull=False).values('song_id').annotate(n=Count('id'))
+    if song_ids is not None:
+        memberships = memberships.filter(song_id__in=song_ids)
+        plays = plays.filter(song_id__in=song_ids)
+    for row in memberships.order_by():
+        weights[row['song_id']] += row['n']
+    for row in plays.order_by():
+        weights[row['song_id']] += row['n']
+    return weights
+
+
+def _rollup_weights(songs, weights):
+    """Album and artist weight: number of songs plus their popularity."""
+    album_weights = defaultdict(int)
+    artist_weights = defaultdict(int)
+    for song_id, album_id, artist_id in songs:
+        weight = 1 + weights.get(song_id, 0)
+        album_weights[album_id] += weight
+        artist_weights[artist_id] += weight
+    return album_weights, artist_weights
+
+
+# ============================================================
+# Snapshot building
+# ============================================================
+
+def build_snapshot():
+    """Build a snapshot of the whole catalog and return it as bytes."""
+    weights = song_weights()
+    album_weights, artist_weights = _rollup_weights(
+        Song.objects.values_list('id', 'album_id', 'album__artist_id').order_by().iterator(chunk_size=5000),
+        weights
+    )
+
+    records = []
+    record_weights = array('I')
+    record_kinds = array('B')
+
+    def add(record, weight):
+        records.append(record)
+        record_weights.append(min(weight, 0xFFFFFFFF))
+        record_kinds.append(KIND_CODES[record[0]])
+
+    for artist in Artist.objects.only('id', 'name').order_by().iterator(chunk_size=5000):
+        add(artist_record(artist), artist_weights.get(artist.id, 0))
+    for album in Album.objects.select_related('artist').only(
+        'id', 'title', 'cover_url', 'release_date', 'artist__id', 'artist__name'
+    ).order_by().iterator(chunk_size=5000):
+        add(album_record(album), album_weights.get(album.id, 0))
+    for song in Song.objects.select_related('album', 'album__artist').only(
+        'id', 'title', 'spotify_id', 'album__id', 'album__title', 'album__cover_url',
+        'album__artist__id', 'album__artist__name'
+    ).order_by().iterator(chunk_size=5000):
+        add(song_record(song), weights.get(song.id, 0))
+
+    return encode_snapshot(records, record_weights, record_kinds)
+
+
+def encode_snapshot(records, record_weights, record_kinds):
+    """Serialise records into the binary snapshot layout."""
+    entries = []
+    for index, record in enumerate(records):
+        for key in set(word_start_keys(record_text(record))):
+            entries.append((key.encode('utf-8'), index))
+    entries.sort()
+
+    key_offsets = array('I', [0])
+    entry_records = array('I')
+    keys_blob = bytearray()
+    for key, index in entries:
+        keys_blob += key
+        key_offsets.append(len(keys_blob))
+        entry_records.append(index)
+
+    record_offsets = array('I', [0])
+    records_blob = bytearray()
+    for record in records:
+        records_blob += json.dumps(record, separators=(',', ':')).encode('utf-8')
+        record_offsets.append(len(records_blob))
+
+    topk_blob = json.dumps(
+        _top_k_for_heavy_prefixes(entries, record_weights, record_kinds),
+        separators=(',', ':')
+    ).encode('utf-8')
+
+    return b''.join([
+        HEADER.pack(MAGIC, len(entries), len(records), len(keys_blob), len(records_blob), len(topk_blob)),
+        key_offsets.tobytes(),
+        entry_records.tobytes(),
+        record_offsets.tobytes(),
+        record_weights.tobytes(),
+        record_kinds.tobytes(),
+        bytes(keys_blob),
+        bytes(records_blob),
+        topk_blob,
+    ])
+
+
+def _top_k_for_heavy_prefixes(entries, record_weights, record_kinds):
+    """
+    Precompute the heaviest records of each kind for every prefix that covers
+    more than HEAVY_PREFIX_RUN keys, so query-time scans are always bounded.
+    Prefixes are byte strings, stored latin-1 decoded to survive JSON.
+    """
+    top_k = {kind: {} for kind in KINDS}
+    ranges = [(0, len(entries))]
+    length = 0
+    while ranges and length < MAX_KEY_LENGTH * 4:
+        length += 1
+        heavy = []
+        for start, stop in ranges:
+            # Entries are sorted, so every prefix is a contiguous run
+            while start < stop:
+                prefix = entries[start][0][:length]
+                end = start
+                while end < stop and entries[end][0][:length] == prefix:
+                    end += 1
+                if end - start > HEAVY_PREFIX_RUN and len(prefix) == length:
+                    by_kind = defaultdict(set)
+                    for _, index in entries[start:end]:
+                        by_kind[KINDS[record_kinds[index]]].add(index)
+                    for kind in KINDS:
+                        top_k[kind][prefix.decode('latin-1')] = heapq.nlargest(
+                            TOPK_SIZE, by_kind[kind], key=lambda i: (record_weights[i], -i)
+                        )
+                    heavy.append((start, end))
+                start = end
+        ranges = heavy
+    return top_k
+
+
+def write_snapshot(path):
+    """Build a snapshot and atomically replace the file at path."""
+    data = build_snapshot()
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+# ============================================================
+# Querying
+# ============================================================
+
+class TypeaheadIndex:
+    """Prefix index over a snapshot buffer (bytes or mmap) plus a mutable overlay."""
+
+    def __init__(self, buffer, source='memory'):
+        self.source = source
+        self.loaded_at = time.time()
+        self._buffer = buffer
+        magic, n_entries, n_records, keys_len, records_len, topk_len = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a typeahead snapshot')
+
+        view = memoryview(buffer)
+        offset = HEADER.size
+
+        def take(count, fmt, size):
+            nonlocal offset
+            section = view[offset:offset + count * size].cast(fmt)
+            offset += count * size
+            return section
+
+        self._key_offsets = take(n_entries + 1, 'I', 4)
+        self._entry_records = take(n_entries, 'I', 4)
+        self._record_offsets = take(n_records + 1, 'I', 4)
+        self._record_weights = take(n_records, 'I', 4)
+        self._record_kinds = take(n_records, 'B', 1)
+        self._keys = view[offset:offset + keys_len]
+        offset += keys_len
+        self._records = view[offset:offset + records_len]
+        offset += records_len
+        self._top_k = json.loads(bytes(view[offset:offset + topk_len]))
+
+        self.n_entries = n_entries
+        self.n_records = n_records
+
+        # Overlay: records changed in this process since the snapshot was built
+        self._lock = threading.Lock()
+        self._removed = set()            # (kind, id) superseded or deleted
+        self._overlay_keys = []          # sorted (key bytes, (kind, id))
+        self._overlay_records = {}       # (kind, id) -> (weight, record)
+
+    def _key_at(self, i):
+        return bytes(self._keys[self._key_offsets[i]:self._key_offsets[i + 1]])
+
+    def _bisect(self, key):
+        lo, hi = 0, self.n_entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _record_at(self, index):
+        return json.loads(bytes(self._records[self._record_offsets[index]:self._record_offsets[index + 1]]))
+
+    def _base_candidates(self, prefix, kind):
+        """Record indexes of the given kind under prefix, heaviest first."""
+        key = prefix.encode('utf-8')
+        heavy = self._top_k[kind].get(key.decode('latin-1'))
+        if heavy is not None:
+            return heavy
+
+        # Not a heavy prefix, so this range holds at most HEAVY_PREFIX_RUN keys
+        lo = self._bisect(key)
+        hi = self._bisect(key + b'\xff')
+        code = KIND_CODES[kind]
+        seen = set()
+        for i in range(lo, hi):
+            index = self._entry_records[i]
+            if self._record_kinds[index] == code:
+                seen.add(index)
+        return sorted(seen, key=lambda i: (-self._record_weights[i], i))
+
+    def search(self, query, kind, limit=10):
+        """Return up to limit records of kind whose name has a word starting with query."""
+        prefix = normalize(query)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            removed = set(self._removed)
+            key = prefix.encode('utf-8')
+            lo = bisect.bisect_left(self._overlay_keys, (key,))
+            hi = bisect.bisect_left(self._overlay_keys, (key + b'\xff',))
+            overlay = sorted(
+                {ref for _, ref in self._overlay_keys[lo:hi] if ref[0] == kind},
+                key=lambda ref: -self._overlay_records[ref][0]
+            )
+            overlay = [self._overlay_records[ref] for ref in overlay]
+
+        base = iter(self._base_candidates(prefix, kind))
+        pending_base = next(base, None)
+        pending_overlay = overlay.pop(0) if overlay else None
+        while len(results) < limit and (pending_base is not None or pending_overlay is not None):
+            # Merge the two weight-ordered streams
+            if pending_overlay is not None and (
+                pending_base is None or pending_overlay[0] >= self._record_weights[pending_base]
+            ):
+                record = pending_overlay[1]
+                pending_overlay = overlay.pop(0) if overlay else None
+            else:
+                record = self._record_at(pending_base)
+                pending_base = next(base, None)
+                if (record[0], record[1]) in removed:
+                    continue
+            ref = (record[0], record[1])
+            if ref not in seen:
+                seen.add(ref)
+                results.append(record)
+        return results
+
+    def upsert(self, record, weight):
+        """Replace a record in this process's view of the index."""
+        ref = (record[0], record[1])
+        with self._lock:
+            self._drop_overlay(ref)
+            self._removed.add(ref)
+            self._overlay_records[ref] = (weight, record)
+            for key in set(word_start_keys(record_text(record))):
+                bisect.insort(self._overlay_keys, (key.encode('utf-8'), ref))
+
+    def remove(self, kind, object_id):
+        """Hide a deleted record in this process's view of the index."""
+        ref = (kind, object_id)
+        with self._lock:
+            self._drop_overlay(ref)
+            self._removed.add(ref)
+
+    def _drop_overlay(self, ref):
+        if ref in self._overlay_records:
+            self._overlay_keys = [entry for entry in self._overlay_keys if entry[1] != ref]
+            del self._overlay_records[ref]
+
+
+# ============================================================
+# Process-wide index
+# ============================================================
+
+_index = None
+_index_lock = threading.Lock()
+_checked_at = 0.0
+_building = False
+
+
+def is_enabled():
+    return getattr(settings, 'TYPEAHEAD_ENABLED', True)
+
+
+def _snapshot_path():
+    path = getattr(settings, 'TYPEAHEAD_SNAPSHOT_PATH', None)
+    return path if path and os.path.exists(path) else None
+
+
+def _load(path):
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    index = TypeaheadIndex(buffer, source=path)
+    index.mtime = os.path.getmtime(path)
+    logger.info(f"Loaded typeahead index from {index.source}: {index.n_records} records, {index.n_entries} keys")
+    return index
+
+
+def _build():
+    """Build an in-memory index off the request path (no snapshot to map)."""
+    global _index, _building
+    try:
+        started = time.time()
+        index = TypeaheadIndex(build_snapshot())
+        index.mtime = None
+        _index = index
+        logger.info(
+            f"Built typeahead index in {time.time() - started:.2f}s: "
+            f"{index.n_records} records, {index.n_entries} keys"
+        )
+    except Exception as e:
+        logger.error(f"Error building typeahead index: {str(e)}")
+    finally:
+        _building = False
+        connection.close()
+
+
+def _is_stale(index, now):
+    path = getattr(settings, 'TYPEAHEAD_SNAPSHOT_PATH', None)
+    if index.mtime is not None:
+        return os.path.exists(path) and os.path.getmtime(path) != index.mtime
+    # In-memory indexes only see this process's writes, so rebuild them now and then
+    return now - index.loaded_at > getattr(settings, 'TYPEAHEAD_MAX_AGE', 300)
+
+
+def get_index():
+    """
+    Return this process's typeahead index, loading or reloading it as needed.
+    Snapshots are mapped in place; without one the index is built in a
+    background thread, and until the first build finishes this returns None
+    (callers fall back to the full-text index). Stale indexes keep serving
+    while they are rebuilt, and a failed load or build is retried after
+    TYPEAHEAD_RELOAD_INTERVAL.
+    """
+    global _index, _checked_at, _building
+    if not is_enabled():
+        return None
+
+    now = time.time()
+    interval = getattr(settings, 'TYPEAHEAD_RELOAD_INTERVAL', 60)
+    if now - _checked_at < interval:
+        return _index
+
+    with _index_lock:
+        if now - _checked_at < interval:
+            return _index
+        _checked_at = now
+        try:
+            if _index is None or _is_stale(_index, now):
+                path = _snapshot_path()
+                if path:
+                    _index = _load(path)
+                elif not _building:
+                    _building = True
+                    threading.Thread(target=_build, name='typeahead-index', daemon=True).start()
+        except Exception as e:
+            logger.error(f"Error loading typeahead index: {str(e)}")
+        return _index
+
+
+def reset_index():
+    """Drop this process's index so the next query reloads it."""
+    global _index, _checked_at
+    with _index_lock:
+        _index = None
+        _checked_at = 0.0
+
+
+# ============================================================
+# Incremental updates (called from signals)
+# ============================================================
+
+def is_loaded():
+    """Whether this process has an index for signals to update."""
+    return _index is not None
+
+
+def refresh_objects(artist_ids=(), album_ids=(), song_ids=()):
+    """Re-read the given catalog objects into the loaded index, if any."""
+    index = _index
+    if index is None:
+        return
+
+    song_ids = set(song_ids)
+    album_ids = set(album_ids)
+    weights = song_weights(song_ids) if song_ids else {}
+    for song in Song.objects.select_related('album', 'album__artist').filter(id__in=song_ids).order_by():
+        index.upsert(song_record(song), weights.get(song.id, 0))
+
+    if album_ids or artist_ids:
+        songs = Song.objects.filter(
+            album_id__in=album_ids
+        ) | Song.objects.filter(album__artist_id__in=artist_ids)
+        related = list(songs.values_list('id', 'album_id', 'album__artist_id').order_by())
+        album_weights, artist_weights = _rollup_weights(related, song_weights([row[0] for row in related]))
+        for album in Album.objects.select_related('artist').filter(id__in=album_ids):
+            index.upsert(album_record(album), album_weights.get(album.id, 0))
+        for artist in Artist.objects.filter(id__in=artist_ids):
+            index.upsert(artist_record(artist), artist_weights.get(artist.id, 0))
+
+
+def remove_object(kind, object_id):
+    """Remove a deleted catalog object from the loaded index, if any."""
+    index = _index
+    if index is not None:
+        index.remove(kind, object_id)
@@ -57,6 +57,7 @@ urlpatterns = [
     path('api/playlists/remove-song/', search_views.remove_song_from_playlist, name='remove_song_from_playlist'),
 
     # Track Management
+    path('tracks/saved/', search_views.saved_track_list, name='saved_tracks'),
     path('tracks/<int:song_id>/save/', search_views.save_track, name='save_track'),
     path('tracks/<int:song_id>/unsave/', search_views.unsave_track, name='unsave_track'),
 ]
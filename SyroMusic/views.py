@@ -1,5 +1,6 @@
 """Views for Syro application."""
 from django.shortcuts import render, redirect
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login as auth_login, authenticate
 from django.contrib.auth.models import User
@@ -11,16 +12,34 @@ from django.views.decorators.http import require_http_methods
 from datetime import timedelta
 
 from .models import (
-    Artist, Album, Song, Playlist,
+    Artist, Album, Song, Playlist, SavedTrack,
     SpotifyUser, UserListeningStats, UserListeningActivity
 )
 from .services import SpotifyService, TokenManager
+from .pagination import KeysetPage
+from .db_router import replica_reads
+from . import search_cache
+
+CATALOG_PAGE_SIZE = 48
+
+
+def _catalog_page_context(page):
+    """
+    Context for a paginated catalog list. The template caches the rendered
+    page under its cursor and the catalog generation, which every catalog
+    write bumps, so a cached page is served without touching the table.
+    """
+    return {
+        'page': page,
+        'catalog_generation': search_cache.local_generation(),
+        'list_cache_timeout': settings.CATALOG_LIST_CACHE_TTL,
+    }
 
 
 def artist_list(request):
-    """Display list of all artists."""
-    artists = Artist.objects.all()
-    return render(request, 'SyroMusic/artist_list.html', {'artists': artists})
+    """Display artists a page at a time."""
+    page = KeysetPage(Artist.objects.all(), ('name',), request.GET.get('cursor'), CATALOG_PAGE_SIZE)
+    return render(request, 'SyroMusic/artist_list.html', _catalog_page_context(page))
 
 
 def artist_detail(request, artist_id):
@@ -40,9 +59,12 @@ def artist_detail(request, artist_id):
 
 
 def album_list(request):
-    """Display list of all albums."""
-    albums = Album.objects.select_related('artist').all()
-    return render(request, 'SyroMusic/album_list.html', {'albums': albums})
+    """Display albums a page at a time, newest first."""
+    page = KeysetPage(
+        Album.objects.select_related('artist'), ('-release_date', '-id'),
+        request.GET.get('cursor'), CATALOG_PAGE_SIZE,
+    )
+    return render(request, 'SyroMusic/album_list.html', _catalog_page_context(page))
 
 
 def album_detail(request, album_id):
@@ -62,9 +84,12 @@ def album_detail(request, album_id):
 
 
 def song_list(request):
-    """Display list of all songs."""
-    songs = Song.objects.select_related('album', 'album__artist').all()
-    return render(request, 'SyroMusic/song_list.html', {'songs': songs})
+    """Display songs a page at a time, by album and track number."""
+    page = KeysetPage(
+        Song.objects.select_related('album', 'album__artist'), ('album_id', 'track_number', 'id'),
+        request.GET.get('cursor'), CATALOG_PAGE_SIZE,
+    )
+    return render(request, 'SyroMusic/song_list.html', _catalog_page_context(page))
 
 
 def song_detail(request, song_id):
@@ -83,13 +108,15 @@ def song_detail(request, song_id):
 
 def playlist_list(request):
     """Display list of all playlists or user's playlists if authenticated."""
+    saved_count = None
     if request.user.is_authenticated:
         playlists = Playlist.objects.filter(user=request.user).prefetch_related(
             'songs', 'songs__album', 'songs__album__artist'
         )
+        saved_count = SavedTrack.objects.filter(user=request.user).count()
     else:
         playlists = Playlist.objects.none()
-    return render(request, 'SyroMusic/playlist_list.html', {'playlists': playlists})
+    return render(request, 'SyroMusic/playlist_list.html', {'playlists': playlists, 'saved_count': saved_count})
 
 
 def signup(request):
@@ -280,6 +307,7 @@ def sync_spotify_stats(request):
 
 
 @login_required(login_url='login')
+@replica_reads
 def stats_dashboard(request):
     """Enhanced stats dashboard with top artists, tracks, and listening history."""
     try:
@@ -334,6 +362,7 @@ def stats_dashboard(request):
 
 
 @login_required(login_url='login')
+@replica_reads
 def wrapped_view(request):
     """Spotify Wrapped-style summary of user's listening habits."""
     try: